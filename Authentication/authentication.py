@@ -1,5 +1,5 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
 from rest_framework_simplejwt.tokens import AccessToken
 
 
@@ -19,3 +19,16 @@ class SingleDeviceJWTAuthentication(JWTAuthentication):
             raise AuthenticationFailed("Token is no longer valid. Please log in again.")
 
         return user
+
+
+class OptionalSingleDeviceJWTAuthentication(SingleDeviceJWTAuthentication):
+    """
+    Dùng cho API công khai: token hợp lệ thì nhận diện user,
+    token hết hạn/không hợp lệ thì coi như khách thay vì trả 401.
+    """
+
+    def authenticate(self, request):
+        try:
+            return super().authenticate(request)
+        except (InvalidToken, AuthenticationFailed):
+            return None
@@ -1,9 +1,76 @@
-from typing import Dict, Set
-from threading import Lock
-import json
+"""
+SSE connection registry and cross-process event delivery.
+
+Each worker process keeps its own connections (user id -> queues of the open SSE responses).
+An event is delivered to this process's connections directly and published on the broker;
+every other worker holds one subscription to the broker channel and hands the events to its
+local connections. Several uvicorn workers or pods then behave like one server.
+
+- Delivery never blocks: queues are bounded (MAX_QUEUED_EVENTS) and an event for a connection
+  that stopped reading is dropped, not awaited. The registry lock only guards the dict.
+- Pub/sub is fire-and-forget: events published while a worker is reconnecting are lost, which
+  is fine for notifications (a forced logout is also enforced by the token check).
+- The broker is pluggable (settings.SSE_BROKER or use_broker()); LocalBroker keeps everything
+  in one process (dev server, tests). RedisBroker pings the server when created, so a process
+  that cannot reach Redis falls back to LocalBroker instead of waiting on every publish.
+"""
 import asyncio
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+import json
+import logging
+import uuid
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, Optional, Set
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+SSE_CHANNEL = "sse:events"
+MAX_QUEUED_EVENTS = 100
+RECONNECT_MAX_DELAY = 30
+CONNECT_TIMEOUT = 2
+FORCE_LOGOUT_MESSAGE = "Your account was logged in from another device."
+
+# Identifies this process in published events, so its own events are not delivered twice
+PROCESS_ID = uuid.uuid4().hex
+
+
+class LocalBroker:
+    """Single process: events only reach the connections of this process."""
+
+    def publish(self, message: str):
+        pass
+
+
+class RedisBroker:
+    """Redis pub/sub on settings.REDIS_URL (the server channels_redis already uses)."""
+
+    def __init__(self, url: Optional[str] = None):
+        import redis
+
+        self.url = url or settings.REDIS_URL
+        self.client = redis.Redis.from_url(self.url, socket_connect_timeout=CONNECT_TIMEOUT)
+        self.client.ping()  # from_url() does not connect: fail here, not on the first publish
+
+    def publish(self, message: str):
+        self.client.publish(SSE_CHANNEL, message)
+
+    async def listen(self):
+        """Messages published on SSE_CHANNEL, until the connection fails."""
+        import redis.asyncio as aioredis
+
+        client = aioredis.from_url(self.url)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(SSE_CHANNEL)
+            async for item in pubsub.listen():
+                if item["type"] == "message":
+                    yield item["data"]
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
 
 
 class SSEManager:
@@ -20,42 +87,132 @@ class SSEManager:
     def _initialize(self):
         """Initialize the SSE manager"""
         self.connections: Dict[int, Set[asyncio.Queue]] = {}
+        self.queue_loops: Dict[asyncio.Queue, Optional[asyncio.AbstractEventLoop]] = {}
         self.connection_lock = Lock()
+        self._broker = None
+        self._listener = None
+
+    @property
+    def broker(self):
+        if self._broker is None:
+            try:
+                self._broker = import_string(
+                    getattr(settings, "SSE_BROKER", "Authentication.sse_manager.RedisBroker")
+                )()
+            except Exception as e:
+                logger.warning("SSE broker unavailable, events stay in this process: %s", e)
+                self._broker = LocalBroker()
+        return self._broker
 
     def register_connection(self, user_id: int, queue: asyncio.Queue):
         """Register a new SSE connection for a user"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
         with self.connection_lock:
             if user_id not in self.connections:
                 self.connections[user_id] = set()
             self.connections[user_id].add(queue)
+            self.queue_loops[queue] = loop
+        if loop is not None:
+            self._ensure_listener(loop)
 
     def remove_connection(self, user_id: int, queue: asyncio.Queue):
         """Remove an SSE connection for a user"""
         with self.connection_lock:
+            self.queue_loops.pop(queue, None)
             if user_id in self.connections:
                 self.connections[user_id].discard(queue)
                 if not self.connections[user_id]:
                     del self.connections[user_id]
 
-    async def send_event(self, user_id: int, event_type: str, data: dict):
-        """Send an event to all connections for a user"""
+    def dispatch(self, user_id: int, message: str):
+        """Hand `message` to every connection of `user_id` in this process, without blocking."""
         with self.connection_lock:
-            if user_id in self.connections:
-                message = {"type": event_type, "data": data}
-                for queue in self.connections[user_id]:
-                    await queue.put(json.dumps(message))
+            targets = [(queue, self.queue_loops.get(queue)) for queue in self.connections.get(user_id, ())]
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for queue, loop in targets:
+            if loop is None or loop is running:
+                _put(queue, message)
+            else:
+                # asyncio.Queue is not thread-safe: enqueue on the loop that owns it
+                try:
+                    loop.call_soon_threadsafe(_put, queue, message)
+                except RuntimeError:
+                    pass  # Loop closed, the connection is gone
+
+    def publish(self, user_id: int, event_type: str, data: dict):
+        """Send an event to all connections for a user, in every process (callable from any thread)"""
+        message = json.dumps({"type": event_type, "data": data})
+        self.dispatch(user_id, message)
+        try:
+            self.broker.publish(json.dumps({"origin": PROCESS_ID, "user_id": user_id, "message": message}))
+        except Exception as e:
+            logger.warning("Could not publish SSE event %s for user %s: %s", event_type, user_id, e)
+
+    async def send_event(self, user_id: int, event_type: str, data: dict):
+        """Async version of publish(): the broker call runs outside the event loop"""
+        await asyncio.to_thread(self.publish, user_id, event_type, data)
 
     def notify_logout(self, user_id: int):
         """Send a force logout notification to all user's connections"""
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"user_{user_id}",
-            {
-                "type": "force_logout",
-                "message": "Your account was logged in from another device.",
-            },
-        )
+        self.publish(user_id, "FORCE_LOGOUT", {"message": FORCE_LOGOUT_MESSAGE})
+
+    def _ensure_listener(self, loop: asyncio.AbstractEventLoop):
+        """Start this process's broker subscription on the loop serving the connections"""
+        if not hasattr(self.broker, "listen"):
+            return
+        if self._listener is not None and not self._listener.done() and not self._listener.get_loop().is_closed():
+            return
+        self._listener = loop.create_task(self._listen())
+
+    async def _listen(self):
+        delay = 1
+        while True:
+            try:
+                async for raw in self.broker.listen():
+                    delay = 1
+                    self._on_broker_message(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("SSE subscription lost, reconnecting in %ss: %s", delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def _on_broker_message(self, raw):
+        try:
+            payload = json.loads(raw)
+            if payload["origin"] == PROCESS_ID:
+                return  # Already delivered locally by publish()
+            self.dispatch(int(payload["user_id"]), payload["message"])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring malformed SSE broker message: %s", e)
+
+
+def _put(queue: asyncio.Queue, message: str):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        logger.warning("SSE connection is not reading, dropping event")
 
 
 # Global SSE manager instance
 sse_manager = SSEManager()
+
+
+@contextmanager
+def use_broker(broker):
+    """Temporarily deliver events through `broker` (tests, scripts)."""
+    previous, listener = sse_manager._broker, sse_manager._listener
+    sse_manager._broker, sse_manager._listener = broker, None
+    try:
+        yield broker
+    finally:
+        if sse_manager._listener is not None and not sse_manager._listener.get_loop().is_closed():
+            sse_manager._listener.cancel()
+        sse_manager._broker, sse_manager._listener = previous, listener
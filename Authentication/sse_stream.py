@@ -0,0 +1,97 @@
+"""
+Relay a blocking generator (e.g. a model token stream) to the client as Server-Sent Events.
+
+The generator runs in its own thread and hands events to the event loop through a bounded
+buffer: when the client reads slowly the producer blocks instead of piling up chunks in
+memory (backpressure). When the client disconnects, Django cancels the response iterator;
+the producer notices before forwarding its next event, closes the generator (which closes
+the upstream model stream) and exits, so an abandoned request stops consuming tokens.
+"""
+import asyncio
+import json
+import threading
+from typing import Callable, Iterable
+
+from django.db import connections
+from django.http import StreamingHttpResponse
+
+MAX_BUFFERED_EVENTS = 32
+HEARTBEAT_INTERVAL = 15  # seconds without events before a keep-alive comment is sent
+_SLOT_POLL_INTERVAL = 0.5
+_DONE = object()
+
+
+def sse_event(event: str, data) -> str:
+    """Format one SSE event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class _Relay:
+    def __init__(self, make_events: Callable[[], Iterable[str]], max_buffered: int):
+        self.make_events = make_events
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.slots = threading.BoundedSemaphore(max_buffered)
+        self.cancelled = threading.Event()
+
+    def _offer(self, item) -> bool:
+        """Wait for a free buffer slot, then hand `item` to the loop. False once cancelled."""
+        while not self.slots.acquire(timeout=_SLOT_POLL_INTERVAL):
+            if self.cancelled.is_set():
+                return False
+        if self.cancelled.is_set():
+            self.slots.release()
+            return False
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+        return True
+
+    def produce(self):
+        events = None
+        try:
+            events = iter(self.make_events())
+            for event in events:
+                if not self._offer(event):
+                    break
+        except Exception as e:
+            self._offer(sse_event("error", {"error": str(e)}))
+        finally:
+            if hasattr(events, "close"):
+                events.close()
+            # This thread opened its own DB connection
+            connections.close_all()
+            try:
+                self.loop.call_soon_threadsafe(self.queue.put_nowait, _DONE)
+            except RuntimeError:
+                pass  # Event loop already closed (server shutting down)
+
+
+async def relay_events(make_events: Callable[[], Iterable[str]],
+                       max_buffered: int = MAX_BUFFERED_EVENTS,
+                       heartbeat: float = HEARTBEAT_INTERVAL):
+    """
+    Async iterator over the SSE strings yielded by `make_events()`, which runs in a worker thread
+    (so it may block on network calls and use the ORM).
+    """
+    relay = _Relay(make_events, max_buffered)
+    threading.Thread(target=relay.produce, name="sse-relay", daemon=True).start()
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(relay.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if item is _DONE:
+                break
+            relay.slots.release()
+            yield item
+    finally:
+        relay.cancelled.set()
+
+
+def sse_response(make_events: Callable[[], Iterable[str]], **kwargs) -> StreamingHttpResponse:
+    """StreamingHttpResponse streaming `make_events()` with the headers SSE needs."""
+    response = StreamingHttpResponse(relay_events(make_events, **kwargs), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Disable nginx buffering
+    return response
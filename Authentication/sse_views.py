@@ -14,7 +14,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from .authentication import SingleDeviceJWTAuthentication
-from .sse_manager import sse_manager
+from .sse_manager import FORCE_LOGOUT_MESSAGE, MAX_QUEUED_EVENTS, sse_manager
 
 
 def authenticate_sse_request(request):
@@ -78,7 +78,8 @@ async def event_stream(request) -> AsyncGenerator[str, None]:
     2. Real-time notifications (like FORCE_LOGOUT) when they occur
     """
     user_id = request.user.id
-    queue = asyncio.Queue()
+    # Bounded: events for a client that stopped reading are dropped instead of piling up
+    queue = asyncio.Queue(maxsize=MAX_QUEUED_EVENTS)
 
     # Register this connection with the SSE manager
     sse_manager.register_connection(user_id, queue)
@@ -276,9 +277,9 @@ def sse_notifications_drf(request):
 
 
 async def notify_logout(user_id: int):
-    """Send force logout notification to all user's connections"""
+    """Send force logout notification to all user's connections, in every worker process"""
     await sse_manager.send_event(
         user_id,
         "FORCE_LOGOUT",
-        {"message": "Your account was logged in from another device."},
+        {"message": FORCE_LOGOUT_MESSAGE},
     )
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import threading
+
+from django.test import SimpleTestCase, override_settings
+
+from Authentication.sse_manager import PROCESS_ID, LocalBroker, sse_manager, use_broker
+
+
+class HubBroker:
+    """Stands in for Redis: every message published reaches every subscriber, sender included."""
+
+    def __init__(self):
+        self.published = []
+        self.subscribers = []
+        self.subscribed = threading.Event()
+
+    def publish(self, message):
+        self.published.append(message)
+        for loop, queue in self.subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    async def listen(self):
+        queue = asyncio.Queue()
+        self.subscribers.append((asyncio.get_running_loop(), queue))
+        self.subscribed.set()
+        while True:
+            yield await queue.get()
+
+
+class UnreachableBroker:
+    def __init__(self):
+        raise ConnectionError("Error 111 connecting to localhost:6379. Connection refused.")
+
+
+def remote_event(user_id, event_type, data):
+    """An event published by another worker process"""
+    message = json.dumps({"type": event_type, "data": data})
+    return json.dumps({"origin": "other-worker", "user_id": user_id, "message": message})
+
+
+class SSEBrokerTest(SimpleTestCase):
+    user_id = 4242
+
+    def run_with_hub(self, scenario):
+        async def run():
+            with use_broker(HubBroker()) as hub:
+                queues = [asyncio.Queue(maxsize=2), asyncio.Queue(maxsize=2)]
+                for queue in queues:
+                    sse_manager.register_connection(self.user_id, queue)
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, hub.subscribed.wait, 1)
+                    return await scenario(hub, queues)
+                finally:
+                    for queue in queues:
+                        sse_manager.remove_connection(self.user_id, queue)
+
+        return asyncio.run(run())
+
+    def test_event_from_another_worker_reaches_local_connections(self):
+        async def scenario(hub, queues):
+            hub.publish(remote_event(self.user_id, "FORCE_LOGOUT", {"message": "bye"}))
+            hub.publish(remote_event(self.user_id + 1, "OTHER_USER", {}))
+            return [json.loads(await asyncio.wait_for(queue.get(), 1)) for queue in queues], queues
+
+        messages, queues = self.run_with_hub(scenario)
+        self.assertEqual([m["type"] for m in messages], ["FORCE_LOGOUT", "FORCE_LOGOUT"])
+        self.assertTrue(all(queue.empty() for queue in queues))
+
+    def test_local_event_is_published_once_and_not_delivered_twice(self):
+        async def scenario(hub, queues):
+            # notify_logout is called from sync views, i.e. outside the event loop
+            await asyncio.get_running_loop().run_in_executor(None, sse_manager.notify_logout, self.user_id)
+            await asyncio.sleep(0.1)
+            return hub, [queue.qsize() for queue in queues]
+
+        hub, sizes = self.run_with_hub(scenario)
+        self.assertEqual(sizes, [1, 1])
+        self.assertEqual(len(hub.published), 1)
+        self.assertEqual(json.loads(hub.published[0])["origin"], PROCESS_ID)
+
+    def test_slow_connection_does_not_block_delivery(self):
+        async def scenario(hub, queues):
+            slow, fast = queues
+            for i in range(5):
+                hub.publish(remote_event(self.user_id, "TICK", {"i": i}))
+                await asyncio.sleep(0.01)
+                if not fast.empty():
+                    fast.get_nowait()
+            return slow.qsize(), fast.qsize()
+
+        slow_size, fast_size = self.run_with_hub(scenario)
+        self.assertEqual(slow_size, 2)  # Bounded: the rest was dropped, not awaited
+        self.assertEqual(fast_size, 0)
+
+    @override_settings(SSE_BROKER="Authentication.tests.test_sse_broker.UnreachableBroker")
+    def test_unreachable_broker_falls_back_to_local(self):
+        with use_broker(None):
+            with self.assertLogs("Authentication.sse_manager", "WARNING"):
+                self.assertIsInstance(sse_manager.broker, LocalBroker)
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from Authentication.sse_stream import relay_events, sse_event
+from course.services.ai_client import FakeBackend
+
+
+def token_events(backend, prompt="prompt"):
+    for text in backend.stream(prompt, "model", None):
+        yield sse_event("token", {"text": text})
+    yield sse_event("done", {})
+
+
+class SSERelayTest(SimpleTestCase):
+    def test_first_event_arrives_before_generation_finishes(self):
+        backend = FakeBackend(reply=lambda prompt: "x" * 80, chunk_size=8, chunk_delay=0.05)
+
+        async def consume():
+            started = time.monotonic()
+            arrivals = []
+            async for event in relay_events(lambda: token_events(backend)):
+                arrivals.append((time.monotonic() - started, event))
+            return arrivals
+
+        arrivals = asyncio.run(consume())
+        self.assertEqual(len(arrivals), 11)
+        self.assertTrue(arrivals[-1][1].startswith("event: done"))
+        first_delay, last_delay = arrivals[0][0], arrivals[-1][0]
+        self.assertLess(first_delay, 0.3)
+        self.assertGreater(last_delay, first_delay + 0.3)
+
+    def test_slow_client_applies_backpressure(self):
+        produced = []
+
+        def events():
+            for i in range(100):
+                produced.append(i)
+                yield sse_event("token", {"text": str(i)})
+
+        async def consume():
+            stream = relay_events(events, max_buffered=3)
+            await stream.__anext__()
+            await asyncio.sleep(0.3)
+            count = len(produced)
+            await stream.aclose()
+            return count
+
+        # 1 event read + at most 3 buffered + 1 waiting for a free slot
+        self.assertLessEqual(asyncio.run(consume()), 5)
+
+    def test_disconnect_stops_the_model_stream(self):
+        backend = FakeBackend(reply=lambda prompt: "y" * 400, chunk_size=4, chunk_delay=0.02)
+        closed = threading.Event()
+
+        def events():
+            try:
+                yield from token_events(backend)
+            finally:
+                closed.set()
+
+        async def consume():
+            stream = relay_events(events)
+            await stream.__anext__()
+            await stream.aclose()
+
+        asyncio.run(consume())
+        self.assertTrue(closed.wait(2))
+        sent = backend.chunks_sent
+        time.sleep(0.2)
+        self.assertEqual(backend.chunks_sent, sent)
+        self.assertLess(sent, 100)
+
+    def test_producer_error_becomes_error_event(self):
+        def events():
+            yield sse_event("token", {"text": "a"})
+            raise RuntimeError("quota")
+
+        async def consume():
+            return [event async for event in relay_events(events)]
+
+        received = asyncio.run(consume())
+        self.assertEqual(len(received), 2)
+        self.assertIn("event: error", received[1])
+        self.assertIn("quota", received[1])
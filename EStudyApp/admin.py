@@ -9,6 +9,7 @@ from django.utils.html import format_html
 from EStudyApp.models import (PartDescription, Part,
                               QuestionSet, Question, PartQuestionSet,
                               Test, History, Tag, QuestionType, HistoryTraining)
+from EStudyApp.services.rescore_service import rescore_test
 
 
 # Định nghĩa lớp ModelAdmin để thêm phân trang
@@ -205,7 +206,7 @@ class PublishStatusFilter(SimpleListFilter):
 
 
 class TestAdmin(admin.ModelAdmin):
-    list_display = ('name', 'colored_publish_status', 'colored_types', 'get_tags')
+    list_display = ('name', 'colored_publish_status', 'colored_types', 'get_tags', 'part_total', 'question_total')
 
     def get_tags(self, obj):
         return ", ".join([tag.name for tag in obj.tags.all()])
@@ -263,16 +264,17 @@ class TestAdmin(admin.ModelAdmin):
     search_fields = ('name', 'description')
     list_filter = (PublishStatusFilter, 'tags', 'types')  # Updated to use tags instead of tag
     list_per_page = 6
-    readonly_fields = ('id', 'test_date',)
+    readonly_fields = ('id', 'test_date', 'part_total', 'question_total')
 
     # Sắp xếp các bài kiểm tra đã xuất bản trước
     ordering = ('-publish', 'id')
 
     # Sử dụng fields thay vì fieldsets
-    fields = ('name', 'description', 'types', 'test_date', 'duration', 'question_count', 'part_count', 'tags', 'publish')
+    fields = ('name', 'description', 'types', 'test_date', 'duration', 'question_count', 'part_count', 'tags', 'publish',
+              'part_total', 'question_total')
 
     actions = ['mark_tests_published', 'mark_tests_unpublished', 'mark_tests_as_practice',
-               'mark_tests_as_online', 'mark_tests_as_all', 'export_to_csv']
+               'mark_tests_as_online', 'mark_tests_as_all', 'export_to_csv', 'rescore_histories']
 
     def mark_tests_published(self, request, queryset):
         to_update = queryset.filter(publish=False)
@@ -379,6 +381,16 @@ class TestAdmin(admin.ModelAdmin):
 
     export_to_csv.short_description = "Xuất dữ liệu ra CSV"
 
+    def rescore_histories(self, request, queryset):
+        messages = []
+        for test_id in queryset.values_list('id', flat=True):
+            for stats in rescore_test(test_id):
+                messages.append(str(stats))
+
+        self.message_user(request, " ".join(messages) or "Không có lịch sử nào cần chấm lại.")
+
+    rescore_histories.short_description = "Chấm lại lịch sử làm bài theo đáp án hiện tại"
+
     # class Media:
     #     js = ('js/sweetalert2.all.min.js', 'js/custom_admin.js')
 
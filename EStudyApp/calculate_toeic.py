@@ -1,10 +1,37 @@
+import numpy as np
+
 from EStudyApp.toeic_score_mapping import toeic_score_mapping
 
+MAX_CORRECT = max(toeic_score_mapping)
+
+# Bảng tra dạng mảng liên tục: chỉ số = số câu đúng (0..MAX_CORRECT)
+LISTENING_SCORES = np.array(
+    [toeic_score_mapping.get(count, (0, 0))[0] for count in range(MAX_CORRECT + 1)], dtype=np.int16)
+READING_SCORES = np.array(
+    [toeic_score_mapping.get(count, (0, 0))[1] for count in range(MAX_CORRECT + 1)], dtype=np.int16)
+LISTENING_SCORES.flags.writeable = False
+READING_SCORES.flags.writeable = False
+
+
+def _clamp(count):
+    return min(max(int(count), 0), MAX_CORRECT)
+
 
 def calculate_toeic_score(listening_correct, reading_correct):
-    """Hàm tính điểm TOEIC dựa trên số câu đúng."""
-    listening_score = toeic_score_mapping.get(listening_correct, (0, 0))[0]
-    reading_score = toeic_score_mapping.get(reading_correct, (0, 0))[1]
+    """Hàm tính điểm TOEIC dựa trên số câu đúng (số câu ngoài 0..100 được kẹp về biên)."""
+    listening_score = int(LISTENING_SCORES[_clamp(listening_correct)])
+    reading_score = int(READING_SCORES[_clamp(reading_correct)])
     overall_score = listening_score + reading_score
     return listening_score, reading_score, overall_score
 
+
+def calculate_toeic_scores_batch(listening_correct, reading_correct):
+    """
+    Quy đổi cả mảng số câu đúng sang điểm TOEIC trong một lần gọi.
+    Trả về (listening_scores, reading_scores, overall_scores) dạng mảng NumPy int32.
+    """
+    listening_index = np.clip(np.asarray(listening_correct, dtype=np.int64), 0, MAX_CORRECT)
+    reading_index = np.clip(np.asarray(reading_correct, dtype=np.int64), 0, MAX_CORRECT)
+    listening_scores = LISTENING_SCORES.take(listening_index).astype(np.int32)
+    reading_scores = READING_SCORES.take(reading_index).astype(np.int32)
+    return listening_scores, reading_scores, listening_scores + reading_scores
@@ -1,10 +1,13 @@
 # utils/audio.py
 import os
-import requests
-import tempfile
+import subprocess
 from pydub import AudioSegment
 import speech_recognition as sr
 
+from EStudyApp.generateAI.media import as_list, cpu_slot, run_all
+from EStudyApp.generateAI.transcript_cache import get_transcript
+from EStudyApp.models import MediaTranscript
+
 # Thiết lập đường dẫn ffmpeg phù hợp hệ điều hành
 if os.name == 'nt':
     ffmpeg_path = r"D:\tools-upgraders\ffmpeg-2025-04-14-git-3b2a9410ef-essentials_build\bin"
@@ -20,50 +23,55 @@ print("✅ FFMPEG PATH:", AudioSegment.converter)
 print("✅ FFPROBE PATH:", AudioSegment.ffprobe)
 
 
-def transcribe_audio_from_urls(audio_urls):
-    """
-    Nhận danh sách URL audio, trích xuất văn bản bằng Google Speech Recognition.
-    """
-    if not isinstance(audio_urls, list):
-        audio_urls = [audio_urls]
+SAMPLE_RATE = 16000
+FFMPEG_TIMEOUT = 120
+TRANSCRIPT_SEPARATOR = "\n"
+
 
-    recognizer = sr.Recognizer()
-    transcripts = []
+def mp3_to_pcm(data):
+    """Giải mã mp3 thành PCM 16-bit mono qua pipe của ffmpeg, không ghi file tạm."""
+    with cpu_slot():
+        result = subprocess.run(
+            [AudioSegment.converter, "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+             "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"],
+            input=data, capture_output=True, timeout=FFMPEG_TIMEOUT,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", "replace").strip() or "ffmpeg failed")
+    return result.stdout
 
-    for url in audio_urls:
-        try:
-            # Tải về file mp3 tạm thời
-            response = requests.get(url)
-            print(response)
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_mp3:
-                temp_mp3.write(response.content)
-                mp3_path = temp_mp3.name
 
-            print(f"🎧 Đã tải về mp3: {mp3_path}")
+UNRECOGNIZED_AUDIO = "⚠️ Không thể nhận dạng nội dung âm thanh."
 
-            # Chuyển sang wav
-            wav_path = mp3_path.replace(".mp3", ".wav")
-            audio = AudioSegment.from_mp3(mp3_path)
-            audio.export(wav_path, format="wav")
 
-            print(f"🔄 Đã chuyển sang wav: {wav_path}")
+def transcribe_audio_bytes(data):
+    """
+    Nhận dạng nội dung một file mp3 đã tải. Lỗi được raise (không cache), kể cả
+    sr.UnknownValueError: thông báo lỗi không được lưu như một transcript.
+    """
+    audio_data = sr.AudioData(mp3_to_pcm(data), SAMPLE_RATE, 2)
+    text = sr.Recognizer().recognize_google(audio_data, language='en-US')
+    return text.strip()
 
-            # Dùng speech_recognition nhận dạng
-            with sr.AudioFile(wav_path) as source:
-                audio_data = recognizer.record(source)
-                try:
-                    text = recognizer.recognize_google(audio_data, language='en-US')
-                    print(f"🗣️  Nhận dạng: {text}")
-                    transcripts.append(text.strip())
-                except sr.UnknownValueError:
-                    transcripts.append("⚠️ Không thể nhận dạng nội dung âm thanh.")
-                except sr.RequestError as e:
-                    transcripts.append(f"❌ Lỗi kết nối tới Google API: {e}")
 
-            os.remove(mp3_path)
-            os.remove(wav_path)
+def transcribe_audio_url(url):
+    """
+    Văn bản của một file audio, lấy từ cache transcript nếu nội dung chưa đổi
+    (transcript_cache.py); lỗi trả về dạng thông báo như trước.
+    """
+    try:
+        return get_transcript(MediaTranscript.AUDIO, url, transcribe_audio_bytes)
+    except sr.UnknownValueError:
+        return UNRECOGNIZED_AUDIO
+    except sr.RequestError as e:
+        return f"❌ Lỗi kết nối tới Google API: {e}"
+    except Exception as e:
+        return f"❌ Không xử lý được audio từ {url}: {str(e)}"
 
-        except Exception as e:
-            transcripts.append(f"❌ Không xử lý được audio từ {url}: {str(e)}")
 
-    return "\n".join(transcripts)
+def transcribe_audio_from_urls(audio_urls):
+    """
+    Nhận danh sách URL audio, trích xuất văn bản bằng Google Speech Recognition.
+    Các file được tải và nhận dạng song song (media.run_all).
+    """
+    return TRANSCRIPT_SEPARATOR.join(run_all([(transcribe_audio_url, url) for url in as_list(audio_urls)]))
@@ -0,0 +1,76 @@
+# EStudyApp/generateAI/media.py
+"""
+Hạ tầng dùng chung cho xử lý media (audio.py, ocr.py):
+
+- Một requests.Session có pool kết nối cho mọi lần tải audio/ảnh (tái sử dụng kết nối TLS).
+- Một pool luồng I/O chạy song song tải file và gọi API nhận dạng.
+- Việc nặng CPU (ffmpeg, tesseract) chạy ở process con, số process đồng thời
+  bị giới hạn bởi cpu_slot() để nhiều request không làm quá tải máy.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+IO_WORKERS = 8
+CPU_WORKERS = max(1, min(4, os.cpu_count() or 1))
+DOWNLOAD_TIMEOUT = 10
+
+_session = None
+_session_lock = threading.Lock()
+_cpu_slots = threading.BoundedSemaphore(CPU_WORKERS)
+_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="media")
+
+
+def http_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=IO_WORKERS,
+                    pool_maxsize=IO_WORKERS,
+                    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504)),
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def fetch_response(url, headers=None):
+    """GET `url` (có thể kèm header điều kiện); 304 Not Modified không bị coi là lỗi."""
+    response = http_session().get(url, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+    if response.status_code != 304:
+        response.raise_for_status()
+    return response
+
+
+def fetch(url):
+    """Tải nội dung `url` vào bộ nhớ (không ghi file tạm)."""
+    return fetch_response(url).content
+
+
+def cpu_slot():
+    """Giữ một chỗ chạy ffmpeg/tesseract: `with cpu_slot(): ...`."""
+    return _cpu_slots
+
+
+def as_list(urls):
+    if not urls:
+        return []
+    return urls if isinstance(urls, list) else [urls]
+
+
+def submit_all(tasks):
+    """Đưa các (hàm, tham số) vào pool I/O, trả về danh sách future theo đúng thứ tự."""
+    return [_executor.submit(func, arg) for func, arg in tasks]
+
+
+def run_all(tasks):
+    """Chạy song song các (hàm, tham số) trên pool I/O, trả kết quả theo đúng thứ tự."""
+    return [future.result() for future in submit_all(tasks)]
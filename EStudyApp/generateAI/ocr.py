@@ -7,6 +7,10 @@ import logging
 import platform
 from io import BytesIO
 
+from EStudyApp.generateAI.media import as_list, cpu_slot, run_all
+from EStudyApp.generateAI.transcript_cache import get_transcript
+from EStudyApp.models import MediaTranscript
+
 # Thiết lập logging cho ứng dụng
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -34,33 +38,36 @@ except ImportError:
     logging.warning("pytesseract module not available. OCR functionality will be limited.")
 
 
-def extract_text_from_image_urls(image_urls):
+OCR_SEPARATOR = "\n\n---\n\n"
+
+
+def ocr_image_bytes(data):
+    with cpu_slot():
+        image = Image.open(BytesIO(data)).convert("RGB")  # đảm bảo ảnh ở đúng mode
+        text = pytesseract.image_to_string(image)
+    return text.strip() or "[Ảnh không có văn bản rõ ràng]"
+
+
+def extract_text_from_image_url(url):
     """
-    Nhận danh sách URL ảnh, trả về nội dung văn bản trích xuất bằng OCR.
+    OCR một ảnh, lấy từ cache transcript nếu nội dung chưa đổi (transcript_cache.py);
+    lỗi trả về dạng thông báo như trước.
     """
-    if not isinstance(image_urls, list):
-        image_urls = [image_urls]
-
-    extracted_texts = []
-    
     if not TESSERACT_AVAILABLE:
-        # Return a placeholder message when Tesseract is not available
-        for url in image_urls:
-            extracted_texts.append(f"[OCR không khả dụng - hình ảnh: {url}]")
-        return "\n\n---\n\n".join(extracted_texts)
-    
-    for url in image_urls:
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()  # kiểm tra lỗi HTTP
-            image = Image.open(BytesIO(response.content)).convert("RGB")  # đảm bảo ảnh ở đúng mode
-            text = pytesseract.image_to_string(image)
-            extracted_texts.append(text.strip() or "[Ảnh không có văn bản rõ ràng]")
-        except UnidentifiedImageError:
-            extracted_texts.append(f"❌ Không thể nhận diện định dạng ảnh từ: {url}")
-        except requests.exceptions.RequestException as e:
-            extracted_texts.append(f"❌ Lỗi tải ảnh từ {url}: {str(e)}")
-        except Exception as e:
-            extracted_texts.append(f"⚠️ Lỗi không xác định với {url}: {str(e)}")
+        return f"[OCR không khả dụng - hình ảnh: {url}]"
+    try:
+        return get_transcript(MediaTranscript.IMAGE, url, ocr_image_bytes)
+    except UnidentifiedImageError:
+        return f"❌ Không thể nhận diện định dạng ảnh từ: {url}"
+    except requests.exceptions.RequestException as e:
+        return f"❌ Lỗi tải ảnh từ {url}: {str(e)}"
+    except Exception as e:
+        return f"⚠️ Lỗi không xác định với {url}: {str(e)}"
+
 
-    return "\n\n---\n\n".join(extracted_texts)
+def extract_text_from_image_urls(image_urls):
+    """
+    Nhận danh sách URL ảnh, trả về nội dung văn bản trích xuất bằng OCR.
+    Các ảnh được tải và OCR song song (media.run_all).
+    """
+    return OCR_SEPARATOR.join(run_all([(extract_text_from_image_url, url) for url in as_list(image_urls)]))
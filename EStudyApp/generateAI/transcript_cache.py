@@ -0,0 +1,97 @@
+# EStudyApp/generateAI/transcript_cache.py
+"""
+Cache bền (bảng MediaTranscript) cho văn bản nhận dạng giọng nói và OCR, dùng chung
+cho audio.py và ocr.py. Khóa theo URL và SHA-256 nội dung:
+
+- Bản ghi của URL được xác nhận trong REVALIDATE_AFTER -> dùng ngay, không tải file.
+- Quá hạn -> GET kèm If-None-Match / If-Modified-Since; 304 -> dùng lại văn bản cũ.
+- File tải về có cùng SHA-256 với file đã xử lý (kể cả ở URL khác) -> dùng lại văn bản.
+- Bảng giữ tối đa MAX_ENTRIES bản ghi, bỏ bản ghi lâu không dùng nhất (LRU theo last_used_at).
+
+Chỉ kết quả xử lý thành công mới được lưu; lỗi tải file hoặc lỗi gọi API không được cache.
+"""
+import hashlib
+import itertools
+from datetime import timedelta
+
+from django.db import IntegrityError, close_old_connections
+from django.utils import timezone
+
+from EStudyApp.generateAI.media import fetch_response
+from EStudyApp.models import MediaTranscript
+
+REVALIDATE_AFTER = timedelta(days=7)
+TOUCH_INTERVAL = timedelta(hours=1)  # Không ghi last_used_at mỗi lần đọc
+MAX_ENTRIES = 20000
+EVICT_EVERY = 100  # Kiểm tra giới hạn sau mỗi EVICT_EVERY bản ghi mới
+
+_created = itertools.count(1)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _touch(entry, now, **fields):
+    fields.setdefault('last_used_at', now)
+    if 'verified_at' in fields or now - entry.last_used_at >= TOUCH_INTERVAL:
+        MediaTranscript.objects.filter(id=entry.id).update(**fields)
+
+
+def evict(max_entries=MAX_ENTRIES):
+    """Xóa các bản ghi ngoài `max_entries` bản ghi dùng gần nhất."""
+    stale = list(MediaTranscript.objects.order_by('-last_used_at', '-id')
+                 .values_list('id', flat=True)[max_entries:])
+    if stale:
+        MediaTranscript.objects.filter(id__in=stale).delete()
+    return len(stale)
+
+
+def get_transcript(kind, url, process):
+    """
+    Văn bản của file media `url` loại `kind` (MediaTranscript.AUDIO / IMAGE).
+    `process(bytes) -> str` chỉ được gọi khi chưa có văn bản cho nội dung này;
+    lỗi của nó (hoặc lỗi tải file) được raise cho người gọi.
+    """
+    # Hàm chạy ở luồng của pool media, không có vòng đời request để dọn kết nối
+    close_old_connections()
+    now = timezone.now()
+    url_hash = _sha256(url.encode('utf-8'))
+    entry = MediaTranscript.objects.filter(kind=kind, url_hash=url_hash).first()
+    if entry and now - entry.verified_at < REVALIDATE_AFTER:
+        _touch(entry, now)
+        return entry.text
+
+    headers = {}
+    if entry and entry.etag:
+        headers['If-None-Match'] = entry.etag
+    if entry and entry.last_modified:
+        headers['If-Modified-Since'] = entry.last_modified
+    response = fetch_response(url, headers)
+    if entry and response.status_code == 304:
+        _touch(entry, now, verified_at=now)
+        return entry.text
+
+    content_hash = _sha256(response.content)
+    if entry and entry.content_hash == content_hash:
+        text = entry.text
+    else:
+        same_content = (MediaTranscript.objects.filter(kind=kind, content_hash=content_hash)
+                        .only('text').first())
+        text = same_content.text if same_content else process(response.content)
+
+    try:
+        _, created = MediaTranscript.objects.update_or_create(kind=kind, url_hash=url_hash, defaults={
+            'url': url,
+            'content_hash': content_hash,
+            'etag': response.headers.get('ETag', '')[:255],
+            'last_modified': response.headers.get('Last-Modified', '')[:64],
+            'text': text,
+            'verified_at': now,
+            'last_used_at': now,
+        })
+    except IntegrityError:
+        created = False  # Luồng khác vừa lưu cùng URL
+    if created and next(_created) % EVICT_EVERY == 0:
+        evict()
+    return text
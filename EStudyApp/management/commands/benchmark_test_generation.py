@@ -0,0 +1,58 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from EStudyApp.models import Test
+from EStudyApp.services.test_assembly import PART_NUMBERS, assemble_part, assemble_test, get_part_descriptions
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark: seven per-part auto requests vs one whole-test generation (all writes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def _measure(self, build):
+        """Chạy `build(test)` trong transaction rồi rollback, trả về (giây, số truy vấn)."""
+        try:
+            with transaction.atomic():
+                test = Test.objects.create(name='benchmark_test_generation')
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    build(test)
+                    elapsed = time.perf_counter() - start
+                raise _Rollback
+        except _Rollback:
+            pass
+        return elapsed, len(queries)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        descriptions = get_part_descriptions()
+
+        def per_part(test):
+            # Tương đương 7 request parts/create/<test_id>/auto, mỗi request một part
+            for part_number in PART_NUMBERS:
+                assemble_part(test, part_number, descriptions[part_number], rng=rng)
+
+        results = {'per-part x7': [], 'whole test': []}
+        for _ in range(options['rounds']):
+            results['per-part x7'].append(self._measure(per_part))
+            results['whole test'].append(self._measure(lambda test: assemble_test(test, rng=rng)))
+
+        for name, rows in results.items():
+            elapsed = sorted(seconds for seconds, _ in rows)
+            self.stdout.write(
+                f'{name:12}: median {elapsed[len(elapsed) // 2] * 1000:.1f} ms, '
+                f'best {elapsed[0] * 1000:.1f} ms, {rows[0][1]} queries')
+        per_part_best = min(seconds for seconds, _ in results['per-part x7'])
+        whole_best = min(seconds for seconds, _ in results['whole test'])
+        self.stdout.write(self.style.SUCCESS(f'speedup x{per_part_best / whole_best:.1f}'))
@@ -0,0 +1,38 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from EStudyApp.calculate_toeic import calculate_toeic_score, calculate_toeic_scores_batch
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark: scalar calculate_toeic_score loop vs calculate_toeic_scores_batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        rng = np.random.default_rng(options['seed'])
+        listening = rng.integers(0, 101, size=rows)
+        reading = rng.integers(0, 101, size=rows)
+
+        start = time.perf_counter()
+        _, _, batch_overall = calculate_toeic_scores_batch(listening, reading)
+        batch_elapsed = time.perf_counter() - start
+
+        listening_list, reading_list = listening.tolist(), reading.tolist()
+        start = time.perf_counter()
+        scalar_overall = [calculate_toeic_score(l, r)[2] for l, r in zip(listening_list, reading_list)]
+        scalar_elapsed = time.perf_counter() - start
+
+        if batch_overall.tolist() != scalar_overall:
+            self.stdout.write(self.style.ERROR('Batch và scalar cho kết quả khác nhau'))
+            return
+
+        self.stdout.write(f'rows={rows}')
+        self.stdout.write(f'scalar: {scalar_elapsed:.3f}s ({rows / scalar_elapsed:,.0f} rows/s)')
+        self.stdout.write(f'batch : {batch_elapsed:.3f}s ({rows / batch_elapsed:,.0f} rows/s)')
+        self.stdout.write(self.style.SUCCESS(f'speedup x{scalar_elapsed / batch_elapsed:.1f}'))
@@ -1,9 +1,8 @@
-import json
 import os
 
 from django.core.management.base import BaseCommand
-from EStudyApp.models import Test, Part, PartDescription, QuestionSet, Question
-from question_bank.models import QuestionBank, QuestionSetBank
+from EStudyApp.models import Test
+from EStudyApp.services.test_import import import_test_files
 
 
 class Command(BaseCommand):
@@ -18,7 +17,6 @@ class Command(BaseCommand):
                             help='Test ID')
 
     def handle(self, *args, **kwargs):
-        from_ques = 1
         base_dir = os.path.abspath(os.path.dirname(
             __file__))  # Lấy thư mục chứa file lệnh
         test_json_path = os.path.join(
@@ -37,181 +35,18 @@ class Command(BaseCommand):
                 f"Answer JSON file not found: {answer_json_path}"))
             return
 
-            # Load test questions from JSON
-        with open(test_json_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-
-            # Load correct answers from JSON
-        with open(answer_json_path, 'r', encoding='utf-8') as file:
-            answer_data = json.load(file)
-
-        correct_answers = {}
-        # Bỏ qua phần tử đầu tiên (là một chuỗi tiêu đề)
-        for part_data in answer_data[1:]:
-            # Lưu tên Part (nếu cần dùng sau này)
-            part_name = part_data["Part"]
-            for q in part_data["Danh sách câu hỏi"]:
-                correct_answers[q["question_number"]] = q["correct_answer"]
+        def report(stats):
+            progress = stats.as_dict()
+            self.stdout.write(self.style.SUCCESS(
+                f"Part {progress['parts']} imported: {progress['question_sets']} question sets, "
+                f"{progress['questions']} questions ({progress['percent']}%)"))
 
-        # Create the test entry
-        # test = Test.objects.create(
-        #     name=data["title"],
-        #     types="Online",
-        #     publish=True
-        # )
-        test = Test.objects.get(id=test_id)
-        if test is None:
+        try:
+            import_test_files(test_id, test_json_path, answer_json_path, progress=report)
+        except Test.DoesNotExist:
             self.stdout.write(self.style.ERROR(
                 f"Test not found: {test_id}"))
             raise Exception(f"Test not found: {test_id}")
 
-        # Iterate through parts and questions
-        for part_name, questions in data["questions_by_part"].items():
-            part_desc, _ = PartDescription.objects.get_or_create(
-                part_name=part_name,
-                defaults={"part_description": ""}
-            )
-            part = Part.objects.create(test=test, part_description=part_desc)
-            self.stdout.write(self.style.SUCCESS(
-                f"Part created: {part.part_description}"))
-            # Nhóm các câu hỏi có cùng image/audio/page vào một QuestionSet
-            grouped_questions = {}
-            for question_data in questions:
-                # Create a unique key string from the image, audio, and page values
-                image = ','.join(question_data.get("image", [])) or ''
-                audio = ','.join(question_data.get("audio", [])) or ''
-                page = question_data.get("page", "")
-                key = f"{image}_{audio}_{page}"
-
-                if key not in grouped_questions:
-                    grouped_questions[key] = {
-                        'image': image,
-                        'audio': audio,
-                        'page': page,
-                        'questions': []
-                    }
-                grouped_questions[key]['questions'].append(question_data)
-
-            # Create QuestionSets and Questions
-            for key, group_data in grouped_questions.items():
-                # Tạo QuestionSet cho nhóm câu hỏi này
-                if part.part_description.id == 1 or part.part_description.id == 2 or part.part_description.id == 5:
-
-                    # add questionset
-                    question_set = QuestionSet.objects.create(
-                        test=test,
-                        part=part,
-                        from_ques=question_data["question_number"],
-                        to_ques=question_data["question_number"],
-                        image=group_data['image'],
-                        audio=group_data['audio'],
-                        page=group_data['page']
-                    )
-                    
-                    # add question set bank
-                    question_set_bank = QuestionSetBank.objects.create(
-                        part_description=part.part_description,
-                        image=group_data['image'],
-                        audio=group_data['audio'],
-                        page=group_data['page'],
-                        note=f"Question set {question_set.id}",
-                        from_ques=question_data["question_number"],
-                        to_ques=question_data["question_number"],
-                    )
-
-                    # Create questions for this QuestionSet
-                    for question_data in group_data['questions']:
-                        # Get correct answer for the current question number
-                        question_number = int(question_data["question_number"])
-                        correct_answer = correct_answers[question_data["question_number"]]
-                        question = Question.objects.create(
-                            test=test,
-                            question_set=question_set,
-                            part=part,
-                            question_number=question_number,
-                            question_text=question_data.get(
-                                "question_text", ""),
-                            answers=question_data.get("answers", {}),
-                            correct_answer=correct_answer,
-                        )
-                        
-                        # add question bank
-                        question_bank = QuestionBank.objects.create(
-                            question_set=question_set_bank,
-                            part_description=part.part_description,
-                            question_number=question_number,
-                            question_text=question_data.get(
-                                "question_text", ""),
-                            answers=question_data.get("answers", {}),
-                            correct_answer=correct_answer,
-                        )
-                        
-                        from_ques += 1
-
-                        self.stdout.write(self.style.SUCCESS(
-                            f"Question created: {question.question_number}"))
-                        self.stdout.write(self.style.SUCCESS(
-                            f"Question bank created: {question_bank.question_number}"))
-
-                if part.part_description.id == 3 or part.part_description.id == 4 or part.part_description.id == 6 or part.part_description.id == 7 or part.part_description.id == 8 or part.part_description.id == 9 or part.part_description.id == 10 or part.part_description.id == 11 or part.part_description.id == 12:
-                    question_set = QuestionSet.objects.create(
-                        test=test,
-                        part=part,
-                        from_ques=from_ques,
-                        to_ques=from_ques + group_data['questions'][0]['question_set'],
-                        image=group_data['image'],
-                        audio=group_data['audio'],
-                        page=group_data['page']
-                    )
-                    
-                    # add question set bank
-                    question_set_bank_2 = QuestionSetBank.objects.create(
-                        part_description=part.part_description,
-                        from_ques=from_ques,
-                        to_ques=from_ques + group_data['questions'][0]['question_set'],
-                        image=group_data['image'],
-                        audio=group_data['audio'],
-                        page=group_data['page'],
-                        note=f"Question set {question_set.id}"
-                    )
-                        
-
-                    self.stdout.write(self.style.SUCCESS(
-                        f"QuestionSet created: {question_set.id}"))
-
-                    for questions_data in group_data['questions']:
-                        from_ques = int(questions_data['questions'][0]['question_number'])
-                        for question_data in questions_data['questions']:
-                            correct_answer = correct_answers[question_data["question_number"]]
-                            question = Question.objects.create(
-                                test=test,
-                                question_set=question_set,
-                                part=part,
-                                question_number=question_data["question_number"],
-                                question_text=question_data.get(
-                                    "question_text", ""),
-                                answers=question_data.get("answers", {}),
-                                correct_answer=correct_answer,
-                            )
-                            
-                            # add question bank
-                            question_bank = QuestionBank.objects.create(
-                                question_set=question_set_bank_2,
-                                part_description=part.part_description,
-                                question_number=question_data["question_number"],
-                                question_text=question_data.get(
-                                    "question_text", ""),
-                                answers=question_data.get("answers", {}),
-                                correct_answer=correct_answer,
-                            )
-                            
-                            question_set.to_ques = question_data["question_number"] 
-                            question_set_bank_2.to_ques = question_data["question_number"]
-                            from_ques += 1
-                            question_set.save()
-                            question_set_bank_2.save()
-                            self.stdout.write(self.style.SUCCESS(
-                                f"Question created: {question.question_number}"))
-
         self.stdout.write(self.style.SUCCESS(
-            'Successfully imported test data with correct answers!'))
\ No newline at end of file
+            'Successfully imported test data with correct answers!'))
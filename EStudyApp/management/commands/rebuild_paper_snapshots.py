@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from EStudyApp.models import Test
+from EStudyApp.services.paper_snapshot import rebuild_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Pre-render compressed paper snapshots used by TestDetailView/TestPartDetailView'
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_ids', nargs='*', type=int, help='Chỉ dựng các đề này (mặc định: các đề đã xuất bản)')
+
+    def handle(self, *args, **options):
+        test_ids = options['test_ids'] or list(
+            Test.objects.filter(publish=True).order_by('id').values_list('id', flat=True))
+
+        built = 0
+        for test_id in test_ids:
+            started = time.monotonic()
+            snapshot = rebuild_snapshot(test_id)
+            if snapshot is None:
+                self.stdout.write(self.style.WARNING(f'Test {test_id}: không tồn tại'))
+                continue
+            built += 1
+            self.stdout.write(
+                f'Test {test_id}: {len(snapshot.body)} bytes (gzip), ETag {snapshot.etag[:12]}, '
+                f'{(time.monotonic() - started) * 1000:.0f} ms')
+        self.stdout.write(self.style.SUCCESS(f'Đã dựng {built} bản chụp'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from EStudyApp.services.test_counters import find_counter_drift, refresh_part_counters, refresh_test_counters
+
+
+class Command(BaseCommand):
+    help = 'Detect drift in Test.part_total/question_total and Part.question_count and recompute them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_ids', nargs='*', type=int, help='Chỉ kiểm tra các đề này (mặc định: tất cả)')
+        parser.add_argument('--check', action='store_true', help='Chỉ báo cáo độ lệch, không sửa')
+
+    def handle(self, *args, **options):
+        test_drift, part_drift = find_counter_drift(options['test_ids'])
+
+        for row in test_drift:
+            self.stdout.write(
+                f"Test {row['id']}: part_total {row['part_total']} -> {row['actual_part_total']}, "
+                f"question_total {row['question_total']} -> {row['actual_question_total']}"
+            )
+        for row in part_drift:
+            self.stdout.write(
+                f"Part {row['id']} (test {row['test_id']}): "
+                f"question_count {row['question_count']} -> {row['actual_question_count']}"
+            )
+
+        if not test_drift and not part_drift:
+            self.stdout.write(self.style.SUCCESS('Không có bộ đếm nào bị lệch'))
+            return
+
+        if options['check']:
+            self.stdout.write(self.style.WARNING(
+                f'{len(test_drift)} đề và {len(part_drift)} part bị lệch (chạy lại không có --check để sửa)'))
+            return
+
+        refresh_part_counters(row['id'] for row in part_drift)
+        refresh_test_counters(row['id'] for row in test_drift)
+        self.stdout.write(self.style.SUCCESS(
+            f'Đã tính lại {len(test_drift)} đề và {len(part_drift)} part'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from EStudyApp.models import Test
+from EStudyApp.services.rescore_service import DEFAULT_CHUNK_SIZE, rescore_test
+
+
+class Command(BaseCommand):
+    help = 'Re-grade History/HistoryTraining of the given tests against the current answer key'
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_ids', nargs='+', type=int, help='ID của các đề cần chấm lại')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Số bản ghi đọc/ghi mỗi lô')
+        parser.add_argument('--skip-training', action='store_true',
+                            help='Không chấm lại HistoryTraining')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size <= 0:
+            raise CommandError('--chunk-size phải lớn hơn 0')
+
+        for test_id in options['test_ids']:
+            try:
+                results = rescore_test(
+                    test_id,
+                    chunk_size=chunk_size,
+                    include_training=not options['skip_training'],
+                    progress=lambda stats: self.stdout.write(str(stats)),
+                )
+            except Test.DoesNotExist:
+                self.stdout.write(self.style.ERROR(f'Test {test_id} not found'))
+                continue
+
+            for stats in results:
+                self.stdout.write(self.style.SUCCESS(f'Done {stats}'))
@@ -0,0 +1,29 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from EStudyApp.services.jobs import JOB_TYPES, Worker
+
+
+class Command(BaseCommand):
+    help = 'Run background job worker (import test, auto-generate parts, AI question analysis)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--types', nargs='*', choices=sorted(JOB_TYPES),
+                            help='Chỉ chạy các loại job này (mặc định: tất cả)')
+        parser.add_argument('--threads', type=int, default=4, help='Số job chạy đồng thời trong worker')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Giây chờ khi hàng đợi trống')
+        parser.add_argument('--burst', action='store_true', help='Thoát khi không còn job')
+
+    def handle(self, *args, **options):
+        try:
+            worker = Worker(options['types'], threads=options['threads'], poll_interval=options['poll_interval'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Dừng nhận job mới khi nhận SIGTERM, job đang chạy được chạy xong
+        signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+
+        self.stdout.write(f"Worker started: {', '.join(worker.job_types)} ({worker.threads} threads)")
+        worker.run(burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
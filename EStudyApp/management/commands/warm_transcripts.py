@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from EStudyApp.generateAI.audio import transcribe_audio_url
+from EStudyApp.generateAI.media import run_all
+from EStudyApp.generateAI.ocr import extract_text_from_image_url
+from EStudyApp.models import MediaTranscript
+from question_bank.models import QuestionSetBank
+
+
+def split_urls(value):
+    # audio/image của bộ câu hỏi lưu dạng "url1,url2" (xem services/test_import.py)
+    return [url.strip() for url in (value or '').split(',') if url.strip().startswith('http')]
+
+
+class Command(BaseCommand):
+    help = 'Pre-warm the OCR/speech transcript cache for every question set in the question bank'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=[MediaTranscript.AUDIO, MediaTranscript.IMAGE],
+                            help='Chỉ xử lý audio hoặc ảnh (mặc định: cả hai)')
+        parser.add_argument('--batch-size', type=int, default=50, help='Số file xử lý song song mỗi lượt')
+
+    def handle(self, *args, **options):
+        audio_urls, image_urls = {}, {}
+        for audio, image in (QuestionSetBank.objects.filter(deleted_at__isnull=True)
+                             .values_list('audio', 'image').iterator()):
+            audio_urls.update(dict.fromkeys(split_urls(audio)))
+            image_urls.update(dict.fromkeys(split_urls(image)))
+
+        tasks = []
+        if options['kind'] in (None, MediaTranscript.AUDIO):
+            tasks += [(transcribe_audio_url, url) for url in audio_urls]
+        if options['kind'] in (None, MediaTranscript.IMAGE):
+            tasks += [(extract_text_from_image_url, url) for url in image_urls]
+
+        before = MediaTranscript.objects.count()
+        started = time.monotonic()
+        batch_size = max(1, options['batch_size'])
+        for offset in range(0, len(tasks), batch_size):
+            run_all(tasks[offset:offset + batch_size])
+            self.stdout.write(f'{min(offset + batch_size, len(tasks))}/{len(tasks)} files '
+                              f'({time.monotonic() - started:.0f}s)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Đã xử lý {len(tasks)} file, thêm {MediaTranscript.objects.count() - before} transcript mới'))
@@ -0,0 +1,50 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Test = apps.get_model('EStudyApp', 'Test')
+    Part = apps.get_model('EStudyApp', 'Part')
+    Question = apps.get_model('EStudyApp', 'Question')
+
+    Part.objects.update(question_count=Coalesce(Subquery(
+        Question.objects.filter(part=OuterRef('pk')).order_by()
+        .values('part').annotate(total=Count('id')).values('total')
+    ), 0))
+    Test.objects.update(
+        part_total=Coalesce(Subquery(
+            Part.objects.filter(test=OuterRef('pk')).order_by()
+            .values('test').annotate(total=Count('id')).values('total')
+        ), 0),
+        question_total=Coalesce(Subquery(
+            Question.objects.filter(test=OuterRef('pk')).order_by()
+            .values('test').annotate(total=Count('id')).values('total')
+        ), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EStudyApp', '0037_state_time_start'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='part_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='question_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='part',
+            name='question_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EStudyApp', '0038_test_part_total_test_question_total_part_question_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaTranscript',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('audio', 'Audio'), ('image', 'Image')], max_length=10)),
+                ('url', models.TextField()),
+                ('url_hash', models.CharField(max_length=64)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('etag', models.CharField(blank=True, default='', max_length=255)),
+                ('last_modified', models.CharField(blank=True, default='', max_length=64)),
+                ('text', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('verified_at', models.DateTimeField()),
+                ('last_used_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'content_hash'], name='media_transcript_content_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'url_hash'), name='media_transcript_kind_url_uniq')],
+            },
+        ),
+    ]
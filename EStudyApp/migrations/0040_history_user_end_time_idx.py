@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EStudyApp', '0039_mediatranscript'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='history',
+            index=models.Index(fields=['user', '-end_time'], name='history_user_end_time_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_question_test(apps, schema_editor):
+    """Câu hỏi tạo từ màn sửa part chỉ có part -> gắn test của part để question_total đếm đủ."""
+    Test = apps.get_model('EStudyApp', 'Test')
+    Part = apps.get_model('EStudyApp', 'Part')
+    Question = apps.get_model('EStudyApp', 'Question')
+
+    Question.objects.filter(test__isnull=True, part__test__isnull=False).update(
+        test=Subquery(Part.objects.filter(id=OuterRef('part_id')).values('test_id')[:1])
+    )
+    Test.objects.update(question_total=Coalesce(Subquery(
+        Question.objects.filter(test=OuterRef('pk')).order_by()
+        .values('test').annotate(total=Count('id')).values('total')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EStudyApp', '0040_history_user_end_time_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_question_test, migrations.RunPython.noop),
+    ]
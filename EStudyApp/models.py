@@ -99,17 +99,12 @@ class Test(BaseModel):
         null=True
     )
 
+    # Bộ đếm lưu sẵn, cập nhật bởi EStudyApp/signals.py và services/test_counters.py
+    part_total = models.IntegerField(default=0)
+    question_total = models.IntegerField(default=0)
+
     def __str__(self):
         return self.name
-    
-    @property
-    def part_total(self):
-        return Part.objects.filter(test=self).count()
-    
-    @property
-    def question_total(self):
-        question_total = Question.objects.filter(test=self).count()
-        return question_total
         
     def update_publish_status(self):
         """
@@ -240,7 +235,8 @@ class Part(models.Model):
         PartDescription, related_name='part_part_description', on_delete=models.CASCADE, null=True, blank=False)
     test = models.ForeignKey(
         Test, related_name='part_test', on_delete=models.CASCADE, null=True, blank=True)
-    pass
+    # Số câu hỏi thuộc part, cập nhật bởi signals
+    question_count = models.IntegerField(default=0)
 
     def __str__(self):
         return f'{self.part_description} - {self.test}'
@@ -399,6 +395,12 @@ class History(BaseModel):
     complete = models.BooleanField(default=False)
     test_result = models.JSONField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Các bài thi gần nhất của một user (services/result_summary.py)
+            models.Index(fields=['user', '-end_time'], name='history_user_end_time_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.test}"
 
@@ -526,3 +528,38 @@ class State(BaseModel):
     used = models.BooleanField(
         default=False
     )
+
+
+class MediaTranscript(models.Model):
+    """
+    Văn bản OCR / nhận dạng giọng nói của một file media (generateAI/transcript_cache.py),
+    khóa theo URL và SHA-256 nội dung.
+    """
+    AUDIO = 'audio'
+    IMAGE = 'image'
+    KIND_CHOICES = [
+        (AUDIO, 'Audio'),
+        (IMAGE, 'Image'),
+    ]
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    url = models.TextField()
+    url_hash = models.CharField(max_length=64)
+    content_hash = models.CharField(max_length=64)
+    etag = models.CharField(max_length=255, blank=True, default='')
+    last_modified = models.CharField(max_length=64, blank=True, default='')
+    text = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    verified_at = models.DateTimeField()  # Lần cuối xác nhận nội dung URL chưa đổi
+    last_used_at = models.DateTimeField(db_index=True)  # Dùng cho LRU
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'url_hash'], name='media_transcript_kind_url_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'content_hash'], name='media_transcript_content_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}: {self.url}"
+
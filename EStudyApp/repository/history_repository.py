@@ -1,27 +1,58 @@
-from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
 from EStudyApp.models import History, User
 
+# Cột cần cho bảng kết quả; không đọc cột JSON test_result
+RESULT_FIELDS = ("user_id", "test__name", "score", "listening_score", "reading_score", "end_time")
+
+
 class HistoryRepository:
 
-    def get_latest_results_by_student(self, student_identifier, limit=3):
+    def resolve_students(self, student_identifiers):
         """
-        Lấy kết quả 3 bài thi gần nhất của sinh viên chỉ định.
-        student_identifier: có thể là user_id (int) hoặc username (str)
+        Tìm nhiều sinh viên trong một truy vấn (khóa chính + index unique của username).
+        student_identifiers: user_id (int / chuỗi số) hoặc username (str)
+        Trả về {identifier (str): (user_id, username)}, bỏ qua identifier không tồn tại.
         """
-        try:
-            # Xác định student dựa vào ID hoặc username
-            if isinstance(student_identifier, int) or str(student_identifier).isdigit():
-                student = User.objects.get(id=int(student_identifier))
-            else:
-                student = User.objects.get(username=student_identifier)
+        identifiers = {str(identifier).strip() for identifier in student_identifiers}
+        ids = {int(identifier) for identifier in identifiers if identifier.isdigit()}
+        usernames = identifiers - {str(user_id) for user_id in ids}
+        if not ids and not usernames:
+            return {}
+
+        rows = User.objects.filter(Q(id__in=ids) | Q(username__in=usernames)).values_list("id", "username")
+        by_id = {str(user_id): (user_id, username) for user_id, username in rows}
+        by_username = {username: (user_id, username) for user_id, username in rows}
+        resolved = {}
+        for identifier in identifiers:
+            student = by_id.get(identifier) if identifier.isdigit() else by_username.get(identifier)
+            if student:
+                resolved[identifier] = student
+        return resolved
 
-        except ObjectDoesNotExist:
-            return History.objects.none()  # Không tìm thấy thì trả về queryset rỗng
+    def get_latest_results_by_students(self, user_ids, limit=3):
+        """
+        `limit` bài thi gần nhất của mỗi sinh viên trong một truy vấn (ROW_NUMBER theo user,
+        dùng index (user, -end_time)). Giống truy vấn cũ theo từng sinh viên: gồm cả bài chưa
+        hoàn thành, sắp theo -end_time.
+        Trả về {user_id: [dict các cột RESULT_FIELDS, mới nhất trước]}
+        """
+        results = {user_id: [] for user_id in user_ids}
+        if not results:
+            return results
 
-        # Lấy lịch sử thi
-        return (
+        rows = (
             History.objects
-            .filter(user=student)
-            .select_related("test")  # tránh query thừa
-            .order_by("-end_time")[:limit]
+            .filter(user_id__in=results)
+            .annotate(rank=Window(
+                RowNumber(),
+                partition_by=F("user_id"),
+                order_by=[F("end_time").desc(), F("id").desc()],
+            ))
+            .filter(rank__lte=limit)
+            .order_by("user_id", "rank")
+            .values(*RESULT_FIELDS)
         )
+        for row in rows:
+            results[row["user_id"]].append(row)
+        return results
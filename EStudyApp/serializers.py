@@ -131,6 +131,7 @@ class TagSerializer(serializers.ModelSerializer):
 class TestSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     latest_history = serializers.SerializerMethodField()
+    question_total = serializers.SerializerMethodField()
 
     class Meta:
         model = Test
@@ -138,6 +139,10 @@ class TestSerializer(serializers.ModelSerializer):
                   'duration', 'question_count', 'part_count', 'tags',
                   'publish', 'latest_history', 'created_at', 'updated_at', 'part_total', 'question_total']
 
+    def get_question_total(self, obj):
+        # Bộ đếm lưu sẵn trên Test, giới hạn hiển thị 200 câu như trước
+        return min(obj.question_total, 200)
+
     def get_latest_history(self, obj):
         try:
             # Get the prefetched histories
@@ -165,6 +170,7 @@ class PartListSerializer(serializers.ModelSerializer):
         model = Part
         # fields = ['part_description']
         fields = '__all__'
+        read_only_fields = ['question_count']
 
 
 # class CourseSerializer(serializers.ModelSerializer):
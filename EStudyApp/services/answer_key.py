@@ -0,0 +1,107 @@
+# EStudyApp/services/answer_key.py
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
+from django.core.cache import cache
+
+from EStudyApp.models import Test, Question
+from EStudyApp.services.cache_versions import TEST, get_generation
+
+ANSWER_KEY_TTL = 60 * 60 * 24  # Bản đáp án trong Redis sống tối đa 1 ngày
+LOCAL_CACHE_SIZE = 64  # Số đề giữ trong bộ nhớ của mỗi process
+
+
+class AnswerKeyEntry(NamedTuple):
+    correct_answer: str
+    skill: Optional[str]
+    part_id: Optional[int]
+
+
+class AnswerKey:
+    """
+    Đáp án đã biên dịch của một đề thi: question_id -> (đáp án, skill, part).
+    Đối tượng bất biến, được chia sẻ giữa các request trong cùng process.
+    """
+    __slots__ = ("test_id", "version", "entries", "compiled")
+
+    def __init__(self, test_id, version, entries):
+        self.test_id = test_id
+        self.version = version
+        self.entries = MappingProxyType(dict(entries))
+        # Dạng mảng NumPy cho bộ chấm vectorized, tạo lười trong services/grading.py
+        self.compiled = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, question_id):
+        return question_id in self.entries
+
+    def get(self, question_id):
+        return self.entries.get(question_id)
+
+    def __reduce__(self):
+        # Redis lưu dạng tuple gọn, MappingProxyType không pickle được
+        return (AnswerKey, (self.test_id, self.version, tuple(self.entries.items())))
+
+
+_local_keys = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _payload_key(test_id, version):
+    return f"answer_key:{test_id}:{version}"
+
+
+def get_answer_key_version(test_id):
+    # Đáp án dùng chung generation của đề (services/cache_versions.py)
+    return get_generation(TEST, test_id)
+
+
+def build_answer_key(test_id, version=0):
+    """
+    Dựng đáp án từ DB bằng một truy vấn duy nhất.
+    Chỉ lấy các câu hỏi thuộc các Part của đề (giống cách chấm cũ dùng part_skill_map).
+    Raise Test.DoesNotExist nếu đề không tồn tại.
+    """
+    rows = list(
+        Question.objects.filter(part__test_id=test_id)
+        .values_list("id", "correct_answer", "part_id", "part__part_description__skill")
+    )
+    if not rows and not Test.objects.filter(id=test_id).exists():
+        raise Test.DoesNotExist(f"Test {test_id} not found")
+
+    entries = {
+        question_id: AnswerKeyEntry((correct_answer or "").strip().upper(), skill, part_id)
+        for question_id, correct_answer, part_id, skill in rows
+    }
+    return AnswerKey(test_id, version, entries)
+
+
+def get_answer_key(test_id):
+    """
+    Lấy đáp án đã biên dịch của đề: bộ nhớ process -> Redis -> DB.
+    Khi trúng cache, việc chấm bài không cần truy vấn DB nào.
+    """
+    test_id = int(test_id)
+    version = get_answer_key_version(test_id)
+
+    with _local_lock:
+        answer_key = _local_keys.get(test_id)
+        if answer_key is not None and answer_key.version == version:
+            _local_keys.move_to_end(test_id)
+            return answer_key
+
+    answer_key = cache.get(_payload_key(test_id, version))
+    if answer_key is None:
+        answer_key = build_answer_key(test_id, version)
+        cache.set(_payload_key(test_id, version), answer_key, ANSWER_KEY_TTL)
+
+    with _local_lock:
+        _local_keys[test_id] = answer_key
+        _local_keys.move_to_end(test_id)
+        while len(_local_keys) > LOCAL_CACHE_SIZE:
+            _local_keys.popitem(last=False)
+    return answer_key
@@ -0,0 +1,97 @@
+# EStudyApp/services/cache_versions.py
+"""
+Khóa cache có phiên bản (generation) thay cho cache.delete_pattern.
+
+Mỗi phạm vi (một đề, một user, toàn bộ danh sách đề) có một generation lưu trong Redis.
+Khóa cache chứa generation hiện tại, nên tăng generation là đủ vô hiệu hóa mọi khóa cũ
+của đúng phạm vi đó trong O(1); khóa cũ tự hết hạn theo TTL.
+
+Các lần tăng trong cùng một transaction được gom lại và ghi một lần khi commit
+(import cả đề chỉ tăng generation của đề đó một lần). Django bỏ callback on_commit khi
+rollback (cả rollback savepoint chứa nó); module chỉ giữ weakref tới callback đã đăng ký,
+nên callback bị bỏ thì các lần tăng đang chờ cũng bị hủy theo và lần sau đăng ký lại.
+"""
+import threading
+import time
+import weakref
+
+from django.core.cache import cache
+from django.db import transaction
+
+TEST = "test"        # Nội dung một đề: đáp án, bản chụp đề, lịch sử làm đề đó
+USER = "user"        # Dữ liệu riêng của một user: lịch sử, điểm gần nhất trên danh sách đề
+CATALOG = "catalog"  # Danh sách đề dùng chung (mọi đề)
+BANK = "bank"        # Ngân hàng bộ câu hỏi của một part_description (dùng khi tạo đề tự động)
+CATALOG_ID = "all"
+
+_local = threading.local()
+
+
+def _generation_key(scope, ident):
+    return f"gen:{scope}:{ident}"
+
+
+def get_generation(scope, ident=CATALOG_ID):
+    return cache.get(_generation_key(scope, ident), 0)
+
+
+def get_generations(*pairs):
+    """Đọc nhiều generation trong một lượt: get_generations((TEST, 1), (USER, 7))."""
+    keys = [_generation_key(scope, ident) for scope, ident in pairs]
+    found = cache.get_many(keys)
+    return tuple(found.get(key, 0) for key in keys)
+
+
+class _FlushOnCommit:
+    def __call__(self):
+        _flush()
+
+
+def _scheduled():
+    ref = getattr(_local, "scheduled", None)
+    return ref is not None and ref() is not None
+
+
+def _pending():
+    """{scope: (idents, callbacks)} đang chờ commit của thread hiện tại."""
+    if not _scheduled():
+        # Chưa đăng ký, hoặc callback đã bị bỏ do rollback -> không còn gì đang chờ
+        _local.pending = {}
+    return _local.pending
+
+
+def _flush():
+    pending = _pending()
+    _local.pending, _local.scheduled = {}, None
+    if not pending:
+        return
+    # time_ns thay vì incr: generation không bao giờ quay về giá trị cũ kể cả khi key bị evict
+    generation = time.time_ns()
+    cache.set_many({
+        _generation_key(scope, ident): generation
+        for scope, (idents, _) in pending.items() for ident in idents
+    }, None)
+    for scope, (idents, callbacks) in pending.items():
+        for callback in callbacks:
+            callback(idents)
+
+
+def bump_generations(scope, idents, then=None):
+    """
+    Vô hiệu hóa cache của các `idents` trong `scope` sau khi transaction hiện tại commit
+    (ngay lập tức nếu không ở trong transaction). `then(idents)` được gọi sau khi ghi,
+    mỗi callback một lần cho cả transaction.
+    """
+    idents = {ident for ident in idents if ident is not None}
+    if not idents:
+        return
+    scope_idents, callbacks = _pending().setdefault(scope, (set(), []))
+    scope_idents.update(idents)
+    if then is not None and then not in callbacks:
+        callbacks.append(then)
+    if not _scheduled():
+        # Django giữ tham chiếu duy nhất: weakref chết khi callback bị bỏ lúc rollback.
+        # Gán trước on_commit vì ngoài transaction callback chạy ngay.
+        callback = _FlushOnCommit()
+        _local.scheduled = weakref.ref(callback)
+        transaction.on_commit(callback)
@@ -0,0 +1,79 @@
+# EStudyApp/services/catalog_cache.py
+"""
+Cache hai lớp cho danh sách đề (TestListView):
+
+- Lớp chung: trang danh sách đã serialize, không chứa dữ liệu riêng của ai,
+  khóa theo bộ lọc type/skills/tag_ids/name/page -> mọi người dùng dùng chung.
+- Lớp riêng: map test_id -> lần làm mới nhất của từng user, rất nhỏ,
+  ghép vào trang chung lúc trả response.
+
+Hai lớp dùng khóa có generation (services/cache_versions.py): đổi một đề bất kỳ thì tăng
+generation CATALOG, đổi History của user thì tăng generation USER của user đó.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import F
+
+from EStudyApp.models import History
+from EStudyApp.services.cache_versions import CATALOG, USER, get_generation
+
+CATALOG_TTL = 60 * 5
+OVERLAY_TTL = 60 * 30
+
+CATALOG_PREFIX = "test_list"
+OVERLAY_PREFIX = "test_list_overlay"
+
+FILTER_PARAMS = ("type", "skills", "tag_ids", "name", "page")
+
+
+def catalog_key(query_params):
+    """Khóa của trang chung, chỉ phụ thuộc các tham số lọc (bỏ qua tham số lạ, thứ tự)."""
+    raw = "&".join(f"{param}={(query_params.get(param) or '').strip()}" for param in FILTER_PARAMS)
+    digest = hashlib.md5(raw.encode("utf-8")).hexdigest()
+    return f"{CATALOG_PREFIX}:{get_generation(CATALOG)}:{digest}"
+
+
+def overlay_key(user_id):
+    return f"{OVERLAY_PREFIX}:{user_id}:{get_generation(USER, user_id)}"
+
+
+def get_catalog_page(query_params, build):
+    """Lấy trang danh sách chung từ cache, nếu chưa có thì gọi `build()` và lưu lại."""
+    key = catalog_key(query_params)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, CATALOG_TTL)
+    return data
+
+
+def build_user_overlay(user_id):
+    """Lần làm mới nhất của user cho mỗi đề (DISTINCT ON test_id), không đọc cột JSON."""
+    rows = (History.objects.filter(user_id=user_id)
+            .order_by('test_id', F('end_time').desc(nulls_last=True), '-id')
+            .distinct('test_id')
+            .values('id', 'test_id', 'score', 'end_time', 'listening_score', 'reading_score'))
+    return {row.pop('test_id'): row for row in rows}
+
+
+def get_user_overlay(user_id):
+    key = overlay_key(user_id)
+    overlay = cache.get(key)
+    if overlay is None:
+        overlay = build_user_overlay(user_id)
+        cache.set(key, overlay, OVERLAY_TTL)
+    return overlay
+
+
+def apply_user_overlay(data, user):
+    """
+    Ghép latest_history của `user` vào trang chung (không sửa bản trong cache).
+    Khách chưa đăng nhập nhận latest_history = None.
+    """
+    overlay = get_user_overlay(user.id) if user and user.is_authenticated else {}
+    results = data['results'] if isinstance(data, dict) else data
+    merged = [{**item, 'latest_history': overlay.get(item['id'])} for item in results]
+    if isinstance(data, dict):
+        return {**data, 'results': merged}
+    return merged
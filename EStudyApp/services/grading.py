@@ -0,0 +1,244 @@
+# EStudyApp/services/grading.py
+"""
+Bộ chấm bài vectorized dùng chung cho bài thi đầy đủ, bài luyện tập và chấm lại lịch sử.
+
+Đáp án được mã hóa thành số nguyên nhỏ (A-D -> 0-3, bỏ trống -> UNANSWERED,
+giá trị lạ -> INVALID; đáp án đúng lạ/trống -> NO_KEY, không trùng mã nào của người dùng)
+trong mảng NumPy, sau đó đếm đúng/sai/bỏ trống theo
+skill và theo part bằng một lượt np.bincount.
+"""
+import numpy as np
+
+UNANSWERED = -1
+INVALID = 4
+NO_KEY = -2  # Đáp án đúng không hợp lệ: không câu trả lời nào khớp
+
+SKILLS = ("LISTENING", "READING")
+_SKILL_CODES = {skill: index for index, skill in enumerate(SKILLS)}
+
+_ANSWER_CODES = {None: UNANSWERED}
+for _code, _letter in enumerate("ABCD"):
+    _ANSWER_CODES[_letter] = _code
+    _ANSWER_CODES[_letter.lower()] = _code
+
+
+def _answer_code(value):
+    try:
+        return _ANSWER_CODES.get(value, INVALID)
+    except TypeError:  # giá trị không hash được (list, dict...)
+        return INVALID
+
+
+def _key_code(value):
+    code = _answer_code(value)
+    return code if code not in (UNANSWERED, INVALID) else NO_KEY
+
+
+def _question_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+def encode_answers(values):
+    """Mã hóa danh sách đáp án của người dùng thành mảng int8."""
+    values = list(values)
+    return np.fromiter((_answer_code(v) for v in values), dtype=np.int8, count=len(values))
+
+
+def encode_question_ids(values):
+    values = list(values)
+    return np.fromiter((_question_id(v) for v in values), dtype=np.int64, count=len(values))
+
+
+class CompiledAnswerKey:
+    """
+    Dạng mảng của AnswerKey, sắp xếp theo question_id để tra cứu bằng searchsorted.
+    Phần tử cuối là sentinel (id lớn nhất, không skill/part) để mảng không bao giờ rỗng.
+    """
+    SENTINEL_ID = np.iinfo(np.int64).max
+
+    def __init__(self, answer_key):
+        items = sorted(answer_key.entries.items())
+        self.part_ids = np.array(
+            sorted({entry.part_id for _, entry in items if entry.part_id is not None}), dtype=np.int64)
+        part_index = {part_id: index for index, part_id in enumerate(self.part_ids.tolist())}
+
+        self.question_ids = np.array([qid for qid, _ in items] + [self.SENTINEL_ID], dtype=np.int64)
+        self.correct_codes = np.array(
+            [_key_code(entry.correct_answer) for _, entry in items] + [NO_KEY], dtype=np.int8)
+        self.skill_codes = np.array(
+            [_SKILL_CODES.get(entry.skill, -1) for _, entry in items] + [-1], dtype=np.int64)
+        self.part_codes = np.array(
+            [part_index.get(entry.part_id, -1) for _, entry in items] + [-1], dtype=np.int64)
+        self.correct_letters = np.array(
+            [entry.correct_answer for _, entry in items] + [None], dtype=object)
+
+    def locate(self, question_ids):
+        """Trả về (vị trí trong key, mask các câu có trong key)."""
+        positions = np.searchsorted(self.question_ids, question_ids)
+        positions = np.minimum(positions, len(self.question_ids) - 1)
+        found = (self.question_ids[positions] == question_ids) & (question_ids != self.SENTINEL_ID)
+        return positions, found
+
+
+def compile_answer_key(answer_key):
+    if answer_key.compiled is None:
+        answer_key.compiled = CompiledAnswerKey(answer_key)
+    return answer_key.compiled
+
+
+class GradeResult:
+    """Kết quả chấm một bài nộp."""
+
+    def __init__(self, found, correct_answers, skill_correct, skill_answered,
+                 part_ids, part_correct, part_wrong, part_unanswered):
+        self.found = found
+        self.correct_answers = correct_answers
+        self.skill_correct = skill_correct
+        self.skill_answered = skill_answered
+        self.part_ids = part_ids
+        self.part_correct = part_correct
+        self.part_wrong = part_wrong
+        self.part_unanswered = part_unanswered
+
+    @property
+    def listening_correct(self):
+        return int(self.skill_correct[0])
+
+    @property
+    def reading_correct(self):
+        return int(self.skill_correct[1])
+
+    @property
+    def listening_total(self):
+        return int(self.skill_answered[0])
+
+    @property
+    def reading_total(self):
+        return int(self.skill_answered[1])
+
+    def part_results(self):
+        """Danh sách kết quả theo part (chỉ các part có câu trong bài nộp)."""
+        results = []
+        for index, part_id in enumerate(self.part_ids):
+            correct = int(self.part_correct[index])
+            wrong = int(self.part_wrong[index])
+            unanswered = int(self.part_unanswered[index])
+            if correct + wrong + unanswered == 0:
+                continue
+            results.append({
+                "part_id": int(part_id),
+                "correct_answers": correct,
+                "wrong_answers": wrong,
+                "unanswer_questions": unanswered,
+                "percentage_score": (correct / (correct + wrong)) * 100 if correct + wrong > 0 else 0,
+            })
+        return results
+
+    def annotate(self, items):
+        """Ghi correct_answer vào từng câu của bài nộp (giữ format test_result cũ)."""
+        for item, found, correct_answer in zip(items, self.found, self.correct_answers):
+            if found:
+                item["correct_answer"] = correct_answer
+        return items
+
+
+def grade(answer_key, items):
+    """
+    Chấm một bài nộp `items` = [{"id": ..., "user_answer": ...}, ...] theo `answer_key`.
+    Câu không có trong đáp án bị bỏ qua.
+    """
+    compiled = compile_answer_key(answer_key)
+    question_ids = encode_question_ids(item.get("id") for item in items)
+    answers = encode_answers(item.get("user_answer") for item in items)
+    positions, found = compiled.locate(question_ids)
+
+    skills = compiled.skill_codes[positions]
+    parts = compiled.part_codes[positions]
+    answered = found & (answers != UNANSWERED)
+    correct = answered & (answers == compiled.correct_codes[positions])
+    unanswered = found & (answers == UNANSWERED)
+
+    has_skill = skills >= 0
+    skill_correct = np.bincount(skills[correct & has_skill], minlength=len(SKILLS))
+    skill_answered = np.bincount(skills[answered & has_skill], minlength=len(SKILLS))
+
+    n_parts = len(compiled.part_ids)
+    has_part = parts >= 0
+    part_correct = np.bincount(parts[correct & has_part], minlength=n_parts)
+    part_wrong = np.bincount(parts[answered & ~correct & has_part], minlength=n_parts)
+    part_unanswered = np.bincount(parts[unanswered & has_part], minlength=n_parts)
+
+    return GradeResult(
+        found=found,
+        correct_answers=compiled.correct_letters[positions],
+        skill_correct=skill_correct,
+        skill_answered=skill_answered,
+        part_ids=compiled.part_ids,
+        part_correct=part_correct,
+        part_wrong=part_wrong,
+        part_unanswered=part_unanswered,
+    )
+
+
+class BatchGradeResult:
+    """Kết quả chấm nhiều bài nộp, mỗi mảng có một phần tử cho mỗi bài."""
+
+    def __init__(self, listening_correct, reading_correct, listening_total, reading_total,
+                 correct, wrong, unanswered):
+        self.listening_correct = listening_correct
+        self.reading_correct = reading_correct
+        self.listening_total = listening_total
+        self.reading_total = reading_total
+        self.correct = correct
+        self.wrong = wrong
+        self.unanswered = unanswered
+
+    def __len__(self):
+        return len(self.correct)
+
+
+def grade_batch(answer_key, payloads):
+    """
+    Chấm lại hàng loạt payload `test_result` (ví dụ sau khi sửa đáp án) trong một lượt vectorized.
+    `payloads` là danh sách test_result; payload rỗng hoặc None được tính là 0 câu.
+    """
+    compiled = compile_answer_key(answer_key)
+    rows, raw_ids, raw_answers = [], [], []
+    n_rows = 0
+    for row, payload in enumerate(payloads):
+        n_rows += 1
+        for item in payload or ():
+            if not isinstance(item, dict):
+                continue
+            rows.append(row)
+            raw_ids.append(item.get("id"))
+            raw_answers.append(item.get("user_answer"))
+
+    rows = np.array(rows, dtype=np.int64)
+    positions, found = compiled.locate(encode_question_ids(raw_ids))
+    answers = encode_answers(raw_answers)
+
+    skills = compiled.skill_codes[positions]
+    answered = found & (answers != UNANSWERED)
+    correct = answered & (answers == compiled.correct_codes[positions])
+    unanswered = found & (answers == UNANSWERED)
+
+    has_skill = skills >= 0
+    skill_slot = rows * len(SKILLS) + skills
+    skill_correct = np.bincount(skill_slot[correct & has_skill],
+                                minlength=n_rows * len(SKILLS)).reshape(n_rows, len(SKILLS))
+    skill_answered = np.bincount(skill_slot[answered & has_skill],
+                                 minlength=n_rows * len(SKILLS)).reshape(n_rows, len(SKILLS))
+
+    return BatchGradeResult(
+        listening_correct=skill_correct[:, 0],
+        reading_correct=skill_correct[:, 1],
+        listening_total=skill_answered[:, 0],
+        reading_total=skill_answered[:, 1],
+        correct=np.bincount(rows[correct], minlength=n_rows),
+        wrong=np.bincount(rows[answered & ~correct], minlength=n_rows),
+        unanswered=np.bincount(rows[unanswered], minlength=n_rows),
+    )
@@ -1,4 +1,5 @@
 from EStudyApp.repository.history_repository import HistoryRepository
+from EStudyApp.services import result_summary
 
 class HistoryService:
     def __init__(self):
@@ -9,18 +10,41 @@ class HistoryService:
         Lấy danh sách kết quả thi gần nhất của sinh viên, format dữ liệu trả về.
         student_identifier: id hoặc username của sinh viên
         """
-        histories = self.repo.get_latest_results_by_student(student_identifier, limit)
+        summary = self.get_result_summaries([student_identifier], limit).get(str(student_identifier).strip())
+        if not summary:
+            return []
+        return [{"student": summary["student"], **r} for r in summary["results"]]
 
-        # Format dữ liệu trả về
-        results = []
-        for h in histories:
-            results.append({
-                "student": h.user.username if h.user else None,
-                "test_name": h.test.name if h.test else None,
-                "score": float(h.score) if h.score is not None else None,
-                "listening_score": float(h.listening_score) if h.listening_score is not None else None,
-                "reading_score": float(h.reading_score) if h.reading_score is not None else None,
-                "date": h.end_time.strftime("%Y-%m-%d %H:%M") if h.end_time else None
-            })
+    def resolve_students(self, student_identifiers):
+        """{identifier: (user_id, username)} của các sinh viên tồn tại (một truy vấn)."""
+        return self.repo.resolve_students(student_identifiers)
 
-        return results
\ No newline at end of file
+    def get_result_summaries(self, student_identifiers, limit=3):
+        """
+        Kết quả gần nhất + xu hướng điểm của nhiều sinh viên: một truy vấn tìm sinh viên,
+        bản tóm tắt đọc từ cache (services/result_summary.py).
+        Trả về {identifier: {"student", "results", "trend"}}, bỏ qua sinh viên không tồn tại.
+        """
+        students = self.resolve_students(student_identifiers)
+        user_ids = [user_id for user_id, _ in students.values()]
+
+        if limit > result_summary.SUMMARY_SIZE:
+            # Nhiều hơn số bài được cache -> đọc thẳng DB
+            rows = self.repo.get_latest_results_by_students(user_ids, limit)
+            summaries = {user_id: result_summary.build_summary(rows[user_id]) for user_id in user_ids}
+        else:
+            summaries = result_summary.get_summaries(user_ids)
+
+        return {
+            identifier: {
+                "student": username,
+                "results": summaries[user_id]["results"][:limit],
+                "trend": summaries[user_id]["trend"],
+            }
+            for identifier, (user_id, username) in students.items()
+        }
+
+    def get_user_summary(self, user_id, limit=3):
+        """Như get_result_summaries cho chính người dùng đang đăng nhập (đã biết user_id)."""
+        summary = result_summary.get_summaries([user_id])[user_id]
+        return {"results": summary["results"][:limit], "trend": summary["trend"]}
@@ -0,0 +1,307 @@
+# EStudyApp/services/jobs.py
+"""
+Hàng đợi job nền trên Redis (dùng chung Redis của cache) cho các thao tác chạy lâu:
+import đề, tạo part/đề tự động, phân tích câu hỏi bằng AI, tóm tắt hội thoại chat bot.
+
+- enqueue(type, payload) lưu job rồi đẩy id vào hàng đợi riêng của loại job; client hỏi
+  trạng thái qua jobs/<id>/ và lấy kết quả qua jobs/<id>/result/.
+- Worker (manage.py run_jobs) lấy job bằng một script Lua: chỉ lấy khi số job đang chạy
+  của loại đó nhỏ hơn `concurrency` và ghi lease (hạn + token) cùng lúc. Trong lúc handler
+  chạy, một luồng heartbeat gia hạn lease mỗi timeout/3; lease chỉ hết hạn khi worker chết
+  thì job được đưa lại đầu hàng đợi -> mỗi job chạy ít nhất một lần. Gia hạn và trả lease
+  so token, nên worker cũ không xóa được lease của lần chạy lại.
+- Job lỗi được thử lại tối đa `max_retries` lần với thời gian chờ tăng dần;
+  lỗi dữ liệu (ValueError, DoesNotExist) không thử lại.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import NamedTuple
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+KEY_PREFIX = "EStudyApp:jobs"
+JOB_TTL = 60 * 60 * 24 * 3
+RETRY_BASE_DELAY = 10       # Giây chờ trước lần thử lại đầu, nhân đôi mỗi lần
+RETRY_MAX_DELAY = 60 * 10
+PROMOTE_BATCH = 100
+FATAL_ERRORS = (ValueError, ObjectDoesNotExist)
+
+
+class JobType(NamedTuple):
+    handler: str            # Đường dẫn hàm handler(payload, progress) -> kết quả JSON được
+    max_retries: int = 2
+    concurrency: int = 2    # Số job cùng loại chạy đồng thời trên mọi worker
+    timeout: int = 60 * 10  # Thời hạn lease (giây)
+
+
+JOB_TYPES = {
+    "import_test": JobType("EStudyApp.services.test_import.run_import_job",
+                           max_retries=1, concurrency=1, timeout=60 * 30),
+    "assemble_part": JobType("EStudyApp.services.test_assembly.run_assemble_part_job",
+                             max_retries=2, concurrency=4, timeout=60 * 5),
+    "generate_test": JobType("EStudyApp.services.test_assembly.run_generate_test_job",
+                             max_retries=2, concurrency=2, timeout=60 * 10),
+    "toeic_analysis": JobType("EStudyApp.services.question_analysis.run_analysis_job",
+                              max_retries=2, concurrency=3, timeout=60 * 10),
+    "chat_summary": JobType("chat_bot.services.context_service.run_summary_job",
+                            max_retries=1, concurrency=2, timeout=60 * 2),
+}
+
+# KEYS: hàng đợi, tập đang chạy, token lease | ARGV: now, concurrency, hạn lease, token
+_ACQUIRE = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('HDEL', KEYS[3], id)
+    redis.call('RPUSH', KEYS[1], id)
+end
+if redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[2]) then
+    return false
+end
+local id = redis.call('RPOP', KEYS[1])
+if not id then
+    return false
+end
+redis.call('ZADD', KEYS[2], ARGV[3], id)
+redis.call('HSET', KEYS[3], id, ARGV[4])
+return id
+"""
+
+# KEYS: tập đang chạy, token lease | ARGV: job id, token, hạn lease mới
+_RENEW = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('ZADD', KEYS[1], 'XX', ARGV[3], ARGV[1])
+return 1
+"""
+
+# KEYS: tập đang chạy, token lease | ARGV: job id, token
+_RELEASE = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+return 1
+"""
+
+# KEYS: tập job chờ thử lại | ARGV: now, tiền tố khóa hàng đợi, số job tối đa mỗi lượt
+_PROMOTE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[3]))
+for _, member in ipairs(due) do
+    redis.call('ZREM', KEYS[1], member)
+    local sep = string.find(member, '|', 1, true)
+    redis.call('LPUSH', ARGV[2] .. string.sub(member, 1, sep - 1), string.sub(member, sep + 1))
+end
+return #due
+"""
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def _job_key(job_id):
+    return f"{KEY_PREFIX}:job:{job_id}"
+
+
+def _queue_key(job_type):
+    return f"{KEY_PREFIX}:queue:{job_type}"
+
+
+def _running_key(job_type):
+    return f"{KEY_PREFIX}:running:{job_type}"
+
+
+def _lease_key(job_type):
+    return f"{KEY_PREFIX}:lease:{job_type}"
+
+
+def _delayed_key():
+    return f"{KEY_PREFIX}:delayed"
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def get_job(job_id):
+    raw = _redis().get(_job_key(job_id))
+    return json.loads(raw) if raw else None
+
+
+def _save_job(job):
+    _redis().set(_job_key(job["id"]), json.dumps(job, cls=DjangoJSONEncoder), ex=JOB_TTL)
+    return job
+
+
+def _update_job(job_id, **fields):
+    job = get_job(job_id)
+    if job is None:
+        return None
+    job.update(fields)
+    return _save_job(job)
+
+
+def enqueue(job_type, payload, user_id=None):
+    """Tạo job `job_type` với `payload` (JSON được), trả về bản ghi job."""
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"Unknown job type: {job_type}")
+    job = _save_job({
+        "id": uuid.uuid4().hex,
+        "type": job_type,
+        "status": QUEUED,
+        "payload": payload,
+        "user_id": user_id,
+        "attempts": 0,
+        "progress": None,
+        "result": None,
+        "error": None,
+        "fatal": False,
+        "created_at": timezone.now(),
+        "started_at": None,
+        "finished_at": None,
+    })
+    _redis().lpush(_queue_key(job_type), job["id"])
+    return job
+
+
+def public_job(job):
+    """Trạng thái job trả cho client (không kèm payload và kết quả)."""
+    return {field: job[field] for field in
+            ("id", "type", "status", "attempts", "progress", "error", "created_at", "started_at", "finished_at")}
+
+
+class Worker:
+    """Lấy và chạy job của các loại `job_types` bằng `threads` luồng."""
+
+    def __init__(self, job_types=None, threads=4, poll_interval=1.0):
+        self.job_types = list(job_types or JOB_TYPES)
+        unknown = set(self.job_types) - set(JOB_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown job types: {sorted(unknown)}")
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        self.redis = _redis()
+        self._acquire = self.redis.register_script(_ACQUIRE)
+        self._promote = self.redis.register_script(_PROMOTE)
+        self._renew = self.redis.register_script(_RENEW)
+        self._release = self.redis.register_script(_RELEASE)
+
+    def promote_delayed(self):
+        return self._promote(keys=[_delayed_key()],
+                             args=[time.time(), f"{KEY_PREFIX}:queue:", PROMOTE_BATCH])
+
+    def acquire(self, offset=0):
+        """
+        Lấy một job còn slot chạy, duyệt các loại xoay vòng từ `offset` để không loại nào bị đói.
+        Trả về (loại job, id job, token lease) hoặc None.
+        """
+        now = time.time()
+        count = len(self.job_types)
+        for step in range(count):
+            job_type = self.job_types[(offset + step) % count]
+            spec = JOB_TYPES[job_type]
+            token = uuid.uuid4().hex
+            job_id = self._acquire(keys=[_queue_key(job_type), _running_key(job_type), _lease_key(job_type)],
+                                   args=[now, spec.concurrency, now + spec.timeout, token])
+            if job_id:
+                return job_type, job_id.decode() if isinstance(job_id, bytes) else job_id, token
+        return None
+
+    def _heartbeat(self, job_type, job_id, token, done):
+        """Gia hạn lease đến khi `done`, để job chạy lâu hơn timeout không bị đưa lại hàng đợi."""
+        timeout = JOB_TYPES[job_type].timeout
+        while not done.wait(timeout / 3):
+            try:
+                renewed = self._renew(keys=[_running_key(job_type), _lease_key(job_type)],
+                                      args=[job_id, token, time.time() + timeout])
+            except Exception as e:
+                # Lỗi Redis tạm thời: thử lại ở nhịp sau, lease vẫn còn đến hết hạn
+                logger.warning("Không gia hạn được lease job %s: %s", job_id, e)
+                continue
+            if not renewed:
+                logger.warning("Job %s (%s) đã mất lease, có thể đang chạy lại ở worker khác", job_id, job_type)
+                return
+
+    def run_job(self, job_type, job_id, token):
+        spec = JOB_TYPES[job_type]
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_type, job_id, token, done),
+                                     name=f"job-heartbeat-{job_id}", daemon=True)
+        heartbeat.start()
+        try:
+            job = get_job(job_id)
+            if job is None or job["status"] in (SUCCEEDED, FAILED):
+                return  # Hết hạn hoặc đã xong (lease cũ được trả lại hàng đợi)
+            attempts = job["attempts"] + 1
+            _update_job(job_id, status=RUNNING, attempts=attempts, started_at=timezone.now(), error=None)
+            close_old_connections()
+            try:
+                result = import_string(spec.handler)(
+                    job["payload"], lambda progress: _update_job(job_id, progress=progress))
+            except Exception as e:
+                retry = not isinstance(e, FATAL_ERRORS) and attempts <= spec.max_retries
+                logger.warning("Job %s (%s) lỗi ở lần %s: %s", job_id, job_type, attempts, e,
+                               exc_info=not isinstance(e, FATAL_ERRORS))
+                if retry:
+                    _update_job(job_id, status=QUEUED, error=str(e))
+                    self.redis.zadd(_delayed_key(), {f"{job_type}|{job_id}": time.time() + retry_delay(attempts)})
+                else:
+                    _update_job(job_id, status=FAILED, error=str(e),
+                                fatal=isinstance(e, FATAL_ERRORS), finished_at=timezone.now())
+            else:
+                _update_job(job_id, status=SUCCEEDED, result=result, finished_at=timezone.now())
+        finally:
+            done.set()
+            heartbeat.join()
+            close_old_connections()
+            self._release(keys=[_running_key(job_type), _lease_key(job_type)], args=[job_id, token])
+
+    def _loop(self, offset, burst):
+        while not self.stop_event.is_set():
+            self.promote_delayed()
+            acquired = self.acquire(offset)
+            offset += 1
+            if acquired:
+                self.run_job(*acquired)
+            elif burst:
+                return
+            else:
+                self.stop_event.wait(self.poll_interval)
+
+    def run(self, burst=False):
+        """Chạy đến khi stop() (hoặc đến khi hết job nếu `burst`)."""
+        threads = [threading.Thread(target=self._loop, args=(index, burst),
+                                    name=f"job-worker-{index}", daemon=True)
+                   for index in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stop()
+            for thread in threads:
+                thread.join()
+
+    def stop(self):
+        self.stop_event.set()
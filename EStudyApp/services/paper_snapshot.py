@@ -0,0 +1,188 @@
+# EStudyApp/services/paper_snapshot.py
+"""
+Bản chụp đề thi (paper snapshot): JSON đầy đủ của TestDetailView được render một lần
+cho mỗi phiên bản đề, nén gzip và lưu Redis, sau đó trả nguyên byte kèm ETag.
+
+Phiên bản đề là generation của đề (services/cache_versions.py), tăng sau khi transaction
+commit mỗi khi Test/Part/QuestionSet/Question của đề thay đổi; bản chụp mới được dựng lại
+ở background thread.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Prefetch
+from rest_framework.settings import api_settings
+
+from EStudyApp.models import Test, Part, QuestionSet, Question
+from EStudyApp.serializers import TestDetailSerializer
+from EStudyApp.services.cache_versions import TEST, bump_generations, get_generation
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TTL = 60 * 60 * 24 * 7  # Đề đã xuất bản hiếm khi đổi
+REBUILD_WORKERS = 2
+
+_executor = ThreadPoolExecutor(max_workers=REBUILD_WORKERS, thread_name_prefix="paper-snapshot")
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+class PaperSnapshot:
+    """Body JSON đã nén của một đề ở một phiên bản, cùng ETag (sha1 của body gốc)."""
+    __slots__ = ("test_id", "version", "etag", "body")
+
+    def __init__(self, test_id, version, etag, body):
+        self.test_id = test_id
+        self.version = version
+        self.etag = etag
+        self.body = body
+
+    def __reduce__(self):
+        return (PaperSnapshot, (self.test_id, self.version, self.etag, self.body))
+
+    def decompressed(self):
+        return gzip.decompress(self.body)
+
+    def data(self):
+        return json.loads(self.decompressed())
+
+
+def _snapshot_key(test_id, version):
+    return f"paper_snapshot:{test_id}:{version}"
+
+
+def get_paper_version(test_id):
+    return get_generation(TEST, test_id)
+
+
+def paper_queryset(test_id):
+    """Cây Prefetch đầy đủ của một đề (giống TestDetailView trước đây)."""
+    return Test.objects.prefetch_related(
+        Prefetch(
+            'part_test',  # Phần trong bài kiểm tra
+            queryset=Part.objects.select_related('part_description')
+            .order_by('part_description__part_number').prefetch_related(
+                Prefetch(
+                    'question_set_part',  # Bộ câu hỏi trong phần
+                    queryset=QuestionSet.objects.order_by('id').prefetch_related(
+                        Prefetch(
+                            'question_question_set',  # Câu hỏi trong bộ câu hỏi
+                            queryset=Question.objects.order_by('question_number')
+                        )
+                    )
+                ),
+                Prefetch(
+                    'question_part',  # Các câu hỏi trong Part
+                    queryset=Question.objects.filter(test_id=test_id).order_by('question_number')
+                )
+            )
+        ),
+        Prefetch(
+            'question_test',
+            queryset=Question.objects.select_related('question_type').order_by('question_number')
+        )
+    )
+
+
+def render(data):
+    """Render bằng renderer mặc định của DRF để byte giống hệt response thường."""
+    return api_settings.DEFAULT_RENDERER_CLASSES[0]().render(data)
+
+
+def build_snapshot(test_id, version):
+    """Dựng bản chụp từ DB. Raise Test.DoesNotExist nếu đề không tồn tại."""
+    test = paper_queryset(test_id).get(pk=test_id)
+    raw = render(TestDetailSerializer(test).data)
+    return PaperSnapshot(test_id, version, hashlib.sha1(raw).hexdigest(),
+                         gzip.compress(raw, compresslevel=6, mtime=0))
+
+
+def get_snapshot(test_id):
+    """Lấy bản chụp của phiên bản hiện tại; chưa có thì dựng ngay và lưu lại."""
+    test_id = int(test_id)
+    version = get_paper_version(test_id)
+    snapshot = cache.get(_snapshot_key(test_id, version))
+    if snapshot is None:
+        snapshot = build_snapshot(test_id, version)
+        cache.set(_snapshot_key(test_id, version), snapshot, SNAPSHOT_TTL)
+    return snapshot
+
+
+def rebuild_snapshot(test_id):
+    """Dựng lại bản chụp của phiên bản hiện tại (dùng cho background và lệnh quản trị)."""
+    version = get_paper_version(test_id)
+    try:
+        snapshot = build_snapshot(test_id, version)
+    except Test.DoesNotExist:
+        return None
+    cache.set(_snapshot_key(test_id, version), snapshot, SNAPSHOT_TTL)
+    return snapshot
+
+
+def _rebuild_in_background(test_id):
+    with _pending_lock:
+        _pending.discard(test_id)
+    close_old_connections()
+    try:
+        rebuild_snapshot(test_id)
+    except Exception:
+        logger.exception("Không dựng lại được bản chụp đề %s", test_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_rebuilds(test_ids):
+    """Dựng lại bản chụp ở background, mỗi đề chỉ xếp hàng một lần."""
+    for test_id in test_ids:
+        with _pending_lock:
+            if test_id in _pending:
+                continue
+            _pending.add(test_id)
+        _executor.submit(_rebuild_in_background, test_id)
+
+
+def invalidate_paper(test_ids):
+    """
+    Đánh dấu đề đã đổi. Generation tăng sau khi transaction commit để không có request nào
+    dựng bản chụp từ dữ liệu chưa commit dưới phiên bản mới.
+    """
+    bump_generations(TEST, test_ids, then=schedule_rebuilds)
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = {tag.strip() for tag in if_none_match.split(',')}
+    return '*' in tags or f'"{etag}"' in tags or f'W/"{etag}"' in tags
+
+
+def part_subset(snapshot, part_ids):
+    """
+    Cắt bản chụp theo danh sách part (cho TestPartDetailView), trả về (etag, data).
+    Tên field đọc qua renderer để khớp cấu hình camelCase.
+    """
+    part_ids = sorted(set(part_ids))
+    selected = set(part_ids)
+    data = snapshot.data()
+    part_key, question_key, part_id_key = _field_names()
+    data[part_key] = [part for part in data.get(part_key) or [] if part.get('id') in selected]
+    data[question_key] = [question for question in data.get(question_key) or []
+                          if question.get(part_id_key) in selected]
+    etag = hashlib.sha1(f"{snapshot.etag}:{part_ids}".encode()).hexdigest()
+    return etag, data
+
+
+_field_name_cache = []
+
+
+def _field_names():
+    if not _field_name_cache:
+        rendered = json.loads(render({'part_test': None, 'question_test': None, 'part_id': None}))
+        _field_name_cache.extend(rendered.keys())
+    return _field_name_cache
@@ -0,0 +1,39 @@
+# EStudyApp/services/question_analysis.py
+"""
+Phân tích câu hỏi TOEIC bằng AI (ToeicQuestionAnalysisView): tải audio -> ffmpeg -> nhận dạng
+giọng nói, OCR ảnh, rồi gọi LLM. Chạy trong job nền "toeic_analysis" (services/jobs.py).
+
+Mọi file audio và ảnh của câu hỏi được xử lý song song trên cùng pool media
+(generateAI/media.py), nên thời gian chờ gần bằng file chậm nhất thay vì tổng các file.
+"""
+from course.toeicAI import create_toeic_question_prompt
+from EStudyApp.generateAI.audio import TRANSCRIPT_SEPARATOR, transcribe_audio_url
+from EStudyApp.generateAI.media import as_list, submit_all
+from EStudyApp.generateAI.ocr import OCR_SEPARATOR, extract_text_from_image_url
+
+
+def extract_media_text(audio=None, image=None, progress=None):
+    """
+    Trả về (văn bản audio, văn bản OCR), hai nhánh chạy đồng thời.
+    Tiến độ giữ như khi chạy tuần tự: {"step": "audio"} khi xong audio, rồi {"step": "ocr"}.
+    """
+    audio_urls, image_urls = as_list(audio), as_list(image)
+    futures = submit_all([(transcribe_audio_url, url) for url in audio_urls]
+                         + [(extract_text_from_image_url, url) for url in image_urls])
+    audio_text = TRANSCRIPT_SEPARATOR.join(future.result() for future in futures[:len(audio_urls)])
+    if progress:
+        progress({"step": "audio"})
+    image_text = OCR_SEPARATOR.join(future.result() for future in futures[len(audio_urls):])
+    if progress:
+        progress({"step": "ocr"})
+    return audio_text, image_text
+
+
+def analyze_question(question_text, answers, audio=None, image=None, page=None, progress=None):
+    audio_text, image_text = extract_media_text(audio, image, progress)
+    return create_toeic_question_prompt(question_text, answers, [audio_text], image_text, page)
+
+
+def run_analysis_job(payload, progress):
+    """Handler job "toeic_analysis" (services/jobs.py)."""
+    return {"result": analyze_question(progress=progress, **payload)}
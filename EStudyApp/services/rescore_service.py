@@ -0,0 +1,139 @@
+# EStudyApp/services/rescore_service.py
+import time
+
+from django.db import transaction
+
+from EStudyApp.calculate_toeic import calculate_toeic_scores_batch
+from EStudyApp.models import History, HistoryTraining
+from EStudyApp.services.answer_key import get_answer_key
+from EStudyApp.services.cache_versions import USER, bump_generations
+from EStudyApp.services.grading import grade_batch
+
+DEFAULT_CHUNK_SIZE = 2000
+BULK_UPDATE_BATCH_SIZE = 500
+TOTAL_QUESTIONS = 200
+
+HISTORY_FIELDS = [
+    'score', 'listening_score', 'reading_score', 'correct_answers', 'wrong_answers',
+    'unanswer_questions', 'percentage_score', 'test_result',
+]
+TRAINING_FIELDS = [
+    'correct_answers', 'wrong_answers', 'unanswer_questions', 'percentage_score', 'test_result',
+]
+
+
+class RescoreStats:
+    """Thống kê tiến độ chấm lại, truyền cho callback `progress` sau mỗi lô."""
+
+    def __init__(self, test_id, model_name):
+        self.test_id = test_id
+        self.model_name = model_name
+        self.processed = 0
+        self.user_ids = set()
+        self.started_at = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    @property
+    def rows_per_second(self):
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"[{self.model_name} test={self.test_id}] {self.processed} dòng, "
+                f"{self.elapsed:.1f}s, {self.rows_per_second:.0f} dòng/s")
+
+
+def _annotate_correct_answers(answer_key, payload):
+    """Cập nhật correct_answer lưu trong test_result theo đáp án mới."""
+    if not payload:
+        return payload
+    for item in payload:
+        if not isinstance(item, dict):
+            continue
+        try:
+            entry = answer_key.get(int(item.get("id")))
+        except (TypeError, ValueError):
+            entry = None
+        if entry is not None:
+            item["correct_answer"] = entry.correct_answer
+    return payload
+
+
+def _rescore_history_chunk(answer_key, histories):
+    result = grade_batch(answer_key, [h.test_result for h in histories])
+    listening_scores, reading_scores, overall_scores = calculate_toeic_scores_batch(
+        result.listening_correct, result.reading_correct)
+    correct = result.listening_correct + result.reading_correct
+    answered = result.listening_total + result.reading_total
+
+    for index, history in enumerate(histories):
+        history.score = int(overall_scores[index])
+        history.listening_score = int(listening_scores[index])
+        history.reading_score = int(reading_scores[index])
+        history.correct_answers = int(correct[index])
+        history.wrong_answers = int(answered[index] - correct[index])
+        history.unanswer_questions = TOTAL_QUESTIONS - int(answered[index])
+        history.percentage_score = (history.correct_answers / max(int(answered[index]), 1)) * 100
+        history.test_result = _annotate_correct_answers(answer_key, history.test_result)
+    History.objects.bulk_update(histories, HISTORY_FIELDS, batch_size=BULK_UPDATE_BATCH_SIZE)
+
+
+def _rescore_training_chunk(answer_key, trainings):
+    result = grade_batch(answer_key, [t.test_result for t in trainings])
+    for index, training in enumerate(trainings):
+        correct = int(result.correct[index])
+        wrong = int(result.wrong[index])
+        training.correct_answers = correct
+        training.wrong_answers = wrong
+        training.unanswer_questions = int(result.unanswered[index])
+        training.percentage_score = (correct / (correct + wrong)) * 100 if correct + wrong > 0 else 0
+        training.test_result = _annotate_correct_answers(answer_key, training.test_result)
+    HistoryTraining.objects.bulk_update(trainings, TRAINING_FIELDS, batch_size=BULK_UPDATE_BATCH_SIZE)
+
+
+def _stream(model, test_id, chunk_size, rescore_chunk, answer_key, progress):
+    """
+    Đọc test_result theo lô bằng server-side cursor (QuerySet.iterator),
+    chấm lại và ghi bằng bulk_update, không nạp toàn bộ bảng vào bộ nhớ.
+    """
+    stats = RescoreStats(test_id, model.__name__)
+    queryset = (model.objects.filter(test_id=test_id)
+                .only('id', 'user_id', 'test_result')
+                .order_by('id'))
+    chunk = []
+
+    def flush():
+        with transaction.atomic():
+            rescore_chunk(answer_key, chunk)
+        stats.processed += len(chunk)
+        stats.user_ids.update(row.user_id for row in chunk)
+        chunk.clear()
+        if progress:
+            progress(stats)
+
+    for row in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return stats
+
+
+def rescore_test(test_id, chunk_size=DEFAULT_CHUNK_SIZE, include_training=True, progress=None):
+    """
+    Chấm lại toàn bộ History (và HistoryTraining) của một đề theo đáp án hiện tại.
+    Trả về danh sách RescoreStats (một phần tử cho mỗi bảng).
+    """
+    answer_key = get_answer_key(test_id)
+    results = [_stream(History, answer_key.test_id, chunk_size,
+                       _rescore_history_chunk, answer_key, progress)]
+    if include_training:
+        results.append(_stream(HistoryTraining, answer_key.test_id, chunk_size,
+                               _rescore_training_chunk, answer_key, progress))
+
+    # bulk_update không phát signal -> tự vô hiệu hóa cache của các user bị chấm lại
+    bump_generations(USER, set().union(*(stats.user_ids for stats in results)))
+    return results
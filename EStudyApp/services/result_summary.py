@@ -0,0 +1,105 @@
+# EStudyApp/services/result_summary.py
+"""
+Cache tóm tắt kết quả thi của từng sinh viên (giáo viên tra cứu qua chat bot / history/results/).
+
+Mỗi bản tóm tắt gồm SUMMARY_SIZE bài thi gần nhất và xu hướng điểm (trung bình, cao nhất,
+chênh lệch giữa nửa mới và nửa cũ), khóa theo generation USER của sinh viên
+(services/cache_versions.py). Lưu History -> tăng generation và dựng lại bản tóm tắt ngay
+sau khi commit (signals.py), nên lần tra cứu sau không phải chạm DB.
+"""
+import logging
+
+from django.core.cache import cache
+
+from EStudyApp.repository.history_repository import HistoryRepository
+from EStudyApp.services.cache_versions import USER, get_generations
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SIZE = 10
+SUMMARY_TTL = 60 * 60 * 24
+TREND_THRESHOLD = 25  # Chênh lệch (điểm) dưới ngưỡng này coi là ổn định
+SUMMARY_PREFIX = "result_summary"
+
+
+def _format_result(row):
+    return {
+        "test_name": row["test__name"],
+        "score": float(row["score"]) if row["score"] is not None else None,
+        "listening_score": float(row["listening_score"]) if row["listening_score"] is not None else None,
+        "reading_score": float(row["reading_score"]) if row["reading_score"] is not None else None,
+        "date": row["end_time"].strftime("%Y-%m-%d %H:%M") if row["end_time"] else None,
+    }
+
+
+def _mean(values):
+    return sum(values) / len(values)
+
+
+def build_trend(scores):
+    """Xu hướng từ danh sách điểm (mới nhất trước): nửa mới so với nửa cũ."""
+    if not scores:
+        return {"tests": 0, "average": None, "best": None, "change": None, "direction": None}
+    half = len(scores) // 2
+    change = round(_mean(scores[:half]) - _mean(scores[half:]), 1) if half else None
+    if change is None:
+        direction = None
+    elif change >= TREND_THRESHOLD:
+        direction = "up"
+    elif change <= -TREND_THRESHOLD:
+        direction = "down"
+    else:
+        direction = "flat"
+    return {
+        "tests": len(scores),
+        "average": round(_mean(scores), 1),
+        "best": max(scores),
+        "change": change,
+        "direction": direction,
+    }
+
+
+def build_summary(rows):
+    results = [_format_result(row) for row in rows]
+    return {
+        "results": results,
+        "trend": build_trend([r["score"] for r in results if r["score"] is not None]),
+    }
+
+
+def _summary_keys(user_ids):
+    generations = get_generations(*((USER, user_id) for user_id in user_ids))
+    return {
+        user_id: f"{SUMMARY_PREFIX}:{user_id}:{generation}"
+        for user_id, generation in zip(user_ids, generations)
+    }
+
+
+def _build_and_cache(keys):
+    rows = HistoryRepository().get_latest_results_by_students(list(keys), SUMMARY_SIZE)
+    summaries = {user_id: build_summary(rows[user_id]) for user_id in keys}
+    cache.set_many({keys[user_id]: summary for user_id, summary in summaries.items()}, SUMMARY_TTL)
+    return summaries
+
+
+def get_summaries(user_ids):
+    """{user_id: bản tóm tắt}: một lượt đọc cache, các user chưa có trong cache dựng bằng một truy vấn."""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    keys = _summary_keys(user_ids)
+    cached = cache.get_many(list(keys.values()))
+    summaries = {user_id: cached[key] for user_id, key in keys.items() if key in cached}
+    missing = {user_id: key for user_id, key in keys.items() if user_id not in summaries}
+    if missing:
+        summaries.update(_build_and_cache(missing))
+    return summaries
+
+
+def refresh_summaries(user_ids):
+    """Callback sau khi generation USER tăng (History thay đổi): dựng sẵn bản tóm tắt mới."""
+    try:
+        _build_and_cache(_summary_keys(list(user_ids)))
+    except Exception as e:
+        # Không sao: lần tra cứu sau sẽ tự dựng lại
+        logger.warning("Could not refresh result summaries for %s: %s", user_ids, e)
@@ -0,0 +1,226 @@
+# EStudyApp/services/sampling_index.py
+"""
+Chỉ mục lấy mẫu có trọng số cho ngân hàng bộ câu hỏi, mỗi part_description một chỉ mục.
+
+Trọng số của một bộ = tỉ lệ mong muốn của mức độ khó / số bộ cùng mức độ trong pool
+                       x hệ số phạt tái sử dụng 1 / (1 + usage_count) ** REUSE_PENALTY.
+Cây Fenwick trên trọng số cho phép rút không hoàn lại k bộ trong O(k log n):
+mỗi lần rút tìm tổng tiền tố rồi đặt trọng số bộ đó về 0, rút xong thì trả lại.
+
+Chỉ mục nằm trong bộ nhớ process, dựng lại khi generation BANK của part_description
+đổi hoặc quá LOCAL_TTL; usage_count tăng do chính process này thì cập nhật tại chỗ.
+Khi dựng lại, usage_count được đọc thẳng từ DB (pool đã cache giữ giá trị cũ tới POOL_TTL),
+nên không mất các lần tăng tại chỗ và thấy cả số lần dùng do process khác ghi.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from EStudyApp.services.cache_versions import BANK, get_generation
+
+DIFFICULTY_LEVELS = ("BASIC", "MEDIUM", "DIFFICULTY", "VERY_DIFFICULTY")
+REUSE_PENALTY = 1.0
+LOCAL_TTL = 60 * 5          # Dựng lại để đọc usage_count do process khác cập nhật
+MAX_CACHED_MIXES = 8        # Số cây Fenwick (mỗi tỉ lệ độ khó một cây) giữ trong một chỉ mục
+
+
+class FenwickTree:
+    """Cây Fenwick (Binary Indexed Tree) trên trọng số thực, chỉ số từ 0."""
+
+    def __init__(self, weights):
+        self.size = len(weights)
+        self.tree = [0.0] * (self.size + 1)
+        for position, weight in enumerate(weights, 1):
+            self.tree[position] += weight
+            parent = position + (position & -position)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[position]
+        self._top_bit = 1 << (self.size.bit_length() - 1) if self.size else 0
+
+    def add(self, index, delta):
+        position = index + 1
+        while position <= self.size:
+            self.tree[position] += delta
+            position += position & -position
+
+    def prefix(self, count):
+        total = 0.0
+        while count > 0:
+            total += self.tree[count]
+            count -= count & -count
+        return total
+
+    def total(self):
+        return self.prefix(self.size)
+
+    def find(self, value):
+        """Chỉ số nhỏ nhất có tổng tiền tố (tính cả nó) lớn hơn `value`."""
+        position, bit = 0, self._top_bit
+        while bit:
+            candidate = position + bit
+            if candidate <= self.size and self.tree[candidate] <= value:
+                value -= self.tree[candidate]
+                position = candidate
+            bit >>= 1
+        return min(position, self.size - 1)
+
+
+def normalize_mix(difficulty_mix):
+    """Chuẩn hóa tỉ lệ độ khó thành tuple (hashable) theo DIFFICULTY_LEVELS, None = không ràng buộc."""
+    if not difficulty_mix:
+        return None
+    if not isinstance(difficulty_mix, dict):
+        raise ValueError("difficulty_mix must be an object of level -> share")
+    difficulty_mix = {str(level).upper(): share for level, share in difficulty_mix.items()}
+    unknown = set(difficulty_mix) - set(DIFFICULTY_LEVELS)
+    if unknown:
+        raise ValueError(f"Unknown difficulty levels: {sorted(unknown)}")
+    try:
+        shares = tuple(float(difficulty_mix.get(level) or 0) for level in DIFFICULTY_LEVELS)
+    except (TypeError, ValueError):
+        raise ValueError("difficulty_mix shares must be numbers")
+    if any(share < 0 for share in shares) or not sum(shares):
+        raise ValueError("difficulty_mix must contain non-negative shares with a positive sum")
+    return shares
+
+
+class SamplingIndex:
+    """Chỉ mục lấy mẫu của một pool (danh sách PoolEntry của services/test_assembly.py)."""
+
+    def __init__(self, entries, usage_counts=None):
+        """`usage_counts` {id: usage_count} mới hơn giá trị trong `entries` (nếu có)."""
+        self.entries = list(entries)
+        self.positions = {entry.id: index for index, entry in enumerate(self.entries)}
+        usage_counts = usage_counts or {}
+        self.usage = [usage_counts.get(entry.id, entry.usage_count) for entry in self.entries]
+        self.level_counts = [0] * len(DIFFICULTY_LEVELS)
+        for entry in self.entries:
+            if entry.difficulty is not None:
+                self.level_counts[entry.difficulty] += 1
+        self._trees = OrderedDict()  # mix -> (FenwickTree, trọng số hiện tại)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _level_weights(self, mix):
+        if mix is None:
+            return None
+        weights = [share / count if count else 0.0 for share, count in zip(mix, self.level_counts)]
+        # Pool không có mức độ khó nào được yêu cầu -> bỏ ràng buộc thay vì không chọn được gì
+        return weights if any(weights) else None
+
+    def weight(self, index, mix=None):
+        level_weights = self._level_weights(mix)
+        if level_weights is None:
+            base = 1.0
+        else:
+            difficulty = self.entries[index].difficulty
+            base = level_weights[difficulty] if difficulty is not None else 0.0
+        return base / (1 + self.usage[index]) ** REUSE_PENALTY
+
+    def _tree(self, mix):
+        cached = self._trees.get(mix)
+        if cached is None:
+            weights = [self.weight(index, mix) for index in range(len(self.entries))]
+            cached = (FenwickTree(weights), weights)
+            self._trees[mix] = cached
+            while len(self._trees) > MAX_CACHED_MIXES:
+                self._trees.popitem(last=False)
+        else:
+            self._trees.move_to_end(mix)
+        return cached
+
+    def sample(self, k, difficulty_mix=None, exclude=frozenset(), rng=random):
+        """Rút không hoàn lại tối đa k bộ (PoolEntry), bỏ qua id trong `exclude`."""
+        mix = normalize_mix(difficulty_mix)
+        with self._lock:
+            if not self.entries:
+                return []
+            tree, weights = self._tree(mix)
+            removed = []
+
+            def take(index):
+                removed.append((index, weights[index]))
+                tree.add(index, -weights[index])
+                weights[index] = 0.0
+
+            for set_id in exclude:
+                index = self.positions.get(set_id)
+                if index is not None and weights[index] > 0:
+                    take(index)
+
+            chosen = []
+            try:
+                while len(chosen) < k:
+                    total = tree.total()
+                    if total <= 1e-12:
+                        break
+                    index = tree.find(rng.random() * total)
+                    if weights[index] <= 0:
+                        # Sai số dấu phẩy động rơi vào bộ đã rút -> lấy bộ còn trọng số gần nhất
+                        index = next((i for i, w in enumerate(weights) if w > 0), None)
+                        if index is None:
+                            break
+                    chosen.append(self.entries[index])
+                    take(index)
+            finally:
+                for index, weight in removed:
+                    tree.add(index, weight)
+                    weights[index] = weight
+            return chosen
+
+    def choose(self, candidate_ids, difficulty_mix=None, rng=random):
+        """Chọn một id trong danh sách nhỏ các ứng viên theo cùng trọng số (dùng cho Part 7)."""
+        mix = normalize_mix(difficulty_mix)
+        with self._lock:
+            weights = [self.weight(self.positions[set_id], mix) for set_id in candidate_ids]
+        if not any(weights):
+            return rng.choice(candidate_ids)
+        return rng.choices(candidate_ids, weights=weights)[0]
+
+    def record_usage(self, set_ids):
+        """Tăng usage_count trong bộ nhớ và cập nhật trọng số mọi cây đang giữ, O(log n) mỗi bộ."""
+        with self._lock:
+            for set_id in set_ids:
+                index = self.positions.get(set_id)
+                if index is None:
+                    continue
+                self.usage[index] += 1
+                for mix, (tree, weights) in self._trees.items():
+                    if weights[index] == 0:
+                        continue  # Bộ không thuộc tỉ lệ độ khó này
+                    new_weight = self.weight(index, mix)
+                    tree.add(index, new_weight - weights[index])
+                    weights[index] = new_weight
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_sampling_index(part_description_id, load_pool, load_usage=None):
+    """
+    Chỉ mục của part_description trong process hiện tại.
+    `load_pool(part_description_id)` trả về pool PoolEntry (services/test_assembly.get_set_pool),
+    `load_usage(part_description_id)` trả về usage_count hiện tại {id: usage_count}
+    (services/test_assembly.get_usage_counts).
+    """
+    generation = get_generation(BANK, part_description_id)
+    with _indexes_lock:
+        cached = _indexes.get(part_description_id)
+        if cached and cached[0] == generation and time.monotonic() - cached[1] < LOCAL_TTL:
+            return cached[2]
+    usage_counts = load_usage(part_description_id) if load_usage else None
+    index = SamplingIndex(load_pool(part_description_id), usage_counts)
+    with _indexes_lock:
+        _indexes[part_description_id] = (generation, time.monotonic(), index)
+    return index
+
+
+def record_usage(part_description_id, set_ids):
+    with _indexes_lock:
+        cached = _indexes.get(part_description_id)
+    if cached:
+        cached[2].record_usage(set_ids)
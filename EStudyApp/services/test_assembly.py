@@ -0,0 +1,259 @@
+# EStudyApp/services/test_assembly.py
+"""
+Tạo part của đề tự động từ ngân hàng câu hỏi (question_bank) theo kiểu set-based:
+
+1. Lấy pool bộ câu hỏi của part_description từ cache (một truy vấn khi cache trống).
+2. Chọn tất cả bộ cần dùng cho part trong Python bằng chỉ mục lấy mẫu có trọng số
+   theo độ khó và số lần đã dùng (services/sampling_index.py), không ORDER BY random().
+3. Đọc các bộ và câu hỏi được chọn bằng hai truy vấn, ghi bằng bulk_create trong một transaction.
+
+Vị trí câu (from_ques/to_ques, question_number) lấy theo utils/standard_part.PART_STRUCTURE.
+"""
+import random
+import time
+from functools import partial
+from typing import NamedTuple, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Case, F, FloatField, Value, When
+
+from EStudyApp.models import PartDescription, Part, QuestionSet, Question, Test
+from EStudyApp.services.cache_versions import BANK, get_generation
+from EStudyApp.services.sampling_index import DIFFICULTY_LEVELS, get_sampling_index, record_usage
+from EStudyApp.services.test_counters import refresh_part_counters, refresh_test_counters
+from question_bank.models import QuestionSetBank, QuestionBank
+from utils.standard_part import PART_STRUCTURE
+
+POOL_TTL = 60 * 60
+PART_NUMBERS = tuple(int(name.split('_')[1]) for name in PART_STRUCTURE)
+# Part 7 có các bộ dài ngắn khác nhau -> chỉ ghép bộ có đúng khoảng câu của vị trí
+EXACT_RANGE_PARTS = {7}
+
+
+class PoolEntry(NamedTuple):
+    id: int
+    from_ques: int
+    to_ques: int
+    difficulty: Optional[int]  # Chỉ số trong DIFFICULTY_LEVELS (trung bình các câu), None nếu chưa gán
+    usage_count: int
+
+
+class PartPlan(NamedTuple):
+    """Kế hoạch một part: danh sách (vị trí (from_ques, to_ques), id bộ câu hỏi trong ngân hàng)."""
+    part_number: int
+    part_description: object
+    slots: list
+
+
+def part_slots(part_number):
+    return list(PART_STRUCTURE[f'PART_{part_number}']['sets'])
+
+
+def _pool_key(part_description_id):
+    return f"question_set_pool:{part_description_id}:{get_generation(BANK, part_description_id)}"
+
+
+def get_set_pool(part_description_id):
+    """
+    Danh sách bộ câu hỏi của part_description trong ngân hàng, kèm độ khó và số lần đã dùng
+    lúc đọc pool (cache tới POOL_TTL; số lần dùng mới nhất: get_usage_counts).
+    """
+    key = _pool_key(part_description_id)
+    pool = cache.get(key)
+    if pool is None:
+        difficulty = Avg(Case(
+            *[When(question_bank_question_set_bank__difficulty_level=level, then=Value(float(index)))
+              for index, level in enumerate(DIFFICULTY_LEVELS)],
+            output_field=FloatField(),
+        ))
+        rows = (QuestionSetBank.objects
+                .filter(part_description_id=part_description_id, deleted_at__isnull=True)
+                .annotate(difficulty=difficulty)
+                .order_by('id')
+                .values_list('id', 'from_ques', 'to_ques', 'difficulty', 'usage_count'))
+        pool = [PoolEntry(set_id, from_ques, to_ques,
+                          round(level) if level is not None else None, usage_count)
+                for set_id, from_ques, to_ques, level, usage_count in rows]
+        cache.set(key, pool, POOL_TTL)
+    return pool
+
+
+def get_usage_counts(part_description_id):
+    """usage_count hiện tại của các bộ câu hỏi, đọc thẳng DB (write_parts tăng bằng update())."""
+    return dict(QuestionSetBank.objects
+                .filter(part_description_id=part_description_id, deleted_at__isnull=True)
+                .values_list('id', 'usage_count'))
+
+
+def plan_part(part_number, part_description, exclude=frozenset(), difficulty_mix=None, rng=random):
+    """
+    Chọn bộ câu hỏi cho từng vị trí của part, không lặp lại và không dùng id trong `exclude`.
+    `difficulty_mix` ví dụ {"BASIC": 0.3, "MEDIUM": 0.5, "DIFFICULTY": 0.2}; bộ đã dùng nhiều
+    lần có xác suất được chọn thấp hơn.
+    Ngân hàng không đủ bộ thì part có ít bộ hơn (như cách tạo cũ), riêng part có vị trí
+    cố định khoảng câu (Part 7) thì báo lỗi.
+    """
+    part_number = int(part_number)
+    slots = part_slots(part_number)
+    index = get_sampling_index(part_description.id, get_set_pool, get_usage_counts)
+
+    if part_number not in EXACT_RANGE_PARTS:
+        chosen = index.sample(len(slots), difficulty_mix, exclude, rng)
+        if difficulty_mix and len(chosen) < len(slots):
+            # Không đủ bộ đúng tỉ lệ độ khó -> bù bằng các bộ còn lại thay vì để trống vị trí
+            taken = set(exclude) | {entry.id for entry in chosen}
+            chosen += index.sample(len(slots) - len(chosen), None, taken, rng)
+        return PartPlan(part_number, part_description,
+                        [(slot, entry.id) for slot, entry in zip(slots, chosen)])
+
+    by_range = {}
+    for entry in index.entries:
+        if entry.id not in exclude:
+            by_range.setdefault((entry.from_ques, entry.to_ques), []).append(entry.id)
+    planned = []
+    for slot in slots:
+        candidates = by_range.get(slot)
+        if not candidates:
+            raise ValueError(f"Question bank has no question set for Part {part_number} ({slot[0]}-{slot[1]})")
+        planned.append((slot, index.choose(candidates, difficulty_mix, rng)))
+    return PartPlan(part_number, part_description, planned)
+
+
+def _copy_sets(test, parts_with_plans):
+    """Sao chép các bộ câu hỏi đã chọn sang đề bằng hai truy vấn đọc và hai lần bulk_create."""
+    set_ids = [set_id for _, plan in parts_with_plans for _, set_id in plan.slots]
+    bank_sets = QuestionSetBank.objects.only('id', 'audio', 'page', 'image').in_bulk(set_ids)
+    bank_questions = {}
+    for question in (QuestionBank.objects.filter(question_set_id__in=set_ids)
+                     .only('id', 'question_set_id', 'question_text', 'answers',
+                           'correct_answer', 'difficulty_level')
+                     .order_by('question_set_id', 'question_number', 'id')):
+        bank_questions.setdefault(question.question_set_id, []).append(question)
+
+    new_sets, sources = [], []
+    for part, plan in parts_with_plans:
+        for (from_ques, to_ques), set_id in plan.slots:
+            bank_set = bank_sets[set_id]
+            new_sets.append(QuestionSet(
+                part=part,
+                test=test,
+                from_ques=from_ques,
+                to_ques=to_ques,
+                audio=bank_set.audio,
+                page=bank_set.page,
+                image=bank_set.image,
+            ))
+            sources.append((part, from_ques, set_id))
+    QuestionSet.objects.bulk_create(new_sets)
+
+    new_questions = []
+    for question_set, (part, from_ques, set_id) in zip(new_sets, sources):
+        for index, question in enumerate(bank_questions.get(set_id, ())):
+            new_questions.append(Question(
+                question_set=question_set,
+                part=part,
+                test=test,
+                question_text=question.question_text,
+                answers=question.answers,
+                correct_answer=question.correct_answer,
+                question_number=from_ques + index,
+                difficulty_level=question.difficulty_level,
+            ))
+    Question.objects.bulk_create(new_questions)
+    return new_sets, new_questions
+
+
+def write_parts(test, plans):
+    """
+    Ghi các part đã lên kế hoạch vào đề trong một transaction.
+    bulk_create không phát signal nên tự cập nhật bộ đếm và cache của đề.
+    """
+    from EStudyApp.signals import invalidate_tests
+
+    with transaction.atomic():
+        parts = Part.objects.bulk_create(
+            [Part(part_description=plan.part_description, test=test) for plan in plans])
+        _copy_sets(test, list(zip(parts, plans)))
+        refresh_part_counters(part.id for part in parts)
+        refresh_test_counters({test.id})
+        invalidate_tests({test.id})
+        # Đếm số lần dùng để lần tạo đề sau ưu tiên bộ ít dùng (update() không phát signal,
+        # không làm mất pool đã cache)
+        used = {plan.part_description.id: [set_id for _, set_id in plan.slots] for plan in plans}
+        QuestionSetBank.objects.filter(
+            id__in=[set_id for set_ids in used.values() for set_id in set_ids]
+        ).update(usage_count=F('usage_count') + 1)
+        for part_description_id, set_ids in used.items():
+            transaction.on_commit(partial(record_usage, part_description_id, set_ids))
+    return parts
+
+
+def assemble_part(test, part_number, part_description, difficulty_mix=None, rng=random):
+    """Tạo một part hoàn chỉnh cho đề từ ngân hàng câu hỏi."""
+    plan = plan_part(part_number, part_description, difficulty_mix=difficulty_mix, rng=rng)
+    return write_parts(test, [plan])[0]
+
+
+def get_part_descriptions(part_numbers=PART_NUMBERS):
+    """PartDescription theo số part (tìm theo part_name "Part N" như CreatePartAutoAPIView)."""
+    by_name = {description.part_name: description for description in
+               PartDescription.objects.filter(part_name__in=[f"Part {n}" for n in part_numbers])}
+    missing = [n for n in part_numbers if f"Part {n}" not in by_name]
+    if missing:
+        raise PartDescription.DoesNotExist(f"Part description not found for parts {missing}")
+    return {n: by_name[f"Part {n}"] for n in part_numbers}
+
+
+def assemble_test(test, difficulty_mix=None, rng=random):
+    """
+    Tạo đủ các part của PART_STRUCTURE cho đề trong một lần:
+    lên kế hoạch tất cả part trước (không bộ câu hỏi nào dùng hai lần trong đề),
+    sau đó ghi toàn bộ bằng một transaction. Trả về (parts, báo cáo thời gian theo part).
+    """
+    descriptions = get_part_descriptions()
+    plans, report, used = [], [], set()
+    for part_number in PART_NUMBERS:
+        started = time.perf_counter()
+        plan = plan_part(part_number, descriptions[part_number], exclude=used,
+                         difficulty_mix=difficulty_mix, rng=rng)
+        used.update(set_id for _, set_id in plan.slots)
+        plans.append(plan)
+        report.append({
+            "part_number": part_number,
+            "question_sets": len(plan.slots),
+            "plan_ms": round((time.perf_counter() - started) * 1000, 2),
+        })
+
+    started = time.perf_counter()
+    parts = write_parts(test, plans)
+    write_ms = round((time.perf_counter() - started) * 1000, 2)
+    for row, part in zip(report, parts):
+        row["part_id"] = part.id
+    return parts, {"parts": report, "write_ms": write_ms}
+
+
+def run_assemble_part_job(payload, progress):
+    """Handler job "assemble_part" (services/jobs.py), trả về part đã serialize như API cũ."""
+    from EStudyApp.serializers import PartListSerializer
+
+    test = Test.objects.get(id=payload["test_id"])
+    part_description = PartDescription.objects.get(id=payload["part_description_id"])
+    # Job có thể chạy lại khi lease hết hạn -> không tạo trùng part
+    if Part.objects.filter(part_description=part_description, test=test).exists():
+        raise ValueError("Part already exists")
+    part = assemble_part(test, payload["part_number"], part_description,
+                         difficulty_mix=payload.get("difficulty_mix"))
+    return PartListSerializer(part).data
+
+
+def run_generate_test_job(payload, progress):
+    """Handler job "generate_test" (services/jobs.py), trả về báo cáo thời gian theo part."""
+    test = Test.objects.get(id=payload["test_id"])
+    if Part.objects.filter(test=test).exists():
+        raise ValueError("Test already has parts")
+    started = time.perf_counter()
+    _, report = assemble_test(test, difficulty_mix=payload.get("difficulty_mix"))
+    report["test_id"] = test.id
+    report["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return report
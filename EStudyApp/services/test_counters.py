@@ -0,0 +1,74 @@
+# EStudyApp/services/test_counters.py
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from EStudyApp.models import Test, Part, Question
+
+
+def _part_question_count():
+    return Coalesce(Subquery(
+        Question.objects.filter(part=OuterRef('pk')).order_by()
+        .values('part').annotate(total=Count('id')).values('total')
+    ), 0)
+
+
+def _test_part_total():
+    return Coalesce(Subquery(
+        Part.objects.filter(test=OuterRef('pk')).order_by()
+        .values('test').annotate(total=Count('id')).values('total')
+    ), 0)
+
+
+def _test_question_total():
+    # Như Test.question_total trước đây: đếm theo khóa ngoại Question.test, không qua part
+    return Coalesce(Subquery(
+        Question.objects.filter(test=OuterRef('pk')).order_by()
+        .values('test').annotate(total=Count('id')).values('total')
+    ), 0)
+
+
+def refresh_part_counters(part_ids):
+    """Tính lại Part.question_count bằng một câu UPDATE (không phát signal)."""
+    part_ids = {part_id for part_id in part_ids if part_id is not None}
+    if part_ids:
+        Part.objects.filter(id__in=part_ids).update(question_count=_part_question_count())
+
+
+def refresh_test_counters(test_ids):
+    """Tính lại Test.part_total / Test.question_total bằng một câu UPDATE (không phát signal)."""
+    test_ids = {test_id for test_id in test_ids if test_id is not None}
+    if test_ids:
+        Test.objects.filter(id__in=test_ids).update(
+            part_total=_test_part_total(),
+            question_total=_test_question_total(),
+        )
+
+
+def refresh_all_counters():
+    """Tính lại toàn bộ bộ đếm (dùng sau các thao tác bulk không phát signal)."""
+    Part.objects.update(question_count=_part_question_count())
+    Test.objects.update(part_total=_test_part_total(), question_total=_test_question_total())
+
+
+def find_counter_drift(test_ids=None):
+    """
+    So sánh bộ đếm đã lưu với giá trị thực tế.
+    Trả về (danh sách Test lệch, danh sách Part lệch) dạng dict.
+    """
+    tests = Test.objects.all()
+    parts = Part.objects.all()
+    if test_ids:
+        tests = tests.filter(id__in=test_ids)
+        parts = parts.filter(test_id__in=test_ids)
+
+    test_drift = list(
+        tests.annotate(actual_part_total=_test_part_total(), actual_question_total=_test_question_total())
+        .exclude(part_total=F('actual_part_total'), question_total=F('actual_question_total'))
+        .values('id', 'part_total', 'actual_part_total', 'question_total', 'actual_question_total')
+    )
+    part_drift = list(
+        parts.annotate(actual_question_count=_part_question_count())
+        .exclude(question_count=F('actual_question_count'))
+        .values('id', 'test_id', 'question_count', 'actual_question_count')
+    )
+    return test_drift, part_drift
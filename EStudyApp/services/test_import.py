@@ -0,0 +1,285 @@
+# EStudyApp/services/test_import.py
+"""
+Import đề từ file JSON cào được (scrapper/data-test + scrapper/answers) theo kiểu streaming.
+
+- File được đọc từng đoạn và giải mã từng phần tử (JsonStream), không json.load cả file.
+- Câu hỏi được gom thành bộ (cùng image/audio/page) trong một lượt qua từng part.
+- Part/QuestionSet/QuestionSetBank/Question/QuestionBank được ghi bằng bulk_create theo lô
+  trong một transaction; bộ đếm và cache của đề được cập nhật một lần ở cuối.
+"""
+import codecs
+import json
+import os
+
+from django.db import transaction
+
+from EStudyApp.models import Test, Part, PartDescription, QuestionSet, Question
+from EStudyApp.services.cache_versions import BANK, bump_generations
+from EStudyApp.services.test_counters import refresh_part_counters, refresh_test_counters
+from question_bank.models import QuestionSetBank, QuestionBank
+
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 500
+_WHITESPACE = ' \t\n\r'
+
+
+class JsonStream:
+    """
+    Bộ đọc JSON tăng dần trên file nhị phân: duyệt object/array cấp ngoài từng phần tử,
+    mỗi phần tử được giải mã bằng json.JSONDecoder.raw_decode trên bộ đệm nhỏ.
+    """
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buffer = ''
+        self.pos = 0
+        self.bytes_read = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        self.bytes_read += len(chunk)
+        if not chunk:
+            self.eof = True
+            self.buffer += self.text_decoder.decode(b'', final=True)
+            return False
+        # Bỏ phần đã đọc xong để bộ đệm không lớn dần theo file
+        self.buffer = self.buffer[self.pos:] + self.text_decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos] if self.pos < len(self.buffer) else ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Invalid JSON: expected {char!r}, found {found!r}")
+        self.pos += 1
+
+    def value(self):
+        """Giải mã một giá trị JSON hoàn chỉnh tại vị trí hiện tại."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # Số ở cuối bộ đệm có thể còn chữ số trong đoạn sau
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _separator(self, closing):
+        char = self.peek()
+        self.pos += 1
+        if char == ',':
+            return False
+        if char == closing:
+            return True
+        raise ValueError(f"Invalid JSON: expected ',' or {closing!r}, found {char!r}")
+
+    def iter_values(self):
+        """Duyệt từng phần tử của array tại vị trí hiện tại."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self._separator(']'):
+                return
+
+    def iter_keys(self):
+        """
+        Duyệt từng key của object tại vị trí hiện tại; người gọi phải đọc giá trị
+        (value() hoặc iter_values()) trước khi lấy key tiếp theo.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self._separator('}'):
+                return
+
+
+def load_correct_answers(path):
+    """Đáp án theo số câu từ file answers (phần tử đầu là tiêu đề)."""
+    correct_answers = {}
+    with open(path, 'rb') as file:
+        for index, part_data in enumerate(JsonStream(file).iter_values()):
+            if index == 0 or not isinstance(part_data, dict):
+                continue
+            for question in part_data.get("Danh sách câu hỏi", []):
+                correct_answers[int(question["question_number"])] = question["correct_answer"]
+    return correct_answers
+
+
+def iter_parts(stream):
+    """Duyệt (tên part, iterator các phần tử câu hỏi) trong questions_by_part."""
+    for key in stream.iter_keys():
+        if key != "questions_by_part":
+            stream.value()
+            continue
+        for part_name in stream.iter_keys():
+            yield part_name, stream.iter_values()
+
+
+def group_question_sets(items):
+    """
+    Gom câu hỏi có cùng image/audio/page thành một bộ, giữ thứ tự xuất hiện.
+    Phần tử dạng bộ (Part 3, 4, 6, 7) có danh sách "questions", phần tử câu đơn thì không.
+    Phần tử không có image/audio/page (Part 5) là một bộ riêng, khớp vị trí (n, n) trong PART_STRUCTURE.
+    """
+    groups = {}
+    for position, item in enumerate(items):
+        image = ','.join(item.get("image") or [])
+        audio = ','.join(item.get("audio") or [])
+        page = item.get("page") or ''
+        key = f"{image}_{audio}_{page}" if image or audio or page else position
+        group = groups.setdefault(key, {
+            'image': image, 'audio': audio, 'page': page, 'questions': [],
+        })
+        group['questions'].extend(item["questions"] if "questions" in item else [item])
+    return list(groups.values())
+
+
+class ImportProgress:
+    def __init__(self, total_bytes=0):
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.parts = 0
+        self.question_sets = 0
+        self.questions = 0
+
+    def as_dict(self):
+        return {
+            "parts": self.parts,
+            "question_sets": self.question_sets,
+            "questions": self.questions,
+            "percent": round(min(self.bytes_read / self.total_bytes, 1) * 100, 1) if self.total_bytes else 0,
+        }
+
+
+class _Writer:
+    """Gom câu hỏi chờ ghi và bulk_create theo lô BATCH_SIZE."""
+
+    def __init__(self, test, correct_answers, batch_size):
+        self.test = test
+        self.correct_answers = correct_answers
+        self.batch_size = batch_size
+        self.questions = []
+        self.bank_questions = []
+        self.part_ids = []
+        self.part_description_ids = set()
+        self.descriptions = {}
+
+    def part_description(self, part_name):
+        if part_name not in self.descriptions:
+            self.descriptions[part_name], _ = PartDescription.objects.get_or_create(
+                part_name=part_name,
+                defaults={"part_description": ""}
+            )
+        return self.descriptions[part_name]
+
+    def correct_answer(self, question_number):
+        try:
+            return self.correct_answers[question_number]
+        except KeyError:
+            raise ValueError(f"Answer file has no correct answer for question {question_number}")
+
+    def write_part(self, part_name, groups):
+        part_description = self.part_description(part_name)
+        part, = Part.objects.bulk_create([Part(test=self.test, part_description=part_description)])
+        self.part_ids.append(part.id)
+        self.part_description_ids.add(part_description.id)
+
+        numbers = [[int(question["question_number"]) for question in group['questions']] for group in groups]
+        question_sets = QuestionSet.objects.bulk_create([
+            QuestionSet(test=self.test, part=part, from_ques=group_numbers[0], to_ques=group_numbers[-1],
+                        image=group['image'], audio=group['audio'], page=group['page'])
+            for group, group_numbers in zip(groups, numbers)
+        ])
+        bank_sets = QuestionSetBank.objects.bulk_create([
+            QuestionSetBank(part_description=part_description, from_ques=question_set.from_ques,
+                            to_ques=question_set.to_ques, image=question_set.image, audio=question_set.audio,
+                            page=question_set.page, note=f"Question set {question_set.id}")
+            for question_set in question_sets
+        ])
+
+        for group, group_numbers, question_set, bank_set in zip(groups, numbers, question_sets, bank_sets):
+            for question, question_number in zip(group['questions'], group_numbers):
+                correct_answer = self.correct_answer(question_number)
+                fields = {
+                    "question_number": question_number,
+                    "question_text": question.get("question_text", ""),
+                    "answers": question.get("answers", {}),
+                    "correct_answer": correct_answer,
+                }
+                self.questions.append(Question(test=self.test, question_set=question_set, part=part, **fields))
+                self.bank_questions.append(QuestionBank(question_set=bank_set,
+                                                        part_description=part_description, **fields))
+        if len(self.questions) >= self.batch_size:
+            self.flush()
+        return len(question_sets), sum(len(group_numbers) for group_numbers in numbers)
+
+    def flush(self):
+        Question.objects.bulk_create(self.questions, batch_size=self.batch_size)
+        QuestionBank.objects.bulk_create(self.bank_questions, batch_size=self.batch_size)
+        self.questions, self.bank_questions = [], []
+
+
+def import_test_files(test_id, question_path, answer_path, progress=None, batch_size=BATCH_SIZE):
+    """
+    Import câu hỏi của file đề vào Test `test_id` và ngân hàng câu hỏi.
+    `progress(ImportProgress)` được gọi sau mỗi part. Raise Test.DoesNotExist / ValueError.
+    """
+    correct_answers = load_correct_answers(answer_path)
+    test = Test.objects.get(id=test_id)
+    stats = ImportProgress(os.path.getsize(question_path))
+
+    from EStudyApp.signals import invalidate_tests
+
+    with open(question_path, 'rb') as file, transaction.atomic():
+        stream = JsonStream(file)
+        writer = _Writer(test, correct_answers, batch_size)
+        for part_name, items in iter_parts(stream):
+            question_sets, questions = writer.write_part(part_name, group_question_sets(items))
+            stats.parts += 1
+            stats.question_sets += question_sets
+            stats.questions += questions
+            stats.bytes_read = stream.bytes_read
+            if progress:
+                progress(stats)
+        writer.flush()
+
+        # bulk_create không phát signal -> cập nhật bộ đếm và cache một lần
+        refresh_part_counters(writer.part_ids)
+        refresh_test_counters({test.id})
+        invalidate_tests({test.id})
+        bump_generations(BANK, writer.part_description_ids)
+    stats.bytes_read = stats.total_bytes
+    return stats
+
+
+def run_import_job(payload, progress):
+    """Handler job "import_test" (services/jobs.py)."""
+    stats = import_test_files(payload["test_id"], payload["question_path"], payload["answer_path"],
+                              progress=lambda stats: progress(stats.as_dict()))
+    return stats.as_dict()
@@ -1,21 +1,67 @@
 # signals.py
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
-from EStudyApp.models import History, Test, Part, Question
+from EStudyApp.models import History, Test, Part, QuestionSet, Question
+from EStudyApp.services.cache_versions import BANK, CATALOG, CATALOG_ID, USER, bump_generations
+from EStudyApp.services.paper_snapshot import invalidate_paper
+from EStudyApp.services.result_summary import refresh_summaries
+from EStudyApp.services.test_counters import refresh_part_counters, refresh_test_counters
+from question_bank.models import QuestionSetBank
+
+
+def invalidate_tests(test_ids):
+    # Tăng generation của đúng các đề này (đáp án, bản chụp đề, kết quả làm đề)
+    # và của danh sách đề; gom lại một lần khi transaction commit
+    invalidate_paper(test_ids)
+    bump_generations(CATALOG, {CATALOG_ID})
 
 @receiver([post_save, post_delete], sender=History)
 def clear_history_cache(sender, instance, **kwargs):
-    # Xóa cache khi History thay đổi
-    cache.delete_pattern("history_detail*")
-    cache.delete_pattern("submit_test*")
+    # Chỉ vô hiệu hóa cache của user làm bài (lịch sử, điểm gần nhất trên danh sách đề)
+    # và dựng lại bản tóm tắt kết quả giáo viên tra cứu (services/result_summary.py)
+    bump_generations(USER, {instance.user_id}, then=refresh_summaries)
 
 @receiver([post_save, post_delete], sender=Test)
+def clear_test_cache(sender, instance, **kwargs):
+    invalidate_tests({instance.id})
+
+@receiver(post_save, sender=Test)
+def refresh_saved_test_counters(sender, instance, created, update_fields=None, **kwargs):
+    # save() ghi cả bộ đếm từ instance trong bộ nhớ (có thể đã cũ) -> tính lại
+    if created or (update_fields and not {'part_total', 'question_total'} & set(update_fields)):
+        return
+    refresh_test_counters({instance.id})
+
+@receiver([post_save, post_delete], sender=QuestionSet)
+def invalidate_question_set_paper(sender, instance, **kwargs):
+    test_ids = {instance.test_id}
+    if instance.part_id:
+        test_ids.add(
+            Part.objects.filter(id=instance.part_id).values_list('test_id', flat=True).first()
+        )
+    invalidate_paper(test_ids)
+
 @receiver([post_save, post_delete], sender=Part)
+def sync_part_derived_data(sender, instance, **kwargs):
+    # Part đổi test hoặc part_description -> skill của câu hỏi thay đổi
+    invalidate_tests({instance.test_id})
+    if kwargs.get('signal') is post_save:
+        refresh_part_counters({instance.id})
+    refresh_test_counters({instance.test_id})
+
 @receiver([post_save, post_delete], sender=Question)
-def clear_test_cache(sender, instance, **kwargs):
-    # Xóa cache khi Test thay đổi
-    cache.delete_pattern("submit_test*")
-    cache.delete_pattern("test_detail:*")
-    cache.delete_pattern("test_part_detail:*")
-    cache.delete_pattern("test_list:*")
+def sync_question_derived_data(sender, instance, **kwargs):
+    # Câu hỏi có thể gắn test trực tiếp hoặc qua part
+    test_ids = {instance.test_id}
+    if instance.part_id:
+        test_ids.add(
+            Part.objects.filter(id=instance.part_id).values_list('test_id', flat=True).first()
+        )
+    invalidate_tests(test_ids)
+    refresh_part_counters({instance.part_id})
+    refresh_test_counters({instance.test_id})  # question_total đếm theo Question.test
+
+@receiver([post_save, post_delete], sender=QuestionSetBank)
+def invalidate_question_set_pool(sender, instance, **kwargs):
+    # Pool id bộ câu hỏi dùng khi tạo đề tự động (services/test_assembly.py)
+    bump_generations(BANK, {instance.part_description_id})
@@ -59,3 +59,414 @@
 #         # Tạo một name vượt quá max_length
 #         with self.assertRaises(ValueError):
 #             Test.objects.create(name="A" * 256)
+
+
+from django.test import SimpleTestCase
+
+from EStudyApp.models import Part, Question
+from EStudyApp.services.answer_key import AnswerKey, AnswerKeyEntry
+from EStudyApp.services.grading import grade, grade_batch
+
+
+class GradingTestCase(SimpleTestCase):
+    def setUp(self):
+        self.answer_key = AnswerKey(1, 0, {
+            10: AnswerKeyEntry("A", "LISTENING", 1),
+            11: AnswerKeyEntry("B", "LISTENING", 1),
+            20: AnswerKeyEntry("C", "READING", 5),
+            21: AnswerKeyEntry("D", "READING", 5),
+        })
+
+    def test_grade_counts_by_skill_and_part(self):
+        data = [
+            {"id": 10, "user_answer": "a"},
+            {"id": 11, "user_answer": "C"},
+            {"id": 20, "user_answer": "C"},
+            {"id": 21, "user_answer": None},
+            {"id": 99, "user_answer": "A"},  # không thuộc đề
+        ]
+        result = grade(self.answer_key, data)
+        result.annotate(data)
+
+        self.assertEqual(result.listening_correct, 1)
+        self.assertEqual(result.listening_total, 2)
+        self.assertEqual(result.reading_correct, 1)
+        self.assertEqual(result.reading_total, 1)
+        self.assertEqual(data[1]["correct_answer"], "B")
+        self.assertNotIn("correct_answer", data[4])
+        self.assertEqual(result.part_results(), [
+            {"part_id": 1, "correct_answers": 1, "wrong_answers": 1,
+             "unanswer_questions": 0, "percentage_score": 50.0},
+            {"part_id": 5, "correct_answers": 1, "wrong_answers": 0,
+             "unanswer_questions": 1, "percentage_score": 100.0},
+        ])
+
+    def test_invalid_correct_answer_never_matches(self):
+        answer_key = AnswerKey(1, 0, {
+            10: AnswerKeyEntry("", "LISTENING", 1),
+            11: AnswerKeyEntry("E", "LISTENING", 1),
+            12: AnswerKeyEntry(None, "LISTENING", 1),
+        })
+        payload = [{"id": 10, "user_answer": "X"}, {"id": 11, "user_answer": "E"}, {"id": 12, "user_answer": "A"}]
+        result = grade(answer_key, payload)
+        self.assertEqual((result.listening_correct, result.listening_total), (0, 3))
+        batch = grade_batch(answer_key, [payload])
+        self.assertEqual((batch.correct.tolist(), batch.wrong.tolist()), ([0], [3]))
+
+    def test_grade_batch_matches_single_grading(self):
+        payloads = [
+            [{"id": 10, "user_answer": "A"}, {"id": 20, "user_answer": "C"}],
+            [{"id": "11", "user_answer": "b"}, {"id": 21, "user_answer": "A"}],
+            None,
+        ]
+        result = grade_batch(self.answer_key, payloads)
+
+        self.assertEqual(len(result), 3)
+        self.assertEqual(result.listening_correct.tolist(), [1, 1, 0])
+        self.assertEqual(result.reading_correct.tolist(), [1, 0, 0])
+        self.assertEqual(result.wrong.tolist(), [0, 1, 0])
+        for row, payload in enumerate(payloads[:2]):
+            single = grade(self.answer_key, payload)
+            self.assertEqual(single.listening_correct, result.listening_correct[row])
+            self.assertEqual(single.reading_total, result.reading_total[row])
+
+
+from EStudyApp.calculate_toeic import calculate_toeic_score, calculate_toeic_scores_batch
+from EStudyApp.toeic_score_mapping import toeic_score_mapping
+
+
+class ToeicScoreTestCase(SimpleTestCase):
+    def test_scalar_matches_mapping_and_clamps(self):
+        for count, (listening, reading) in toeic_score_mapping.items():
+            self.assertEqual(calculate_toeic_score(count, count), (listening, reading, listening + reading))
+        self.assertEqual(calculate_toeic_score(-1, 150), (5, 495, 500))
+
+    def test_batch_matches_scalar(self):
+        listening = list(range(-2, 103))
+        reading = list(reversed(listening))
+        listening_scores, reading_scores, overall_scores = calculate_toeic_scores_batch(listening, reading)
+        for index, (l, r) in enumerate(zip(listening, reading)):
+            self.assertEqual(
+                calculate_toeic_score(l, r),
+                (listening_scores[index], reading_scores[index], overall_scores[index]))
+
+
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+
+from EStudyApp.services import catalog_cache
+
+
+class CatalogCacheTestCase(SimpleTestCase):
+    def test_catalog_key_ignores_unrelated_params(self):
+        self.assertEqual(
+            catalog_cache.catalog_key({"type": "Practice", "page": "2", "_": "123"}),
+            catalog_cache.catalog_key({"page": "2", "type": "Practice"}))
+        self.assertNotEqual(
+            catalog_cache.catalog_key({"type": "Practice", "page": "2"}),
+            catalog_cache.catalog_key({"type": "Practice", "page": "3"}))
+
+    def test_overlay_is_per_user_and_does_not_touch_shared_page(self):
+        shared = {"results": [{"id": 1, "latest_history": None}, {"id": 2, "latest_history": None}],
+                  "pagination": {"total_items": 2}}
+        user = mock.Mock(id=7, is_authenticated=True)
+        with mock.patch.object(catalog_cache, "get_user_overlay", return_value={2: {"id": 50, "score": 600}}):
+            merged = catalog_cache.apply_user_overlay(shared, user)
+
+        self.assertEqual([item["latest_history"] for item in merged["results"]], [None, {"id": 50, "score": 600}])
+        self.assertIsNone(shared["results"][1]["latest_history"])
+        anonymous = catalog_cache.apply_user_overlay(shared, AnonymousUser())
+        self.assertEqual(anonymous, shared)
+
+
+import gzip
+import json
+
+from EStudyApp.services.paper_snapshot import PaperSnapshot, etag_matches, part_subset, render
+
+
+class PaperSnapshotTestCase(SimpleTestCase):
+    def setUp(self):
+        raw = render({
+            "id": 1,
+            "part_test": [{"id": 10}, {"id": 11}],
+            "question_test": [{"id": 100, "part_id": 10}, {"id": 101, "part_id": 11}],
+        })
+        self.snapshot = PaperSnapshot(1, 5, "abc", gzip.compress(raw))
+
+    def test_part_subset_keeps_selected_parts_only(self):
+        etag, data = part_subset(self.snapshot, [11])
+        keys = list(json.loads(render({"part_test": None, "question_test": None})))
+
+        self.assertEqual([part["id"] for part in data[keys[0]]], [11])
+        self.assertEqual(len(data[keys[1]]), 1)
+        self.assertEqual(etag, part_subset(self.snapshot, [11, 11])[0])
+        self.assertNotEqual(etag, part_subset(self.snapshot, [10])[0])
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"abc"', "abc"))
+        self.assertTrue(etag_matches('W/"zzz", "abc"', "abc"))
+        self.assertTrue(etag_matches('*', "abc"))
+        self.assertFalse(etag_matches('"abd"', "abc"))
+        self.assertFalse(etag_matches(None, "abc"))
+
+
+from django.urls import resolve, reverse
+
+
+class UrlConfTestCase(SimpleTestCase):
+    def test_test_list_route_resolves(self):
+        # Import lỗi trong EStudyApp/urls.py làm hỏng mọi route của app, không chỉ tests/
+        from EStudyApp.views import TestListView
+
+        self.assertEqual(reverse('test-list'), '/api/v1/app/tests/')
+        self.assertIs(resolve('/api/v1/app/tests/').func.view_class, TestListView)
+
+
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from EStudyApp.services import cache_versions
+
+
+class CacheVersionsTestCase(TestCase):
+    def test_bumps_are_coalesced_until_commit(self):
+        before = cache_versions.get_generation(cache_versions.TEST, 42)
+        other = cache_versions.get_generation(cache_versions.TEST, 43)
+        seen = []
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for _ in range(3):
+                cache_versions.bump_generations(cache_versions.TEST, {42, None}, then=seen.append)
+            self.assertEqual(cache_versions.get_generation(cache_versions.TEST, 42), before)
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotEqual(cache_versions.get_generation(cache_versions.TEST, 42), before)
+        self.assertEqual(cache_versions.get_generation(cache_versions.TEST, 43), other)
+        self.assertEqual(seen, [{42}])
+
+    def test_bumps_in_rolled_back_savepoint_are_dropped(self):
+        before = cache_versions.get_generations((cache_versions.TEST, 44), (cache_versions.TEST, 45))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    cache_versions.bump_generations(cache_versions.TEST, {44})
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+            cache_versions.bump_generations(cache_versions.TEST, {45})
+
+        self.assertEqual(len(callbacks), 1)
+        after = cache_versions.get_generations((cache_versions.TEST, 44), (cache_versions.TEST, 45))
+        self.assertEqual(after[0], before[0])
+        self.assertNotEqual(after[1], before[1])
+
+    def test_each_commit_flushes_its_own_bumps(self):
+        for ident in (46, 47):
+            before = cache_versions.get_generation(cache_versions.TEST, ident)
+            with self.captureOnCommitCallbacks(execute=True):
+                cache_versions.bump_generations(cache_versions.TEST, {ident})
+            self.assertNotEqual(cache_versions.get_generation(cache_versions.TEST, ident), before)
+
+
+import random
+from collections import Counter
+
+from EStudyApp.services.sampling_index import FenwickTree, SamplingIndex
+from EStudyApp.services.test_assembly import PoolEntry
+
+
+class SamplingIndexTestCase(SimpleTestCase):
+    def setUp(self):
+        # 40 bộ BASIC (0), 10 bộ DIFFICULTY (2)
+        self.entries = [PoolEntry(i, 1, 1, 0 if i < 40 else 2, 0) for i in range(50)]
+
+    def test_fenwick_find_matches_prefix_sums(self):
+        tree = FenwickTree([1.0, 0.0, 2.0, 3.0])
+        self.assertEqual(tree.total(), 6.0)
+        self.assertEqual([tree.find(value) for value in (0, 0.99, 1.0, 2.99, 3.0, 5.99)], [0, 0, 2, 2, 3, 3])
+        tree.add(0, -1.0)
+        self.assertEqual(tree.find(0), 2)
+
+    def test_sample_without_replacement_respects_exclude(self):
+        index = SamplingIndex(self.entries)
+        chosen = index.sample(45, exclude={0, 1, 2, 3, 4}, rng=random.Random(1))
+        ids = [entry.id for entry in chosen]
+        self.assertEqual(len(ids), 45)
+        self.assertEqual(len(set(ids)), 45)
+        self.assertFalse({0, 1, 2, 3, 4} & set(ids))
+        # Cây được trả lại nguyên trạng sau khi rút
+        self.assertEqual(len(index.sample(50, rng=random.Random(2))), 50)
+
+    def test_difficulty_mix_and_reuse_penalty(self):
+        index = SamplingIndex(self.entries)
+        rng = random.Random(3)
+        levels = Counter(entry.difficulty for _ in range(400)
+                         for entry in index.sample(2, {"basic": 0.5, "difficulty": 0.5}, rng=rng))
+        self.assertAlmostEqual(levels[2] / sum(levels.values()), 0.5, delta=0.06)
+
+        for _ in range(9):
+            index.record_usage(range(25))
+        counts = Counter(entry.id < 25 for _ in range(400) for entry in index.sample(1, rng=rng))
+        self.assertLess(counts[True], counts[False] / 3)
+
+        with self.assertRaises(ValueError):
+            index.sample(1, {"EASY": 1})
+
+
+from django.core.cache import cache
+from django.db.models import F
+
+from EStudyApp.models import PartDescription
+from EStudyApp.services import sampling_index
+from EStudyApp.services.sampling_index import get_sampling_index
+from EStudyApp.services.test_assembly import get_set_pool, get_usage_counts
+from question_bank.models import QuestionSetBank
+
+
+class SamplingIndexRebuildTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(sampling_index._indexes.clear)
+
+    def test_rebuilds_keep_usage_counts(self):
+        description = PartDescription.objects.create(part_name="Part 5")
+        sets = QuestionSetBank.objects.bulk_create(
+            [QuestionSetBank(part_description=description, from_ques=1, to_ques=1) for _ in range(3)])
+        used = sets[0].id
+        with mock.patch.object(sampling_index, "LOCAL_TTL", 0):
+            for expected in (1, 2):
+                index = get_sampling_index(description.id, get_set_pool, get_usage_counts)
+                # Như write_parts: update() trên DB, pool trong cache vẫn giữ usage_count cũ
+                QuestionSetBank.objects.filter(id=used).update(usage_count=F('usage_count') + 1)
+                index.record_usage([used])
+
+                rebuilt = get_sampling_index(description.id, get_set_pool, get_usage_counts)
+                self.assertIsNot(rebuilt, index)
+                self.assertEqual(rebuilt.usage[rebuilt.positions[used]], expected)
+        self.assertEqual(get_set_pool(description.id)[0].usage_count, 0)
+
+
+import io
+
+from EStudyApp.services.test_import import JsonStream, group_question_sets, iter_parts
+
+
+class TestImportStreamTestCase(SimpleTestCase):
+    document = {
+        "title": "Đề thử",
+        "questions_by_part": {
+            "Part 1": [{"question_number": 1, "image": ["a.png"], "audio": ["1.mp3"], "answers": {"A": "x"}}],
+            "Part 5": [{"question_number": 101, "question_text": "q1"},
+                       {"question_number": 102, "question_text": "q2"}],
+            "Part 6": [{"page": "p1", "questions": [{"question_number": 131}, {"question_number": 132}]},
+                       {"page": "p1", "questions": [{"question_number": 133}]}],
+        },
+    }
+
+    def test_stream_matches_json_load_across_chunk_boundaries(self):
+        raw = json.dumps(self.document, ensure_ascii=False, indent=1).encode('utf-8')
+        for chunk_size in (1, 3, 1024):
+            stream = JsonStream(io.BytesIO(raw), chunk_size=chunk_size)
+            parts = {name: list(items) for name, items in iter_parts(stream)}
+            self.assertEqual(parts, self.document["questions_by_part"])
+            self.assertEqual(stream.bytes_read, len(raw))
+
+    def test_group_question_sets(self):
+        parts = self.document["questions_by_part"]
+        self.assertEqual([len(group['questions']) for group in group_question_sets(parts["Part 5"])], [1, 1])
+        groups = group_question_sets(parts["Part 6"])
+        self.assertEqual(len(groups), 1)
+        self.assertEqual([q["question_number"] for q in groups[0]['questions']], [131, 132, 133])
+
+
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from Authentication.models import User
+from EStudyApp.models import History, Test
+from EStudyApp.services.history_service import HistoryService
+
+
+class ResultSummaryTestCase(TransactionTestCase):
+    # Real commits: summaries are rebuilt by on_commit callbacks
+    def setUp(self):
+        cache.clear()  # User ids are reused between tests, so are their cache keys
+        [self.test] = Test.objects.bulk_create([Test(name="ETS Test 1")])  # No signals
+        self.students = [
+            User.objects.create_user(email=f"s{i}@example.com", username=f"student{i}", password="pw")
+            for i in range(3)
+        ]
+        self.save_history(self.students[0], 400)
+        self.save_history(self.students[0], 550)
+        self.save_history(self.students[1], 700)
+
+    def save_history(self, user, score):
+        History.objects.create(
+            user=user, test=self.test, score=score, listening_score=score // 2,
+            reading_score=score // 2, end_time=timezone.now(),
+            complete=True, test_result={"answers": ["A"] * 200},
+        )
+
+    def test_batch_lookup_by_id_or_username_is_served_from_cache(self):
+        service = HistoryService()
+        identifiers = [str(self.students[0].id), "student1", "ghost"]
+        # Summaries were built when the histories were saved: only the user lookup hits the DB
+        with self.assertNumQueries(1):
+            summaries = service.get_result_summaries(identifiers)
+
+        self.assertEqual(set(summaries), {str(self.students[0].id), "student1"})
+        first = summaries[str(self.students[0].id)]
+        self.assertEqual(first["student"], "student0")
+        self.assertEqual([r["score"] for r in first["results"]], [550.0, 400.0])
+        self.assertEqual(first["trend"]["direction"], "up")
+        self.assertEqual(first["trend"]["change"], 150.0)
+        self.assertEqual(summaries["student1"]["trend"]["direction"], None)
+
+    def test_summary_refreshed_on_history_save(self):
+        service = HistoryService()
+        self.assertEqual(service.get_latest_results("student1")[0]["score"], 700.0)
+        self.save_history(self.students[1], 800)
+        with self.assertNumQueries(1):
+            results = service.get_latest_results("student1")
+        self.assertEqual([r["score"] for r in results], [800.0, 700.0])
+        self.assertEqual(results[0]["student"], "student1")
+
+    def test_unfinished_attempts_are_listed(self):
+        # history/results/ trả về cả bài đang làm dở, như trước khi có cache
+        History.objects.create(
+            user=self.students[1], test=self.test, end_time=timezone.now(), complete=False,
+        )
+        results = HistoryService().get_latest_results("student1")
+        self.assertEqual([r["score"] for r in results], [None, 700.0])
+
+    def test_cache_miss_builds_many_students_in_one_query(self):
+        cache.clear()
+        with self.assertNumQueries(2):
+            summaries = HistoryService().get_result_summaries(["student0", "student1", "student2"], limit=1)
+        self.assertEqual(summaries["student0"]["results"][0]["score"], 550.0)
+        self.assertEqual(summaries["student2"]["results"], [])
+        self.assertEqual(summaries["student0"]["trend"]["tests"], 2)
+
+
+from EStudyApp.services.test_counters import find_counter_drift, refresh_test_counters
+
+
+class TestCountersTestCase(TestCase):
+    def test_question_total_counts_through_question_test(self):
+        # bulk_create: không phát signal, bộ đếm chỉ đổi khi gọi refresh
+        [test, other] = Test.objects.bulk_create([Test(name="ETS 1"), Test(name="ETS 2")])
+        [part] = Part.objects.bulk_create([Part(test=test)])
+        Question.objects.bulk_create([
+            Question(test=test, part=part),
+            Question(test=test),            # Gắn thẳng vào đề, không có part
+            Question(test=other, part=part),  # part thuộc đề khác: tính cho `other`
+        ])
+        refresh_test_counters({test.id, other.id})
+
+        test.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((test.part_total, test.question_total), (1, 2))
+        self.assertEqual((other.part_total, other.question_total), (0, 1))
+        self.assertEqual(find_counter_drift([test.id, other.id])[0], [])
@@ -2,7 +2,7 @@ from django.urls import path
 
 
 from EStudyApp.views import CreatePartAutoAPIView, DetailSubmitTestView, DetailTrainingView, EditQuestionsAPIView, \
-    PartListQuestionsSetAPIView, TagListView, TestDetailView, \
+    GenerateTestAutoAPIView, PartListQuestionsSetAPIView, TagListView, TestDetailView, \
     TestListView, TestPartDetailView, \
     SubmitTestView, \
     QuestionSkillAPIView, DetailHistoryView, PartListView, QuestionListView, StateCreateView, StateView, \
@@ -11,7 +11,8 @@ from EStudyApp.views import CreatePartAutoAPIView, DetailSubmitTestView, DetailT
     TestDeleteAPIView, GetPartAPIView, CreatePartAPIView, UpdatePartAPIView, ListTestView, DeletePartAPIView, \
     CreateQuestionAPIView, DetailQuestionAPIView, UpdateQuestionAPIView, DeleteQuestionAPIView, \
     StudentStatisticsAPIView, SystemStatisticsAPIView, StudentReportView, QuestionSetDeleteView, \
-    GetPartDescriptionWithBlogID, ChangeStateView, ListResultToeicForUser, ToeicQuestionAnalysisView
+    GetPartDescriptionWithBlogID, ChangeStateView, ListResultToeicForUser, ToeicQuestionAnalysisView, \
+    JobStatusView, JobResultView, ListResultToeicForUserStream
 
 from EStudyApp.controller import history_controller
 
@@ -45,6 +46,7 @@ urlpatterns = [
     path('parts/<int:id>/', GetPartAPIView.as_view(), name='part-detail'),  # GET theo ID
     path('parts/create/<int:test_id>/', CreatePartAPIView.as_view(), name='part-create'),  # POST
     path('parts/create/<int:test_id>/auto', CreatePartAutoAPIView.as_view(), name='part-create-auto'),  # POST
+    path('tests/<int:test_id>/generate/', GenerateTestAutoAPIView.as_view(), name='test-generate-auto'),  # POST đủ 7 part
     path('parts/update/<int:id>/', UpdatePartAPIView.as_view(), name='part-update'),  # PUT
     path('parts/delete/<int:id>/', DeletePartAPIView.as_view(), name='part-delete'),  # API xóa phần (DELETE)
     path('parts/<int:part_id>/questions_set/', PartListQuestionsSetAPIView.as_view(), name='part-api'),  # GET theo ID
@@ -92,7 +94,14 @@ urlpatterns = [
     path('state/change/', ChangeStateView.as_view(), name='change-state'),
     # Toeic-AI
     path('toeic/analyze/', ToeicQuestionAnalysisView.as_view(), name='question-analyst'),
+
+    # Job nền (services/jobs.py): trạng thái và kết quả
+    path('jobs/<str:job_id>/', JobStatusView.as_view(), name='job-status'),
+    path('jobs/<str:job_id>/result/', JobResultView.as_view(), name='job-result'),
+
     path('submit/list-history/<int:user_id>/', ListResultToeicForUser.as_view(), name="get-list-history"),
+    path('submit/list-history/<int:user_id>/stream/', ListResultToeicForUserStream.as_view(),
+         name="get-list-history-stream"),
 
     path('history/results/', history_controller.get_latest_results, name="latest-result"),
 ]
@@ -1,26 +1,25 @@
 from datetime import datetime, timezone, timedelta
 from django.db.models import Avg, Max, Min, Count, F
-import random
 
+from Authentication.authentication import OptionalSingleDeviceJWTAuthentication
 from Authentication.models import User
 from Authentication.permissions import IsTeacher
 
 from course.models import Blog
-from course.toeicAI import get_user_info_prompt_multi, create_toeic_question_prompt
-from EStudyApp.generateAI.audio import transcribe_audio_from_urls
-from EStudyApp.generateAI.ocr import extract_text_from_image_urls
-from question_bank.models import QuestionBank, QuestionSetBank
-from utils.standard_part import PART_STRUCTURE
+from course.toeicAI import aget_user_info_feedback, stream_user_info_feedback
 
-from django.db.models import Prefetch, Q
+from django.db.models import Q
 from rest_framework import status
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 # from collections import defaultdict
 # from EStudyApp.utils import get_cached_tests  # Import hàm cache từ utils.py
-from django.views.decorators.cache import cache_page
-from django.utils.decorators import method_decorator
+from django.utils.cache import patch_vary_headers
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.views import View
+from asgiref.sync import sync_to_async
+from djangorestframework_camel_case.util import camelize
 from django.core.cache import cache
 # from Authentication.models import User
 from EStudyApp.calculate_toeic import calculate_toeic_score
@@ -28,13 +27,21 @@ from EStudyApp.models import PartDescription, Test, Part, QuestionSet, Question,
     TestComment, \
     HistoryTraining, Tag
 from EStudyApp.serializers import HistorySerializer, HistoryTrainingSerializer, QuestionSetSerializer, \
-    TestDetailSerializer, TestSerializer, \
+    TestSerializer, \
     HistoryDetailSerializer, PartListSerializer, QuestionDetailSerializer, StateSerializer, TestCommentSerializer, \
     CreateTestSerializer, TestListSerializer, QuestionSerializer, TagSerializer, \
     StudentStatisticsSerializer, PartDescriptionSerializer, ListHistorySerializer
 from rest_framework.permissions import IsAuthenticated, AllowAny
 
 from EStudyApp.services.service_student import get_suggestions
+from EStudyApp.services.answer_key import get_answer_key
+from EStudyApp.services.grading import grade
+from EStudyApp.services.catalog_cache import get_catalog_page, apply_user_overlay
+from EStudyApp.services.paper_snapshot import get_snapshot, part_subset, etag_matches
+from EStudyApp.services.cache_versions import TEST, USER, get_generation, get_generations
+from EStudyApp.services.jobs import FAILED, SUCCEEDED, enqueue, get_job, public_job
+from EStudyApp.services.sampling_index import normalize_mix
+from Authentication.sse_stream import sse_event, sse_response
 
 CACHE_TTL = 60 * 5
 
@@ -68,24 +75,12 @@ class SubmitTestView(APIView):
             test_id = request.data["test_id"]
             user = request.user
 
-            # Lấy bài kiểm tra
-            test = Test.objects.filter(id=test_id).first()
-            if not test:
+            # Lấy đáp án đã biên dịch của đề (cache process/Redis, không truy vấn DB khi trúng cache)
+            try:
+                answer_key = get_answer_key(test_id)
+            except (Test.DoesNotExist, TypeError, ValueError):
                 return Response({"error": "Test not found"}, status=status.HTTP_404_NOT_FOUND)
 
-            # Lấy tất cả các part và skill liên quan đến test
-            parts = Part.objects.filter(
-                test=test).select_related('part_description')
-            part_skill_map = {
-                part.id: part.part_description.skill for part in parts}
-
-            # Lấy câu hỏi từ data
-            question_ids = [item.get("id") for item in data]
-            questions = (Question.objects.filter(id__in=question_ids)
-                         .only("id", "correct_answer", "part_id").in_bulk(field_name="id"))
-
-            # Khởi tạo biến đếm
-            listening_correct = reading_correct = listening_total = reading_total = 0
             # Giả sử timestamp gửi từ frontend dạng 'mm:ss'
             timestamp = request.data['timestamp']
             # VD: timestamp = "30:25"  # 30 phút 25 giây
@@ -99,25 +94,13 @@ class SubmitTestView(APIView):
             end_time = datetime.now(timezone.utc)
             start_time = end_time - timedelta(seconds=timestamp_in_seconds)
 
-            for item in data:
-                question_id = item.get("id")
-                user_answer = item.get("user_answer")
-                question = questions.get(question_id)
-                item["correct_answer"] = question.correct_answer
-
-                if question and user_answer is not None:
-                    # Lấy skill từ part_skill_map
-                    skill = part_skill_map.get(question.part_id)
-                    is_correct = user_answer.lower() == question.correct_answer.lower()
-                    print(user_answer, question.correct_answer)
-                    if skill == "LISTENING":
-                        listening_total += 1
-                        if is_correct:
-                            listening_correct += 1
-                    elif skill == "READING":
-                        reading_total += 1
-                        if is_correct:
-                            reading_correct += 1
+            # Chấm vectorized theo skill, ghi lại correct_answer vào test_result
+            grade_result = grade(answer_key, data)
+            grade_result.annotate(data)
+            listening_correct = grade_result.listening_correct
+            reading_correct = grade_result.reading_correct
+            listening_total = grade_result.listening_total
+            reading_total = grade_result.reading_total
 
             # Tính điểm TOEIC
             listening_score, reading_score, overall_score = calculate_toeic_score(
@@ -134,7 +117,7 @@ class SubmitTestView(APIView):
             # Lưu lịch sử làm bài kiểm tra
             history = History.objects.create(
                 user=user,
-                test=test,
+                test_id=answer_key.test_id,
                 score=overall_score,
                 start_time=start_time,
                 end_time=end_time,
@@ -176,7 +159,7 @@ class SubmitTestView(APIView):
             }
 
             state = State.objects.filter(
-                user=user, test=test).order_by('-id').first()
+                user=user, test_id=answer_key.test_id).order_by('-id').first()
             if state:
                 state.used = True
                 state.save()
@@ -196,12 +179,32 @@ class SubmitTestView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+def job_accepted(job):
+    """Response 202 cho thao tác đã chuyển sang job nền (services/jobs.py), client hỏi jobs/<id>/."""
+    return Response(public_job(job), status=status.HTTP_202_ACCEPTED)
+
+
+def cached_response(key, build):
+    """Trả dữ liệu đã cache theo `key`; chỉ cache response 200 do `build()` tạo ra."""
+    data = cache.get(key)
+    if data is not None:
+        return Response(data, status=status.HTTP_200_OK)
+    response = build()
+    if response.status_code == status.HTTP_200_OK:
+        cache.set(key, response.data, CACHE_TTL)
+    return response
+
+
 class DetailHistoryView(APIView):
     permission_classes = [IsAuthenticated]
 
-    @method_decorator(cache_page(CACHE_TTL, key_prefix="history_detail"))
     def get(self, request, history_id):
         user_id = request.user.id
+        # Khóa theo user và generation của user: History của user đổi thì tự hết hiệu lực
+        key = f"history_detail:{user_id}:{get_generation(USER, user_id)}:{history_id}"
+        return cached_response(key, lambda: self.build(user_id, history_id))
+
+    def build(self, user_id, history_id):
         history = History.objects.filter(id=history_id, user_id=user_id).first()
         if history is None:
             return Response({"error": "History not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -213,13 +216,21 @@ class DetailHistoryView(APIView):
 class DetailSubmitTestView(APIView):
     permission_classes = [IsAuthenticated]
 
-    @method_decorator(cache_page(CACHE_TTL, key_prefix="submit_test"))
     def get(self, request):
         user_id = request.user.id
         test_id = request.GET.get("test_id")
         if test_id is None:
             return Response({"error": "Test ID is required"}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            test_id = int(test_id)
+        except ValueError:
+            return Response({"error": "Test not found"}, status=status.HTTP_404_NOT_FOUND)
+        user_generation, test_generation = get_generations((USER, user_id), (TEST, test_id))
+        key = f"submit_test:{user_id}:{user_generation}:{test_id}:{test_generation}"
+        return cached_response(key, lambda: self.build(user_id, test_id))
+
+    def build(self, user_id, test_id):
         try:
             test = Test.objects.get(id=test_id)
         except Test.DoesNotExist:
@@ -240,44 +251,34 @@ class DetailSubmitTestView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+def snapshot_response(request, etag, snapshot=None, data=None):
+    """
+    Trả bản chụp đề kèm ETag: 304 nếu client đã có, body gzip nguyên byte nếu client
+    nhận gzip, ngược lại giải nén (hoặc render `data` khi chỉ lấy một phần đề).
+    """
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponseNotModified()
+    elif data is not None:
+        response = Response(data)
+    elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(snapshot.body, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(snapshot.decompressed(), content_type='application/json')
+    response['ETag'] = f'"{etag}"'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
 class TestDetailView(APIView):
-    @method_decorator(cache_page(60 * 5, key_prefix="test_detail"))
     def get(self, request, pk, format=None):
         try:
-            # Nạp đầy đủ các phần, bộ câu hỏi, và câu hỏi liên quan đến bài kiểm tra
-            test = Test.objects.prefetch_related(
-                Prefetch(
-                    'part_test',  # Phần trong bài kiểm tra
-                    queryset=Part.objects.order_by('part_description__part_number').prefetch_related(
-                        Prefetch(
-                            'question_set_part',  # Bộ câu hỏi trong phần
-                            queryset=QuestionSet.objects.order_by('id').prefetch_related(
-                                Prefetch(
-                                    'question_question_set',  # Câu hỏi trong bộ câu hỏi
-                                    queryset=Question.objects.order_by(
-                                        'question_number')
-                                )
-                            )
-                        ),
-                        Prefetch(
-                            'question_part',  # Các câu hỏi trong Part
-                            # Sắp xếp theo 'question_number'
-                            queryset=Question.objects.filter(test_id=pk).order_by(
-                                'question_number')
-                        )
-                    )
-                ),
-                Prefetch(
-                    'question_test',
-                    queryset=Question.objects.order_by('question_number')
-                )
-            ).get(pk=pk)
+            # Bản chụp JSON của đề, dựng sẵn cho mỗi phiên bản (services/paper_snapshot.py)
+            snapshot = get_snapshot(pk)
         except Test.DoesNotExist:
             return Response({"detail": "Test not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Sử dụng serializer để nạp dữ liệu liên kết
-        serializer = TestDetailSerializer(test)
-        return Response(serializer.data)
+        return snapshot_response(request, snapshot.etag, snapshot=snapshot)
 
 
 class FixedTestPagination(PageNumberPagination):
@@ -290,43 +291,48 @@ class FixedTestPagination(PageNumberPagination):
 
 
 class TestListView(APIView):
-    authentication_classes = []
+    authentication_classes = [OptionalSingleDeviceJWTAuthentication]
     permission_classes = [AllowAny]
     """
        API view để lấy danh sách các bài kiểm tra với phân trang cố định.
+       Trang danh sách được cache chung cho mọi người dùng, điểm gần nhất
+       của từng user được ghép vào lúc trả response (services/catalog_cache.py).
     """
 
-    @method_decorator(cache_page(CACHE_TTL, key_prefix="test_list"))
     def get(self, request, format=None):
+        tag_ids = request.GET.get('tag_ids')
+        if tag_ids:
+            try:
+                # Convert comma-separated string to list of integers
+                tag_id_list = [int(tag_id) for tag_id in tag_ids.split(',')]
+            except ValueError:
+                return Response(
+                    {"error": "Invalid tag IDs format. Please provide comma-separated integers."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            tag_id_list = None
+
+        data = get_catalog_page(request.GET, lambda: self.build_page(request, tag_id_list))
+        return Response(apply_user_overlay(data, request.user))
+
+    def build_page(self, request, tag_id_list):
         # Lấy danh sách bài kiểm tra, tránh truy vấn toàn bộ cơ sở dữ liệu
         # get type from request and default is Practice
         if request.GET.get('type') is None:
-            tests = Test.objects.all().order_by('-created_at')
+            tests = Test.objects.prefetch_related('tags').order_by('-created_at')
             serializer = TestSerializer(tests, many=True)
-            return Response(serializer.data)
+            return list(serializer.data)
 
         types = [request.GET.get('type'), 'All'] if request.GET.get(
             'type') is not None else ['Practice', 'All']
 
         skills = request.GET.get('skills')
-        # Get tag IDs from query parameters
-        tag_ids = request.GET.get('tag_ids')
         # limit = request.GET.get('limit')  # Get limit from query parameters
         name = request.GET.get('name')  # Get name parameter for filtering
 
         # Base query with prefetch_related
-        tests = Test.objects.prefetch_related(
-            Prefetch(
-                'part_test',
-                queryset=Part.objects.select_related('part_description').all()
-            ),
-            Prefetch(
-                'history_test',
-                queryset=History.objects.order_by('-end_time'),
-                to_attr='user_histories'
-            ),
-            'tags'  # Add tags to prefetch_related
-        ).filter(publish=True, types__in=types)
+        tests = Test.objects.prefetch_related('tags').filter(publish=True, types__in=types)
 
         # Add name filter if provided (case-insensitive)
         if name:
@@ -335,17 +341,9 @@ class TestListView(APIView):
             tests = tests.filter(name__icontains=name)
 
         # Filter by tag IDs if specified
-        if tag_ids:
-            try:
-                # Convert comma-separated string to list of integers
-                tag_id_list = [int(tag_id) for tag_id in tag_ids.split(',')]
-                # Filter tests that have any of the specified tags
-                tests = tests.filter(tags__id__in=tag_id_list).distinct()
-            except ValueError:
-                return Response(
-                    {"error": "Invalid tag IDs format. Please provide comma-separated integers."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        if tag_id_list:
+            # Filter tests that have any of the specified tags
+            tests = tests.filter(tags__id__in=tag_id_list).distinct()
 
         # # Filter by skills if specified
         if skills:
@@ -376,10 +374,9 @@ class TestListView(APIView):
         paginator = FixedTestPagination()
         paginated_tests = paginator.paginate_queryset(tests, request)
         serializer = TestSerializer(paginated_tests, many=True)
-        data = serializer.data
 
-        # Calculate total pages
-        total_items = tests.count()
+        # Calculate total pages (dùng lại COUNT của paginator)
+        total_items = paginator.page.paginator.count
         page_size = paginator.page_size
         total_pages = (total_items + page_size - 1) // page_size
 
@@ -387,21 +384,9 @@ class TestListView(APIView):
         current_page = paginator.page.number if hasattr(
             paginator, 'page') else 1
 
-        for item in data:
-            related_parts = Part.objects.filter(
-                test=item['id']
-            )
-            filter_parts = [
-                part.id for part in related_parts
-            ]
-            question_total = Question.objects.filter(
-                part__in=filter_parts
-            ).count()
-            item['question_total'] = 200 if question_total > 200 else question_total
-
         # Create response data
         response_data = {
-            'results': serializer.data,
+            'results': list(serializer.data),
             'pagination': {
                 'total_items': total_items,
                 'total_pages': total_pages,
@@ -412,49 +397,19 @@ class TestListView(APIView):
             }
         }
 
-        return Response(response_data)
-
+        return response_data
 
 class TestPartDetailView(APIView):
-    @method_decorator(cache_page(CACHE_TTL, key_prefix="test_part_detail"))
     def get(self, request, test_id, format=None):
         parts = [int(part) for part in request.GET.get('parts').split(',')]
         try:
-            # Tìm kiếm bài kiểm tra dựa trên `test_id`, đồng thời sắp xếp các phần liên quan
-            test = Test.objects.prefetch_related(
-                Prefetch(
-                    'part_test',
-                    queryset=Part.objects.filter(id__in=parts).order_by(
-                        'part_description__part_number').prefetch_related(
-                        Prefetch(
-                            'question_set_part',  # Sắp xếp bộ câu hỏi trong phần
-                            queryset=QuestionSet.objects.order_by('id').prefetch_related(
-                                Prefetch(
-                                    'question_question_set',  # Sắp xếp câu hỏi trong bộ câu hỏi
-                                    queryset=Question.objects.filter(
-                                        part_id__in=parts).order_by('question_number')
-                                )
-                            )
-                        ),
-                        Prefetch(
-                            'question_part',  # Các câu hỏi trong Part
-                            queryset=Question.objects.filter(
-                                part_id__in=parts).order_by('question_number')
-                        )
-                        # Sắp xếp các phần theo `id`
-                    ).order_by('part_description__part_number')
-                ),
-                Prefetch(
-                    'question_test',
-                    queryset=Question.objects.filter(
-                        part_id__in=parts).order_by('question_number')
-                )
-            ).get(pk=test_id)
+            snapshot = get_snapshot(test_id)
         except Test.DoesNotExist:
             return Response({"detail": "Test not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = TestDetailSerializer(test)
-        return Response(serializer.data)
+        # Cắt các part được chọn từ bản chụp đầy đủ, không truy vấn DB
+        etag, data = part_subset(snapshot, parts)
+        return snapshot_response(request, etag, data=data)
 
 
 # class CourseListView(APIView):
@@ -767,89 +722,37 @@ class SubmitTrainingView(APIView):
             start_time = datetime.now(timezone.utc)
             end_time = start_time + timedelta(seconds=timestamp_in_seconds)
 
-            # Kiểm tra Test
-            test = Test.objects.filter(id=test_id).first()
-            if not test:
+            # Lấy đáp án đã biên dịch của đề
+            try:
+                answer_key = get_answer_key(test_id)
+            except (Test.DoesNotExist, TypeError, ValueError):
                 return Response({"error": "Test not found"}, status=status.HTTP_404_NOT_FOUND)
 
-            # Lấy tất cả `part_id` và `question_id` từ data
+            # Kiểm tra part và câu hỏi gửi lên có thuộc đề không
             part_ids = {item.get("part_id") for item in data}
             question_ids = {item.get("id") for item in data}
-
-            # Truy vấn tất cả Part trong một lần
-            parts = Part.objects.filter(
-                id__in=part_ids).in_bulk(field_name="id")
-            missing_parts = part_ids - set(parts.keys())
+            key_part_ids = {entry.part_id for entry in answer_key.entries.values()}
+            missing_parts = part_ids - key_part_ids
             if missing_parts:
                 return Response({"error": f"Parts not found: {', '.join(map(str, missing_parts))}"},
                                 status=status.HTTP_404_NOT_FOUND)
-
-            # Truy vấn tất cả các Question liên quan
-            questions = (
-                Question.objects.filter(
-                    id__in=question_ids, part_id__in=part_ids)
-                .only("id", "correct_answer", "part_id")
-                .in_bulk(field_name="id")
-            )
-            missing_questions = question_ids - set(questions.keys())
+            missing_questions = {
+                question_id for question_id in question_ids
+                if getattr(answer_key.get(question_id), "part_id", None) not in part_ids
+            }
             if missing_questions:
                 return Response({"error": f"Questions not found: {', '.join(map(str, missing_questions))}"},
                                 status=status.HTTP_404_NOT_FOUND)
 
-            # Xử lý câu hỏi và tính toán kết quả
-            total_correct_answers = 0
-            total_wrong_answers = 0
-            total_unanswer_questions = 0
-            part_results = []
-
-            # Danh sách part đã xử lý
-            processed_parts = []
-
-            for part_id in part_ids:
-                part = parts.get(part_id)
-                if not part:
-                    continue
-
-                correct_answers = 0
-                wrong_answers = 0
-                unanswer_questions = 0
-
-                for item in filter(lambda x: x.get("part_id") == part_id, data):
-                    question_id = item.get("id")
-                    user_answer = item.get("user_answer")
-                    question = questions.get(question_id)
-                    item["correct_answer"] = question.correct_answer
-
-                    if not question:
-                        continue  # Bỏ qua nếu câu hỏi không hợp lệ
-
-                    if user_answer is None:
-                        unanswer_questions += 1
-                    elif user_answer.lower() == question.correct_answer.lower():
-                        correct_answers += 1
-                    else:
-                        wrong_answers += 1
-
-                # Tính toán điểm phần
-                total_questions = correct_answers + wrong_answers
-                percentage_score = (
-                    correct_answers / total_questions) * 100 if total_questions > 0 else 0
-
-                # Cập nhật kết quả tổng hợp
-                total_correct_answers += correct_answers
-                total_wrong_answers += wrong_answers
-                total_unanswer_questions += unanswer_questions
-
-                # Lưu thông tin part đã xử lý
-                processed_parts.append(part.id)
-
-                part_results.append({
-                    "part_id": part.id,
-                    "correct_answers": correct_answers,
-                    "wrong_answers": wrong_answers,
-                    "unanswer_questions": unanswer_questions,
-                    "percentage_score": percentage_score,
-                })
+            # Chấm vectorized theo part trong một lượt
+            grade_result = grade(answer_key, data)
+            grade_result.annotate(data)
+            part_results = grade_result.part_results()
+            processed_parts = [result["part_id"] for result in part_results]
+
+            total_correct_answers = sum(result["correct_answers"] for result in part_results)
+            total_wrong_answers = sum(result["wrong_answers"] for result in part_results)
+            total_unanswer_questions = sum(result["unanswer_questions"] for result in part_results)
 
             # Tính toán tổng kết điểm
             total_questions = total_correct_answers + total_wrong_answers
@@ -864,7 +767,7 @@ class SubmitTrainingView(APIView):
             # Lưu kết quả tổng vào `HistoryTraining`
             history = HistoryTraining.objects.create(
                 user=user,
-                test=test,
+                test_id=answer_key.test_id,
                 start_time=start_time,
                 end_time=end_time,
                 correct_answers=total_correct_answers,
@@ -1196,7 +1099,7 @@ class PartListQuestionsSetAPIView(APIView):
                         'correct_answer', '').upper(),
                     question_number=new_question_data.get('question_number'),
                     difficulty_level=new_question_data.get('difficulty_level'),
-                    test=test
+                    test=test or part.test  # Test.question_total đếm theo Question.test
                 )
 
             # Refresh and serialize the updated question set
@@ -1301,6 +1204,7 @@ class EditQuestionsAPIView(APIView):
                 Question.objects.create(
                     question_set=question_set,
                     part=part,
+                    test=part.test,  # Test.question_total đếm theo Question.test
                     question_text=new_question_data.get('question_text'),
                     # Uppercase the answers for new questions
                     answers=self._process_answers(
@@ -1369,181 +1273,6 @@ class CreatePartAPIView(APIView):
 class CreatePartAutoAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def _create_part(self, part_number, test, part_description, part):
-        try:
-            # Save the part instance first to get a primary key
-            part.save()
-
-            # create part 1
-            if part_number in ['1', '2', '5', '6', '3', '4']:
-                id_array_existing = []
-                start_question_set = 0
-                length_array_existing = 0
-                if part_number == '1':
-                    length_array_existing = 6
-                    start_question_set = 0
-                elif part_number == '2':
-                    length_array_existing = 25
-                    start_question_set = 6
-                elif part_number == '3':
-                    length_array_existing = 13
-                elif part_number == '4':
-                    length_array_existing = 10
-                    start_question_set = 70
-                elif part_number == '5':
-                    length_array_existing = 30
-                    start_question_set = 100
-                elif part_number == '6':
-                    # 16 questions 4 sets
-                    length_array_existing = 4
-                    start_question_set = 130
-
-                while len(id_array_existing) < length_array_existing:
-                    random_question_set = QuestionSetBank.objects.filter(
-                        part_description_id=int(part_number)
-                    ).exclude(
-                        id__in=id_array_existing
-                    ).order_by('?').first()
-                    if random_question_set:
-                        id_array_existing.append(random_question_set.id)
-                    else:
-                        break
-
-                for index, question_set_id in enumerate(id_array_existing):
-                    if part_number == '1' or part_number == '2' or part_number == '5':
-                        question_set = QuestionSetBank.objects.get(
-                            id=question_set_id)
-                        # Create new question set
-                        new_question_set = QuestionSet.objects.create(
-                            part=part,
-                            from_ques=start_question_set + index + 1,
-                            to_ques=start_question_set + index + 1,
-                            audio=question_set.audio,
-                            page=question_set.page,
-                            image=question_set.image,
-                            test=test,
-                        )
-                        # Duplicate questions
-                        existing_questions = QuestionBank.objects.filter(
-                            question_set=question_set)
-                        for q_index, question in enumerate(existing_questions):
-                            Question.objects.create(
-                                question_set=new_question_set,
-                                part=part,
-                                test=test,
-                                question_text=question.question_text,
-                                answers=question.answers,
-                                correct_answer=question.correct_answer,
-                                question_number=start_question_set + index + q_index + 1,
-                                difficulty_level=question.difficulty_level,
-                            )
-                    elif part_number == '6':
-                        question_set = QuestionSetBank.objects.get(
-                            id=question_set_id)
-                        # Create new question set
-                        new_question_set = QuestionSet.objects.create(
-                            part=part,
-                            from_ques=start_question_set + (index * 4) + 1,
-                            to_ques=start_question_set + (index * 4) + 4,
-                            audio=question_set.audio,
-                            page=question_set.page,
-                            image=question_set.image,
-                            test=test,
-                        )
-                        # Duplicate questions
-                        existing_questions = QuestionBank.objects.filter(
-                            question_set=question_set)
-                        for q_index, question in enumerate(existing_questions):
-                            Question.objects.create(
-                                question_set=new_question_set,
-                                part=part,
-                                test=test,
-                                question_text=question.question_text,
-                                answers=question.answers,
-                                correct_answer=question.correct_answer,
-                                question_number=start_question_set +
-                                (index * 4) + q_index + 1,
-                                difficulty_level=question.difficulty_level,
-                            )
-                    elif part_number == '3' or part_number == '4':
-                        # 13 questions 3 sets
-                        question_set = QuestionSetBank.objects.get(
-                            id=question_set_id)
-                        # Create new question set
-                        new_question_set = QuestionSet.objects.create(
-                            part=part,
-                            from_ques=start_question_set + (index * 3) + 1,
-                            to_ques=start_question_set + (index * 3) + 3,
-                            audio=question_set.audio,
-                            page=question_set.page,
-                            image=question_set.image,
-                            test=test,
-                        )
-                        # Duplicate questions
-                        existing_questions = QuestionBank.objects.filter(
-                            question_set=question_set)
-                        for q_index, question in enumerate(existing_questions):
-                            Question.objects.create(
-                                question_set=new_question_set,
-                                part=part,
-                                test=test,
-                                question_text=question.question_text,
-                                answers=question.answers,
-                                correct_answer=question.correct_answer,
-                                question_number=start_question_set +
-                                (index * 3) + q_index + 1,
-                                difficulty_level=question.difficulty_level,
-                            )
-                    elif part_number == '7':
-                        # 10 questions 2 sets
-
-                        pass
-                return part
-
-            part_structures = PART_STRUCTURE[f'PART_{part_number}']
-            for from_ques, to_ques in part_structures['sets']:
-                existing_question_sets = QuestionSetBank.objects.filter(
-                    from_ques=from_ques,
-                    to_ques=to_ques,
-                )  # Prefetch related questions
-
-                # random divide existing_question_sets
-                random_question_set = random.choice(existing_question_sets)
-
-                # Create new question set
-                new_question_set = QuestionSet.objects.create(
-                    part=part,
-                    from_ques=from_ques,
-                    to_ques=to_ques,
-                    audio=random_question_set.audio,
-                    page=random_question_set.page,
-                    image=random_question_set.image,
-                    test=test,
-                )
-
-                # Duplicate questions
-                existing_questions = QuestionBank.objects.filter(
-                    question_set=random_question_set)
-                for question in existing_questions:
-                    Question.objects.create(
-                        question_set=new_question_set,
-                        part=part,
-                        test=test,
-                        question_text=question.question_text,
-                        answers=question.answers,
-                        correct_answer=question.correct_answer,
-                        question_number=question.question_number,
-                        difficulty_level=question.difficulty_level,
-                    )
-
-            return part
-
-        except Exception as e:
-            # If anything fails, delete the part and raise the error
-            if part.id:
-                part.delete()
-            raise e
-
     def post(self, request, test_id, *args, **kwargs):
         try:
             part_number = request.data['part']
@@ -1555,26 +1284,53 @@ class CreatePartAutoAPIView(APIView):
             if part:
                 return Response({"error": "Part already exists"}, status=status.HTTP_400_BAD_REQUEST)
 
-            test = Test.objects.get(id=test_id)
-
-            if not test:
+            if not Test.objects.filter(id=test_id).exists():
                 return Response({"error": "Test not found"}, status=status.HTTP_404_NOT_FOUND)
 
-            if not part_description:
-                return Response({"error": "Part description not found"}, status=status.HTTP_404_NOT_FOUND)
+            # Chép hàng trăm dòng -> chạy nền (services/jobs.py), kết quả ở jobs/<id>/result/
+            difficulty_mix = request.data.get('difficulty_mix')
+            normalize_mix(difficulty_mix)
+            job = enqueue("assemble_part", {
+                "test_id": test_id,
+                "part_number": int(part_number),
+                "part_description_id": part_description.id,
+                "difficulty_mix": difficulty_mix,
+            }, user_id=request.user.id)
+            return job_accepted(job)
+
+        except PartDescription.DoesNotExist:
+            return Response({"error": "Part description not found"}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            new_part = Part(
-                part_description=part_description,
-                test=test,
-            )
 
-            created_part = self._create_part(
-                part_number, test, part_description, new_part)
-            serializer = PartListSerializer(created_part)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+class GenerateTestAutoAPIView(APIView):
+    permission_classes = [IsAuthenticated]
 
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    def post(self, request, test_id, *args, **kwargs):
+        """
+        Tạo đủ 7 part của đề từ ngân hàng câu hỏi trong một request (thay cho 7 lần gọi
+        parts/create/<test_id>/auto). Chạy nền: kết quả ở jobs/<id>/result/ gồm thời gian
+        lên kế hoạch của từng part.
+        Tùy chọn `difficulty_mix`: tỉ lệ mức độ khó mong muốn, ví dụ {"BASIC": 0.3, "MEDIUM": 0.7}.
+        """
+        if not Test.objects.filter(id=test_id).exists():
+            return Response({"error": "Test not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if Part.objects.filter(test_id=test_id).exists():
+            return Response({"error": "Test already has parts"}, status=status.HTTP_400_BAD_REQUEST)
+
+        difficulty_mix = request.data.get('difficulty_mix')
+        try:
+            normalize_mix(difficulty_mix)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = enqueue("generate_test", {"test_id": test_id, "difficulty_mix": difficulty_mix},
+                      user_id=request.user.id)
+        return job_accepted(job)
 
 
 class UpdatePartAPIView(APIView):
@@ -1871,43 +1627,88 @@ class ChangeStateView(APIView):
         return Response({"message": "State updated successfully"}, status=status.HTTP_200_OK)
 
 
-class ListResultToeicForUser(APIView):
+def latest_histories_with_results(user_id):
+    """3 bài thi hoàn thành gần nhất của user và dữ liệu đã serialize (key camelCase như API)."""
+    histories = list(
+        History.objects.filter(user_id=user_id, complete=True)
+        .select_related('test')
+        .order_by('-id')[:3]
+    )
+    return histories, camelize(ListHistorySerializer(histories, many=True).data)
+
+
+async def ai_caller_id(request, user_id):
+    """Người bị tính vào giới hạn gọi AI: người đăng nhập, nếu không có thì user trên URL."""
+    user = await request.auser()
+    return user.id if user.is_authenticated else user_id
+
+
+class ListResultToeicForUser(View):
+    """
+    View async: trong lúc chờ AI nhận xét (course/services/ai_client.py) không giữ thread nào
+    của server, nên các lời gọi mô hình chậm không làm cạn pool xử lý request.
+    """
     # Chỉ cho phép người dùng đã xác thực
     # permission_classes = [IsAuthenticated]
 
-    def get(self, request, user_id):
+    async def get(self, request, user_id):
         # Nếu bạn muốn thêm bảo mật, chỉ cho phép teacher xem người khác, còn người khác chỉ được xem chính mình:
         # if request.user.role != 'teacher' and request.user.id != user_id:
-        #     return Response(
+        #     return JsonResponse(
         #         {"error": "Bạn không có quyền xem lịch sử của người dùng khác."},
         #         status=status.HTTP_403_FORBIDDEN
         #     )
 
-        histories = (
-            History.objects.filter(user_id=user_id, complete=True)
-            .select_related('test')
-            .order_by('-id')[:3]
-        )
+        histories, results = await sync_to_async(latest_histories_with_results)(user_id)
 
-        if not histories.exists():
-            return Response(
+        if not histories:
+            return JsonResponse(
                 {"error": "Không tìm thấy lịch sử cho người dùng này."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = ListHistorySerializer(histories, many=True)
-
         try:
-            ai_feedback = get_user_info_prompt_multi(user_id, histories)
+            ai_feedback = await aget_user_info_feedback(histories, user_id=await ai_caller_id(request, user_id))
         except Exception as e:
             ai_feedback = f"Lỗi khi tạo phản hồi từ AI: {str(e)}"
 
-        return Response({
-            "results": serializer.data,
-            "ai_feedback": ai_feedback
+        return JsonResponse({
+            "results": results,
+            "aiFeedback": ai_feedback
         }, status=status.HTTP_200_OK)
 
 
+class ListResultToeicForUserStream(View):
+    """
+    Như ListResultToeicForUser nhưng trả về Server-Sent Events: kết quả thi gửi ngay ("results"),
+    nhận xét AI gửi dần từng đoạn khi mô hình sinh ra ("token"), kết thúc bằng "done".
+    Client ngắt kết nối thì luồng sinh của mô hình cũng dừng (Authentication/sse_stream.py).
+    """
+
+    async def get(self, request, user_id):
+        histories, results = await sync_to_async(latest_histories_with_results)(user_id)
+
+        if not histories:
+            return JsonResponse(
+                {"error": "Không tìm thấy lịch sử cho người dùng này."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        caller_id = await ai_caller_id(request, user_id)
+
+        def events():
+            yield sse_event("results", results)
+            try:
+                for text in stream_user_info_feedback(histories, user_id=caller_id):
+                    yield sse_event("token", {"text": text})
+            except Exception as e:
+                yield sse_event("error", {"error": f"Lỗi khi tạo phản hồi từ AI: {str(e)}"})
+                return
+            yield sse_event("done", {})
+
+        return sse_response(events)
+
+
 class ToeicQuestionAnalysisView(APIView):
     # Chỉ cho phép người dùng đã xác thực (Teacher)
     permission_classes = [IsAuthenticated, IsTeacher]
@@ -1924,13 +1725,55 @@ class ToeicQuestionAnalysisView(APIView):
                     {"error": "answers not found"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            audio_text = transcribe_audio_from_urls(audio)
-
-            image_text = extract_text_from_image_urls(image)
-
-            result = create_toeic_question_prompt(
-                question_text, answers, [audio_text], image_text, page)
-            return Response({"result": result}, status=status.HTTP_200_OK)
+            # Tải audio, ffmpeg, OCR và gọi LLM mất nhiều phút -> chạy nền, kết quả ở jobs/<id>/result/
+            job = enqueue("toeic_analysis", {
+                "question_text": question_text,
+                "answers": answers,
+                "audio": audio,
+                "image": image,
+                "page": page,
+            }, user_id=request.user.id)
+            return job_accepted(job)
 
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def get_visible_job(request, job_id):
+    """Job nền nếu người gọi được xem: chủ job, hoặc staff với job không có chủ."""
+    job = get_job(job_id)
+    if job is None:
+        return None
+    if job["user_id"] is None:
+        return job if request.user.is_staff else None
+    return job if job["user_id"] == request.user.id else None
+
+
+class JobStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        """Trạng thái và tiến độ của job nền; chỉ chủ job (job không có chủ: staff) xem được."""
+        job = get_visible_job(request, job_id)
+        if job is None:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(public_job(job), status=status.HTTP_200_OK)
+
+
+class JobResultView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        """
+        Kết quả của job: 200 kèm kết quả khi xong, 202 kèm trạng thái khi chưa xong,
+        400 (lỗi dữ liệu) hoặc 500 khi job thất bại.
+        """
+        job = get_visible_job(request, job_id)
+        if job is None:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        if job["status"] == SUCCEEDED:
+            return Response(job["result"], status=status.HTTP_200_OK)
+        if job["status"] == FAILED:
+            return Response({"error": job["error"]},
+                            status=status.HTTP_400_BAD_REQUEST if job["fatal"] else status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(public_job(job), status=status.HTTP_202_ACCEPTED)
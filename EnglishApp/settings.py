@@ -159,6 +159,14 @@ CACHES = {
     }
 }
 
+# Backend sinh văn bản cho course/services/ai_client.py (FakeBackend để chạy offline)
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "course.services.ai_client.GeminiBackend")
+# Số lời gọi AI đồng thời tối đa mỗi process, và giới hạn (số lời gọi, giây) cho mỗi người dùng
+AI_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", 8))
+AI_USER_RATE_LIMIT = (int(os.environ.get("AI_USER_RATE_LIMIT", 20)), 60)
+# Lớp tóm tắt hội thoại chat bot (chat_bot.utils.summarizer.LocalSummarizer để chạy offline)
+CHAT_SUMMARIZER = os.environ.get("CHAT_SUMMARIZER", "chat_bot.utils.summarizer.LLMSummarizer")
+
 
 # Nếu bạn sử dụng credentials (ví dụ như cookies)
 CORS_ALLOW_CREDENTIALS = True
@@ -220,6 +228,9 @@ CHANNEL_LAYERS = {
     },
 }
 
+# SSE: mỗi worker giữ một subscription Redis pub/sub (Authentication/sse_manager.py, LocalBroker khi chạy một process)
+SSE_BROKER = os.environ.get("SSE_BROKER", "Authentication.sse_manager.RedisBroker")
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
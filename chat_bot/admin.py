@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Message
+from .models import ConversationSummary, Message
 
 
 @admin.register(Message)
@@ -13,3 +13,10 @@ class MessageAdmin(admin.ModelAdmin):
         """Show preview of message content"""
         return obj.content[:50] + "..." if len(obj.content) > 50 else obj.content
     content_preview.short_description = 'Content Preview'
+
+
+@admin.register(ConversationSummary)
+class ConversationSummaryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'last_message_id', 'updated_at']
+    search_fields = ['user__username', 'user__email']
+    readonly_fields = ['updated_at']
@@ -1,8 +1,19 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from djangorestframework_camel_case.util import camelize
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from Authentication.sse_stream import sse_event, sse_response
+from Authentication.sse_views import authenticate_sse_request
 from ..services.message_service import MessageService
+from ..utils.pagination import parse_limit
 from ..serializers import (
     MessageSerializer,
     MessageCreateSerializer,
@@ -15,26 +26,45 @@ from ..serializers import (
 message_service = MessageService()
 
 
+def _page_params(request):
+    """(cursor, limit) from the query string; ValueError on an invalid limit"""
+    return request.GET.get("cursor") or None, parse_limit(request.GET.get("limit"))
+
+
+def _page_response(result):
+    serializer = MessageSerializer(result["messages"], many=True)
+    return Response(
+        {
+            "success": True,
+            "data": serializer.data,
+            "count": len(result["messages"]),
+            "next_cursor": result["next_cursor"],
+            "has_more": result["next_cursor"] is not None,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
 @api_view(["GET", "POST"])
 @permission_classes([IsAuthenticated])
 def user_messages(request):
-    """GET /messages/ - Get user's messages, POST /messages/ - Create new message for authenticated user"""
+    """GET /messages/ - Get user's messages (keyset pages: ?limit=&cursor=), POST /messages/ - Create new message for authenticated user"""
     user_id = request.user.id
 
     if request.method == "GET":
         try:
-            result = message_service.get_user_messages(user_id)
-
-            if result["success"]:
-                serializer = MessageSerializer(result["messages"], many=True)
+            try:
+                cursor, limit = _page_params(request)
+            except ValueError:
                 return Response(
-                    {
-                        "success": True,
-                        "data": serializer.data,
-                        "count": len(result["messages"]),
-                    },
-                    status=status.HTTP_200_OK,
+                    {"success": False, "error": "Invalid limit parameter"},
+                    status=status.HTTP_400_BAD_REQUEST,
                 )
+
+            result = message_service.get_user_messages(user_id, cursor, limit)
+
+            if result["success"]:
+                return _page_response(result)
             else:
                 return Response(
                     {"success": False, "errors": result["errors"]},
@@ -181,33 +211,22 @@ def message_detail(request, message_id):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def conversation_history(request):
-    """GET /messages/history/ - Get conversation history for authenticated user"""
+    """GET /messages/history/ - Get the latest messages for authenticated user; `cursor` loads older ones"""
     user_id = request.user.id
 
     try:
-        # Get optional limit parameter
-        limit = request.GET.get("limit")
-        if limit:
-            try:
-                limit = int(limit)
-            except ValueError:
-                return Response(
-                    {"success": False, "error": "Invalid limit parameter"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+        try:
+            cursor, limit = _page_params(request)
+        except ValueError:
+            return Response(
+                {"success": False, "error": "Invalid limit parameter"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        result = message_service.get_conversation_history(user_id, limit)
+        result = message_service.get_conversation_history(user_id, limit, cursor)
 
         if result["success"]:
-            serializer = MessageSerializer(result["messages"], many=True)
-            return Response(
-                {
-                    "success": True,
-                    "data": serializer.data,
-                    "count": len(result["messages"]),
-                },
-                status=status.HTTP_200_OK,
-            )
+            return _page_response(result)
         else:
             return Response(
                 {"success": False, "errors": result["errors"]},
@@ -265,18 +284,18 @@ def messages_by_role(request):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        result = message_service.get_messages_by_role(user_id, role)
-
-        if result["success"]:
-            serializer = MessageSerializer(result["messages"], many=True)
+        try:
+            cursor, limit = _page_params(request)
+        except ValueError:
             return Response(
-                {
-                    "success": True,
-                    "data": serializer.data,
-                    "count": len(result["messages"]),
-                },
-                status=status.HTTP_200_OK,
+                {"success": False, "error": "Invalid limit parameter"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
+
+        result = message_service.get_messages_by_role(user_id, role, cursor, limit)
+
+        if result["success"]:
+            return _page_response(result)
         else:
             return Response(
                 {"success": False, "errors": result["errors"]},
@@ -314,3 +333,80 @@ def message_count(request):
             {"success": False, "error": str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+async def stream_message(request):
+    """
+    GET/POST /messages/stream/ - Create a conversation and stream the bot reply as Server-Sent Events.
+
+    Plain async Django view (like Authentication.sse_views) so DRF content negotiation does not
+    reject `Accept: text/event-stream`, and the request does not hold a server worker thread
+    while the reply streams. Content comes from the JSON body (POST) or `?content=` (GET,
+    for EventSource clients, which authenticate with `?token=`).
+    Events: "token" {"text"} per chunk, then "done" {"userMessage", "botMessage"} or "error" {"errors"}.
+    """
+    user = await sync_to_async(authenticate_sse_request)(request)
+    if not user:
+        return JsonResponse(
+            {"success": False, "error": "Authentication required"},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse(
+                {"success": False, "errors": ["Invalid JSON body"]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+    else:
+        data = request.GET
+
+    serializer = ConversationCreateSerializer(data={"content": data.get("content")})
+    if not serializer.is_valid():
+        return JsonResponse(
+            {"success": False, "errors": serializer.errors},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    content = serializer.validated_data["content"]
+
+    def events():
+        for item in message_service.stream_conversation(user, content):
+            if item["type"] == "token":
+                yield sse_event("token", {"text": item["text"]})
+            elif item["type"] == "done":
+                yield sse_event("done", camelize({
+                    "user_message": MessageSerializer(item["user_message"]).data,
+                    "bot_message": MessageSerializer(item["bot_message"]).data,
+                }))
+            else:
+                yield sse_event("error", {"errors": item["errors"]})
+
+    return sse_response(events)
+
+
+@require_http_methods(["GET"])
+async def export_messages(request):
+    """
+    GET /messages/export/ - Stream the authenticated user's whole history as NDJSON
+    (one message per line, oldest first). Rows are read in keyset batches, so memory use
+    does not grow with the size of the history.
+    """
+    user = await sync_to_async(authenticate_sse_request)(request)
+    if not user:
+        return JsonResponse(
+            {"success": False, "error": "Authentication required"},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    async def lines():
+        async for row in message_service.export_messages(user.id):
+            yield json.dumps(camelize(row), cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+    response = StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+    response["Content-Disposition"] = 'attachment; filename="chat-history.ndjson"'
+    response["X-Accel-Buffering"] = "no"
+    return response
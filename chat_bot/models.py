@@ -19,6 +19,30 @@ class Message(models.Model):
     class Meta:
         db_table = "chat_messages"
         ordering = ["created_at"]
+        indexes = [
+            # Keyset pagination of a user's history (utils/pagination.py)
+            models.Index(
+                fields=["user", "created_at", "id"], name="chat_msg_user_created_id"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.role}: {self.content[:50]}..."
+
+
+class ConversationSummary(models.Model):
+    """Rolling summary of a user's older messages (see services/context_service.py)"""
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, related_name="chat_summary"
+    )
+    content = models.TextField(blank=True, default="")
+    # Id of the newest message already folded into the summary
+    last_message_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "chat_summaries"
+
+    def __str__(self):
+        return f"Summary for user {self.user_id} (up to message {self.last_message_id})"
@@ -1,5 +1,6 @@
-from typing import List, Optional
-from django.db.models import QuerySet
+from datetime import datetime
+from typing import List, Optional, Tuple
+from django.db.models import Q, QuerySet
 from ..models import Message
 from Authentication.models import User
 from .base_repository import BaseRepository
@@ -11,30 +12,70 @@ class MessageRepository(BaseRepository):
     def __init__(self):
         super().__init__(Message)
 
-    def get_by_user_id(self, user_id: int) -> List[Message]:
-        """Get all messages for a specific user by user ID"""
-        return list(self.model.objects.filter(user_id=user_id).order_by("created_at"))
-
-    def get_user_messages_by_role(self, user_id: int, role: str) -> List[Message]:
-        """Get messages for a user filtered by role"""
+    def get_page(
+        self,
+        user_id: int,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        newest_first: bool = False,
+        role: Optional[str] = None,
+    ) -> List[Message]:
+        """
+        Keyset page of a user's messages ordered by (created_at, id), starting after the
+        (created_at, id) position `after`. Fetches limit + 1 rows so callers can tell if more remain.
+        """
+        queryset = self.model.objects.filter(user_id=user_id).select_related("user")
+        if role:
+            queryset = queryset.filter(role=role)
+        if after:
+            created_at, message_id = after
+            if newest_first:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+                )
+        ordering = ("-created_at", "-id") if newest_first else ("created_at", "id")
+        return list(queryset.order_by(*ordering)[: limit + 1])
+
+    async def aiter_export_rows(self, user_id: int, batch_size: int = 500):
+        """All of a user's messages as dicts, oldest first, read in keyset batches (constant memory)"""
+        queryset = self.model.objects.filter(user_id=user_id).order_by("created_at", "id")
+        fields = ("id", "role", "content", "created_at")
+        after = None
+        while True:
+            batch = queryset
+            if after:
+                batch = batch.filter(
+                    Q(created_at__gt=after[0]) | Q(created_at=after[0], id__gt=after[1])
+                )
+            rows = [row async for row in batch.values(*fields)[:batch_size]]
+            for row in rows:
+                yield row
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1]["created_at"], rows[-1]["id"])
+
+    def get_messages_after(
+        self, user_id: int, after_id: int, limit: int, newest_first: bool = True
+    ) -> List[Message]:
+        """Get up to `limit` of a user's messages with id > after_id"""
         return list(
-            self.model.objects.filter(user_id=user_id, role=role).order_by("created_at")
+            self.model.objects.filter(user_id=user_id, id__gt=after_id).order_by(
+                "-id" if newest_first else "id"
+            )[:limit]
         )
 
-    def get_recent_messages(self, user_id: int, limit: int = 10) -> List[Message]:
-        """Get recent messages for a user"""
-        return list(
-            self.model.objects.filter(user_id=user_id).order_by("-created_at")[:limit]
-        )
+    def count_messages_after(self, user_id: int, after_id: int) -> int:
+        """Count a user's messages with id > after_id"""
+        return self.model.objects.filter(user_id=user_id, id__gt=after_id).count()
 
     def create_message(self, user_id: int, role: str, content: str) -> Message:
         """Create a new message"""
         return self.model.objects.create(user_id=user_id, role=role, content=content)
 
-    def get_conversation_history(self, user_id: int) -> List[Message]:
-        """Get complete conversation history for a user"""
-        return list(self.model.objects.filter(user_id=user_id).order_by("created_at"))
-
     def delete_user_messages(self, user_id: int) -> int:
         """Delete all messages for a user"""
         count, _ = self.model.objects.filter(user_id=user_id).delete()
@@ -0,0 +1,33 @@
+from typing import Optional
+from django.utils import timezone
+from ..models import ConversationSummary
+from .base_repository import BaseRepository
+
+
+class SummaryRepository(BaseRepository):
+    """Repository for ConversationSummary model database operations"""
+
+    def __init__(self):
+        super().__init__(ConversationSummary)
+
+    def get_for_user(self, user_id: int) -> Optional[ConversationSummary]:
+        """Get the user's summary, or None if nothing has been summarized yet"""
+        return self.model.objects.filter(user_id=user_id).first()
+
+    def save_if_unchanged(
+        self, user_id: int, previous_last_message_id: int, content: str, last_message_id: int
+    ) -> bool:
+        """
+        Store a new summary unless another update already moved past `previous_last_message_id`
+        Returns: True if the summary was written
+        """
+        self.model.objects.get_or_create(user_id=user_id)
+        updated = self.model.objects.filter(
+            user_id=user_id, last_message_id=previous_last_message_id
+        ).update(content=content, last_message_id=last_message_id, updated_at=timezone.now())
+        return updated == 1
+
+    def delete_for_user(self, user_id: int) -> int:
+        """Delete the user's summary"""
+        count, _ = self.model.objects.filter(user_id=user_id).delete()
+        return count
@@ -1,15 +1,25 @@
 # from django.urls import reverse
 # from django.conf import settings
 import random
-from typing import List, Dict, Optional
-from chat_bot.utils.ai_client import call_ai
+from typing import List, Dict, Iterator, Optional, Tuple
+from chat_bot.utils.ai_client import call_ai, stream_ai
+from course.services.ai_client import AIRateLimited
 from chat_bot.models import Message
+from chat_bot.services.context_service import ContextService, ConversationContext
+from chat_bot.services.intent_router import CANNED_REPLIES, FAQ_ANSWERS, LLM, IntentRouter, record_route
 from EStudyApp.services.history_service import HistoryService
 from Authentication.permissions import IsTeacher
-import re
+import time
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
+
+FALLBACK_REPLY = "Xin lỗi, hiện tại tôi không thể phản hồi. Bạn có thể thử lại sau."
+RATE_LIMITED_REPLY = "Bạn đang gửi quá nhiều câu hỏi. Vui lòng đợi một chút rồi thử lại."
+RESULTS_SHOWN = 3
+TREND_LABELS = {"up": "đang tăng", "down": "đang giảm", "flat": "ổn định"}
+
+
 class BotService:
     """Service for generating bot responses using AI model"""
 
@@ -21,6 +31,8 @@ class BotService:
         # # BASE_API_URL lấy từ settings, ví dụ 'http://localhost:8000' hoặc production URL
         # self.api_base_url = f"{settings.BASE_API_URL}{self.history_latest_path}"
         self.history_service = HistoryService()
+        self.context_service = ContextService()
+        self.intent_router = IntentRouter()
         self.responses = [
             "I'm a helpful AI assistant. How can I help you today?",
             "That's an interesting question! Let me think about that.",
@@ -35,54 +47,133 @@ class BotService:
         ]
 
 
-    def _extract_student_identifier(self, message: str) -> Optional[str]:
+    def _format_summary(self, summary: Dict) -> str:
+        """Bảng kết quả gần nhất + xu hướng điểm (EStudyApp/services/result_summary.py)"""
+        lines = [
+            f"- {r['date']}: {r['test_name']} | Tổng: {r['score']} "
+            f"(Listening: {r['listening_score']}, Reading: {r['reading_score']})"
+            for r in summary["results"]
+        ]
+        trend = summary["trend"]
+        if trend["tests"] > 1:
+            direction = TREND_LABELS.get(trend["direction"], "")
+            lines.append(
+                f"Xu hướng {trend['tests']} bài gần nhất: trung bình {trend['average']}, "
+                f"cao nhất {trend['best']}, {direction} ({trend['change']:+} điểm)"
+            )
+        return "\n".join(lines)
+
+    def _route(
+        self, user: User, clean_message: str, conversation_history: Optional[ConversationContext]
+    ) -> Tuple[str, Optional[str], Optional[str]]:
+        """(tên route, prompt gửi AI, câu trả lời sẵn) - xem services/intent_router.py"""
+        last_bot_message = next(
+            (m["content"] for m in reversed(conversation_history.messages) if m["role"] == "bot"), ""
+        ) if conversation_history else ""
+        intent = self.intent_router.classify(clean_message, last_bot_message)
+
+        if intent.name in CANNED_REPLIES:
+            return intent.name, None, CANNED_REPLIES[intent.name]
+        if intent.name in FAQ_ANSWERS:
+            return intent.name, None, FAQ_ANSWERS[intent.name]
+
+        if intent.name == "own_results":
+            if not (user and user.is_authenticated):
+                return intent.name, None, "Bạn cần đăng nhập để xem kết quả thi."
+            summary = self.history_service.get_user_summary(user.id, limit=RESULTS_SHOWN)
+            if not summary["results"]:
+                return intent.name, None, "Bạn chưa có kết quả bài thi nào."
+            if not intent.needs_analysis:
+                return (
+                    intent.name, None,
+                    f"Kết quả {len(summary['results'])} bài thi gần nhất của bạn:\n{self._format_summary(summary)}",
+                )
+            clean_message += (
+                f"\n\nDữ liệu kết quả thi gần nhất của tôi:\n{self._format_summary(summary)}\n\n"
+                f"Hãy phân tích và nhận xét dựa trên kết quả trên và đưa ra lộ trình cải thiện"
+            )
+
+        elif intent.name == "student_results":
+            # "student" / "sinh viên" cũng có trong câu hỏi thường ("How can a student improve...")
+            # -> chỉ là tra cứu điểm khi tìm thấy sinh viên thật, nếu không thì hỏi AI như mọi câu khác
+            prompt = self.context_service.render_prompt(conversation_history, clean_message)
+
+            # Chỉ cho giáo viên hoặc admin xem dữ liệu
+            if getattr(user, "role", None) not in ["teacher", "admin"]:
+                if self.history_service.resolve_students(intent.students):
+                    return intent.name, None, "Bạn không có quyền xem thông tin điểm của sinh viên."
+                return LLM, prompt, None
+
+            # Nhiều sinh viên trong một tin nhắn -> một truy vấn, bản tóm tắt lấy từ cache
+            summaries = self.history_service.get_result_summaries(intent.students, limit=RESULTS_SHOWN)
+            if not summaries:
+                return LLM, prompt, None
+            blocks = []
+            # Chỉ các identifier là sinh viên thật ("students and teachers" không phải tra cứu "and")
+            for student in intent.students:
+                summary = summaries.get(student)
+                if not summary:
+                    continue
+                if not summary["results"]:
+                    blocks.append(f"Không tìm thấy kết quả cho sinh viên '{summary['student']}'.")
+                else:
+                    blocks.append(
+                        f"Kết quả {len(summary['results'])} bài thi gần nhất của sinh viên "
+                        f"'{summary['student']}':\n{self._format_summary(summary)}"
+                    )
+            if not intent.needs_analysis or not any(s["results"] for s in summaries.values()):
+                return intent.name, None, "\n\n".join(blocks)
+            history_text = "\n\n".join(blocks)
+            clean_message += (
+                f"\n\nDữ liệu kết quả thi gần nhất:\n{history_text}\n\n"
+                f"Hãy phân tích và nhận xét dựa trên kết quả trên và đưa ra lộ trình cho sinh viên cải thiện"
+            )
+
+        return LLM, self.context_service.render_prompt(conversation_history, clean_message), None
+
+    def _build_prompt(
+        self, user: User, user_message: str, conversation_history: Optional[ConversationContext] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
         """
-        Tìm ID hoặc username sinh viên từ câu hỏi.
-        Ví dụ: "Kết quả sinh viên namnv" hoặc "Xem điểm student 1023"
+        Trả về (prompt gửi AI, None), hoặc (None, câu trả lời sẵn) khi không cần gọi AI:
+        câu xã giao, câu hỏi thường gặp và tra cứu điểm được trả lời tại chỗ (intent_router).
+        Prompt gồm bản tóm tắt + các lượt gần nhất (services/context_service.py) và tin nhắn mới.
         """
-        match = re.search(r"(?:sinh viên|student)\s+([A-Za-z0-9_]+)", message, re.IGNORECASE)
-        return match.group(1) if match else None
+        started = time.perf_counter()
+        route, prompt, reply = self._route(user, user_message.strip(), conversation_history)
+        record_route(route, (time.perf_counter() - started) * 1000)
+        return prompt, reply
 
     def generate_response(self, user: User, user_message: str, conversation_history=None) -> str:
         try:
-            if user and user.is_authenticated:
-                print("Username:", user.username)
-                print("Role:", getattr(user, "role", None))
-                print("FirstName:", user.first_name)
-                print("LastName:", user.last_name)
-                print("Email:", user.email)
-            else:
-                print("Người dùng chưa đăng nhập hoặc không xác thực.")
-
-            clean_message = user_message.strip()
-
-            # Nếu phát hiện câu hỏi có chứa sinh viên / student
-            student_identifier = self._extract_student_identifier(clean_message)
-            if student_identifier:
-                # Chỉ cho giáo viên hoặc admin xem dữ liệu
-                if getattr(user, "role", None) not in ["teacher", "admin"]:
-                    return "Bạn không có quyền xem thông tin điểm của sinh viên."
-
-                results = self.history_service.get_latest_results(student_identifier, limit=3)
-                if results:
-                    history_lines = [
-                        f"- {r['date']}: {r['test_name']} | Tổng: {r['score']} "
-                        f"(Listening: {r['listening_score']}, Reading: {r['reading_score']})"
-                        for r in results
-                    ]
-                    history_text = "\n".join(history_lines)
-                    clean_message += (
-                        f"\n\nDữ liệu kết quả thi gần nhất:\n{history_text}\n\n"
-                        f"Hãy phân tích và nhận xét dựa trên kết quả trên và đưa ra lộ trình cho sinh viên cải thiện"
-                    )
-                else:
-                    clean_message += f"\n\nKhông tìm thấy kết quả cho sinh viên '{student_identifier}'."
+            prompt, reply = self._build_prompt(user, user_message, conversation_history)
+            if reply is not None:
+                return reply
+            return call_ai(prompt, user_id=getattr(user, "id", None))
 
-            return call_ai(clean_message)
+        except AIRateLimited:
+            return RATE_LIMITED_REPLY
+        except Exception as e:
+            print("AI call failed:", e)
+            return FALLBACK_REPLY
 
+    def stream_response(self, user: User, user_message: str, conversation_history=None) -> Iterator[str]:
+        """
+        Như generate_response nhưng trả từng đoạn câu trả lời ngay khi mô hình sinh ra.
+        Lỗi giữa chừng thì kết thúc bằng câu xin lỗi thay vì ném exception.
+        """
+        try:
+            prompt, reply = self._build_prompt(user, user_message, conversation_history)
+            if reply is not None:
+                yield reply
+                return
+            yield from stream_ai(prompt, user_id=getattr(user, "id", None))
+
+        except AIRateLimited:
+            yield RATE_LIMITED_REPLY
         except Exception as e:
             print("AI call failed:", e)
-            return "Xin lỗi, hiện tại tôi không thể phản hồi. Bạn có thể thử lại sau."
+            yield FALLBACK_REPLY
 
 
     def analyze_sentiment(self, message: str) -> str:
@@ -141,6 +232,5 @@ class BotService:
         Returns:
             Boolean indicating whether to ask follow-up
         """
-        # Simple logic to determine follow-up questions
-        short_responses = ["yes", "no", "ok", "sure", "maybe"]
-        return user_message.lower().strip() in short_responses
+        # Short acknowledgements ("yes", "ok", "vâng", ...) as detected by the intent router
+        return self.intent_router.classify(user_message).name == "ack"
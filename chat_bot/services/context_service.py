@@ -0,0 +1,168 @@
+"""
+Conversation context for the chat bot: a rolling summary of older messages plus a
+token-budgeted window of the newest ones, so the prompt stays bounded however long
+the conversation gets.
+
+- Messages newer than the summary are added newest-first until HISTORY_TOKEN_BUDGET is used;
+  a single long message is clipped to MESSAGE_TOKEN_LIMIT.
+- Once SUMMARIZE_EVERY turns have accumulated beyond the KEEP_RECENT newest messages,
+  those older messages are folded into the summary (background job "chat_summary").
+- The summarizer is pluggable (settings.CHAT_SUMMARIZER); LocalSummarizer runs offline.
+"""
+import logging
+from typing import Dict, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from ..repositories.message_repository import MessageRepository
+from ..repositories.summary_repository import SummaryRepository
+from ..utils.summarizer import ROLE_LABELS
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TOKEN_BUDGET = 1200
+MESSAGE_TOKEN_LIMIT = 400
+KEEP_RECENT = 6          # Newest messages never folded into the summary (3 turns)
+SUMMARIZE_EVERY = 4      # Turns (user + bot message) between summary updates
+MAX_FOLD_MESSAGES = 40   # Upper bound on messages sent to the summarizer at once
+PENDING_KEY_TIMEOUT = 60 * 5
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def clip_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else text[:max_chars] + "..."
+
+
+def _pending_key(user_id: int) -> str:
+    return f"chat:summary:pending:{user_id}"
+
+
+class ConversationContext(NamedTuple):
+    summary: str
+    messages: List[Dict[str, str]]  # Chronological {"role", "content"}
+
+
+class ContextService:
+    """Service assembling the prompt context and maintaining the rolling summary"""
+
+    def __init__(self):
+        self.message_repository = MessageRepository()
+        self.summary_repository = SummaryRepository()
+
+    def get_context(self, user_id: int) -> ConversationContext:
+        """Summary + newest messages within the token budget"""
+        summary = self.summary_repository.get_for_user(user_id)
+        after_id = summary.last_message_id if summary else 0
+
+        window, used = [], 0
+        candidates = self.message_repository.get_messages_after(
+            user_id, after_id, limit=KEEP_RECENT + 2 * SUMMARIZE_EVERY
+        )
+        for message in candidates:
+            content = clip_tokens(message.content, MESSAGE_TOKEN_LIMIT)
+            cost = estimate_tokens(content)
+            if used + cost > HISTORY_TOKEN_BUDGET:
+                break
+            window.append({"role": message.role, "content": content})
+            used += cost
+        window.reverse()
+
+        return ConversationContext(summary.content if summary else "", window)
+
+    def render_prompt(self, context: Optional[ConversationContext], user_message: str) -> str:
+        """Prompt sent to the model: summary, recent turns, then the new message"""
+        if not context or not (context.summary or context.messages):
+            return user_message
+
+        sections = []
+        if context.summary:
+            sections.append(f"Tóm tắt hội thoại trước đó:\n{context.summary}")
+        if context.messages:
+            turns = "\n".join(
+                f"{ROLE_LABELS.get(m['role'], m['role'])}: {m['content']}" for m in context.messages
+            )
+            sections.append(f"Hội thoại gần đây:\n{turns}")
+        sections.append(f"Tin nhắn mới của người dùng:\n{user_message}")
+        return "\n\n".join(sections)
+
+    def needs_summary(self, user_id: int) -> bool:
+        summary = self.summary_repository.get_for_user(user_id)
+        after_id = summary.last_message_id if summary else 0
+        pending = self.message_repository.count_messages_after(user_id, after_id)
+        return pending >= KEEP_RECENT + 2 * SUMMARIZE_EVERY
+
+    def schedule_summary(self, user_id: int) -> bool:
+        """
+        Queue a summary update when enough turns have accumulated (at most one pending per user).
+        A missed update is harmless: the window stays within budget and the next turn retries.
+        """
+        try:
+            if not self.needs_summary(user_id):
+                return False
+            pending_key = _pending_key(user_id)
+            if not cache.add(pending_key, 1, PENDING_KEY_TIMEOUT):
+                return False
+            try:
+                from EStudyApp.services.jobs import enqueue
+
+                enqueue("chat_summary", {"user_id": user_id}, user_id=user_id)
+            except Exception:
+                cache.delete(pending_key)
+                raise
+            return True
+        except Exception as e:
+            logger.warning("Could not queue chat summary for user %s: %s", user_id, e)
+            return False
+
+    def update_summary(self, user_id: int, summarizer=None) -> bool:
+        """
+        Fold the messages older than the KEEP_RECENT newest into the summary
+        (at most MAX_FOLD_MESSAGES per call, the rest on the next update)
+        Returns: True if the summary changed
+        """
+        summary = self.summary_repository.get_for_user(user_id)
+        previous = summary.content if summary else ""
+        after_id = summary.last_message_id if summary else 0
+
+        pending = self.message_repository.count_messages_after(user_id, after_id)
+        if pending < KEEP_RECENT + 2 * SUMMARIZE_EVERY:
+            return False
+        to_fold = self.message_repository.get_messages_after(
+            user_id, after_id, limit=min(pending - KEEP_RECENT, MAX_FOLD_MESSAGES), newest_first=False
+        )
+
+        summarizer = summarizer or get_summarizer()
+        content = summarizer.summarize(
+            previous,
+            [{"role": m.role, "content": clip_tokens(m.content, MESSAGE_TOKEN_LIMIT)} for m in to_fold],
+        )
+        return self.summary_repository.save_if_unchanged(
+            user_id, after_id, content, to_fold[-1].id
+        )
+
+    def reset(self, user_id: int):
+        """Forget the summary (conversation cleared)"""
+        self.summary_repository.delete_for_user(user_id)
+
+
+def get_summarizer():
+    return import_string(
+        getattr(settings, "CHAT_SUMMARIZER", "chat_bot.utils.summarizer.LLMSummarizer")
+    )()
+
+
+def run_summary_job(payload, progress):
+    """Handler for background job "chat_summary" (EStudyApp/services/jobs.py)"""
+    user_id = payload["user_id"]
+    try:
+        updated = ContextService().update_summary(user_id)
+    finally:
+        cache.delete(_pending_key(user_id))
+    return {"updated": updated}
@@ -0,0 +1,268 @@
+"""
+Local intent routing before the model is called.
+
+Stage 1 - keywords: one precompiled regex (alternation of named groups) over the normalized
+message (lowercase, no diacritics, no punctuation). Short small-talk messages ("ok", "cảm ơn",
+"xin chào") must match as a whole; score lookups ("điểm của tôi", "sinh viên namnv") anywhere.
+Stage 2 - classifier: TF-IDF (character n-grams) + logistic regression trained on the example
+utterances below, only for short messages; an FAQ label is used only above MIN_CONFIDENCE,
+everything else (label "open") goes to the model.
+
+Messages asking for analysis or advice ("phân tích", "lộ trình", "tại sao", ...) always go to the
+model. Routes and fast-path latency are counted per day in the cache (route_stats()).
+"""
+import logging
+import re
+import threading
+import unicodedata
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+MIN_CONFIDENCE = 0.6
+MAX_CLASSIFIED_WORDS = 15
+FAST_PATH_MS = 10
+STATS_TIMEOUT = 60 * 60 * 24 * 8
+
+LLM = "llm"
+OPEN = "open"
+
+CANNED_REPLIES = {
+    "ack": "Được rồi! Nếu bạn cần hỗ trợ thêm về TOEIC, cứ hỏi mình nhé.",
+    "greeting": "Xin chào! Mình là trợ lý luyện thi TOEIC. Bạn có thể hỏi về cấu trúc đề, "
+                "cách tính điểm, xem kết quả thi gần nhất hoặc nhờ mình gợi ý lộ trình học.",
+    "thanks": "Không có gì! Chúc bạn ôn luyện hiệu quả.",
+    "goodbye": "Tạm biệt! Hẹn gặp lại bạn trong buổi luyện thi tiếp theo.",
+    "capabilities": "Mình có thể giải thích cấu trúc đề và cách tính điểm TOEIC, cho bạn xem "
+                    "kết quả các bài thi gần nhất, phân tích kết quả và gợi ý lộ trình ôn luyện.",
+}
+
+FAQ_ANSWERS = {
+    "toeic_format": (
+        "Đề TOEIC Listening & Reading gồm 200 câu, chia 7 phần:\n"
+        "- Listening (100 câu): Part 1 Mô tả tranh (6), Part 2 Hỏi - đáp (25), "
+        "Part 3 Hội thoại (39), Part 4 Bài nói ngắn (30).\n"
+        "- Reading (100 câu): Part 5 Hoàn thành câu (30), Part 6 Hoàn thành đoạn văn (16), "
+        "Part 7 Đọc hiểu (54)."
+    ),
+    "toeic_scoring": (
+        "Điểm TOEIC Listening & Reading từ 10 đến 990: mỗi kỹ năng Listening và Reading "
+        "từ 5 đến 495. Điểm được quy đổi từ số câu đúng của từng kỹ năng, câu sai hoặc "
+        "bỏ trống không bị trừ điểm."
+    ),
+    "toeic_duration": (
+        "Bài thi TOEIC Listening & Reading kéo dài khoảng 2 giờ: Listening khoảng 45 phút "
+        "(theo băng), Reading 75 phút."
+    ),
+}
+
+# Stage 1: whole-message small talk (Vietnamese written without diacritics, see normalize())
+SMALL_TALK = {
+    "ack": ["ok", "oke", "okie", "okay", "uh", "uhm", "um", "u", "vang", "da", "duoc", "duoc roi",
+            "hieu roi", "da hieu", "ro roi", "co", "khong", "yes", "yeah", "yep", "sure", "no",
+            "got it", "alright", "fine", "maybe"],
+    "greeting": ["hi", "hello", "hey", "alo", "chao", "xin chao", "hi there", "good morning",
+                 "good afternoon", "good evening", "chao buoi sang", "chao buoi toi"],
+    "thanks": ["cam on", "cam ta", "thanks", "thank you", "thank u", "thanks a lot", "tks", "thx"],
+    "goodbye": ["bye", "bye bye", "goodbye", "tam biet", "hen gap lai", "see you", "see ya"],
+    "capabilities": ["ban la ai", "ban lam duoc gi", "ban giup duoc gi", "ban co the lam gi",
+                     "who are you", "what can you do"],
+}
+PARTICLES = ["nhe", "nha", "a", "ah", "ak", "nhieu", "ban", "bot", "ad", "ha", "lam", "qua",
+             "em", "anh", "chi", "thay", "co", "nhe ban", "roi", "vay"]
+
+# Stage 1: score lookups (matched anywhere in the message)
+OWN_RESULTS_PATTERNS = [
+    r"(?:diem|ket qua)(?: thi| bai thi)?(?: gan nhat| moi nhat| gan day)? cua (?:toi|em|minh|tui)",
+    r"(?:toi|em|minh|tui) (?:duoc|dat) bao nhieu diem",
+    r"\bmy (?:latest |recent |last )?(?:toeic )?(?:score|scores|result|results)\b",
+]
+# "sinh viên namnv", "students namnv, hoangl, 1023" (several students in one message).
+# Only candidates: BotService keeps the identifiers that resolve to existing users.
+STUDENT_PATTERN = re.compile(
+    r"(?:sinh vi[eê]n|students?)\s+([A-Za-z0-9_]+(?:\s*,\s*[A-Za-z0-9_]+)*)", re.IGNORECASE
+)
+
+# Questions that need reasoning, never answered from templates
+ANALYSIS_MARKERS = [
+    "phan tich", "nhan xet", "danh gia", "lo trinh", "goi y", "cai thien", "tu van", "ke hoach",
+    "tai sao", "vi sao", "giai thich", "so sanh", "lam sao", "lam the nao", "meo",
+    "analy", "why", "explain", "improve", "advice", "compare", "how to", "plan",
+]
+
+# Stage 2: example utterances per label, used to train the classifier
+TRAINING_EXAMPLES = {
+    "toeic_format": [
+        "de thi toeic gom may phan", "cau truc de toeic", "toeic co bao nhieu cau",
+        "bai thi toeic co nhung part nao", "toeic co may part", "de toeic co bao nhieu phan",
+        "phan listening co bao nhieu cau", "part 7 co bao nhieu cau", "format de thi toeic",
+        "toeic exam structure", "how many parts in toeic", "how many questions in the toeic test",
+    ],
+    "toeic_scoring": [
+        "cach tinh diem toeic", "thang diem toeic", "toeic toi da bao nhieu diem",
+        "diem toeic tinh nhu the nao", "diem toi da cua toeic", "cau sai co bi tru diem khong",
+        "moi ky nang toi da bao nhieu diem", "diem listening toi da",
+        "toeic scoring", "how is toeic scored", "maximum toeic score", "toeic score range",
+    ],
+    "toeic_duration": [
+        "thi toeic bao lau", "thoi gian lam bai toeic", "bai thi toeic keo dai bao lau",
+        "listening lam trong bao lau", "reading co bao nhieu phut", "thoi gian thi toeic la bao nhieu",
+        "toeic thi trong may tieng", "how long is the toeic test", "toeic duration",
+        "how much time for reading",
+    ],
+    OPEN: [
+        "lam sao de nghe tot hon", "toi nen hoc tu vung nhu the nao", "giai thich cau nay giup toi",
+        "dich cau nay sang tieng viet", "tai sao dap an la b", "viet cho toi mot doan van",
+        "cho toi vai meo lam part 5", "toi muon dat 800 diem", "nen hoc ngu phap hay tu vung truoc",
+        "thi hien tai hoan thanh dung khi nao", "phan biet since va for", "cho vi du ve menh de quan he",
+        "toi bi mat goc tieng anh", "what does this word mean", "help me with this sentence",
+        "give me a study plan", "is my grammar correct", "translate this paragraph",
+        "ke cho toi mot cau chuyen", "hom nay thoi tiet the nao", "tieng anh kho qua",
+        "goi y sach luyen thi", "toi nen luyen de nao", "cach hoc tu vung hieu qua",
+    ],
+}
+
+
+class Intent(NamedTuple):
+    name: str                    # Key in CANNED_REPLIES / FAQ_ANSWERS, "own_results", "student_results" or LLM
+    source: str = "keyword"      # "keyword" | "classifier" | LLM
+    students: Tuple[str, ...] = ()
+    needs_analysis: bool = False
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip Vietnamese diacritics and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFD", text.lower().replace("đ", "d"))
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def _alternation(phrases: List[str]) -> str:
+    return "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+
+
+def _compile_small_talk() -> re.Pattern:
+    groups = "|".join(f"(?P<{name}>{_alternation(phrases)})" for name, phrases in SMALL_TALK.items())
+    return re.compile(rf"(?:{groups})(?: (?:{_alternation(PARTICLES)}))*")
+
+
+SMALL_TALK_RE = _compile_small_talk()
+OWN_RESULTS_RE = re.compile("|".join(OWN_RESULTS_PATTERNS))
+ANALYSIS_RE = re.compile(rf"\b(?:{_alternation(ANALYSIS_MARKERS)})")
+
+
+class IntentClassifier:
+    """TF-IDF + logistic regression over TRAINING_EXAMPLES, trained once per process on first use."""
+
+    def __init__(self, examples: Dict[str, List[str]] = TRAINING_EXAMPLES):
+        self.examples = examples
+        self._model = None
+        self._unavailable = False
+        self._lock = threading.Lock()
+
+    def _train(self):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import make_pipeline
+
+        texts = [text for examples in self.examples.values() for text in examples]
+        labels = [label for label, examples in self.examples.items() for _ in examples]
+        model = make_pipeline(
+            TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), sublinear_tf=True),
+            LogisticRegression(C=10, max_iter=1000),
+        )
+        return model.fit(texts, labels)
+
+    def predict(self, normalized: str):
+        """(label, probability), or None if scikit-learn is not available."""
+        if self._model is None and not self._unavailable:
+            with self._lock:
+                if self._model is None and not self._unavailable:
+                    try:
+                        self._model = self._train()
+                    except ImportError as e:
+                        logger.warning("Intent classifier disabled: %s", e)
+                        self._unavailable = True
+        if self._model is None:
+            return None
+        probabilities = self._model.predict_proba([normalized])[0]
+        best = probabilities.argmax()
+        return self._model.classes_[best], float(probabilities[best])
+
+
+class IntentRouter:
+    """Decide whether a message can be answered locally, and how"""
+
+    def __init__(self, classifier: Optional[IntentClassifier] = None):
+        self.classifier = classifier or _classifier
+
+    def classify(self, message: str, last_bot_message: str = "") -> Intent:
+        text = normalize(message)
+        if not text:
+            return Intent(LLM, LLM)
+
+        match = SMALL_TALK_RE.fullmatch(text)
+        if match:
+            # "có", "ok" answering a question the bot just asked is part of the conversation
+            if match.lastgroup == "ack" and last_bot_message.rstrip().endswith("?"):
+                return Intent(LLM, LLM)
+            return Intent(match.lastgroup)
+
+        needs_analysis = bool(ANALYSIS_RE.search(text))
+        students = [
+            name.strip() for mention in STUDENT_PATTERN.findall(message) for name in mention.split(",")
+        ]
+        if students:
+            return Intent("student_results", students=tuple(dict.fromkeys(students)), needs_analysis=needs_analysis)
+        if OWN_RESULTS_RE.search(text):
+            return Intent("own_results", needs_analysis=needs_analysis)
+
+        if needs_analysis or len(text.split()) > MAX_CLASSIFIED_WORDS:
+            return Intent(LLM, LLM)
+        prediction = self.classifier.predict(text)
+        if prediction:
+            label, probability = prediction
+            if label in FAQ_ANSWERS and probability >= MIN_CONFIDENCE:
+                return Intent(label, "classifier")
+        return Intent(LLM, LLM)
+
+
+_classifier = IntentClassifier()
+
+
+def _stats_key(day: str, name: str) -> str:
+    return f"chat:router:{day}:{name}"
+
+
+def _incr(key: str):
+    cache.add(key, 0, STATS_TIMEOUT)
+    try:
+        cache.incr(key)
+    except ValueError:  # Key expired between add() and incr()
+        cache.set(key, 1, STATS_TIMEOUT)
+
+
+def record_route(route: str, elapsed_ms: float):
+    """Count one routed message: per route, plus local answers served within FAST_PATH_MS."""
+    day = date.today().isoformat()
+    try:
+        _incr(_stats_key(day, route))
+        if route != LLM and elapsed_ms <= FAST_PATH_MS:
+            _incr(_stats_key(day, "fast"))
+    except Exception as e:
+        logger.debug("Could not record chat route: %s", e)
+    logger.debug("chat route=%s elapsed=%.1fms", route, elapsed_ms)
+
+
+def route_stats(day: Optional[str] = None) -> Dict[str, int]:
+    """Counters of one day (default today), e.g. {"greeting": 3, "llm": 10, "fast": 3, "total": 13}"""
+    day = day or date.today().isoformat()
+    names = [LLM, "fast", "own_results", "student_results", *SMALL_TALK, *FAQ_ANSWERS]
+    values = cache.get_many([_stats_key(day, name) for name in names])
+    stats = {name: values.get(_stats_key(day, name), 0) for name in names}
+    stats["total"] = sum(count for name, count in stats.items() if name != "fast")
+    return stats
+
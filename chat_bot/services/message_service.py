@@ -1,7 +1,9 @@
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Iterator, Tuple
 from ..models import Message
 from ..repositories.message_repository import MessageRepository
+from ..utils.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
 from .bot_service import BotService
+from .context_service import ContextService
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
@@ -11,17 +13,37 @@ class MessageService:
     def __init__(self):
         self.message_repository = MessageRepository()
         self.bot_service = BotService()
+        self.context_service = ContextService()
 
-    def get_user_messages(self, user_id: int) -> Dict[str, Any]:
+    def get_user_messages(
+        self,
+        user_id: int,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        role: Optional[str] = None,
+        newest_first: bool = False,
+    ) -> Dict[str, Any]:
         """
-        Get all messages for a specific user
-        Returns: Dict with 'success', 'messages', and 'errors' keys
+        Get one keyset page of a user's messages (chronological within the page)
+        `cursor` continues after the previous page; `newest_first` pages from the latest message back
+        Returns: Dict with 'success', 'messages', 'next_cursor' and 'errors' keys
         """
         try:
-            messages = self.message_repository.get_by_user_id(user_id)
-            return {"success": True, "messages": messages, "errors": []}
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return {"success": False, "messages": [], "next_cursor": None, "errors": [str(e)]}
+
+        try:
+            messages = self.message_repository.get_page(
+                user_id, limit, after, newest_first=newest_first, role=role
+            )
+            next_cursor = encode_cursor(messages[limit - 1]) if len(messages) > limit else None
+            messages = messages[:limit]
+            if newest_first:
+                messages.reverse()
+            return {"success": True, "messages": messages, "next_cursor": next_cursor, "errors": []}
         except Exception as e:
-            return {"success": False, "messages": [], "errors": [str(e)]}
+            return {"success": False, "messages": [], "next_cursor": None, "errors": [str(e)]}
 
     def create_message(self, user_id: int, role: str, content: str) -> Dict[str, Any]:
         """
@@ -118,36 +140,31 @@ class MessageService:
             return {"success": False, "errors": [str(e)]}
 
     def get_conversation_history(
-        self, user_id: int, limit: int = None
+        self, user_id: int, limit: Optional[int] = None, cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Get conversation history for a user
-        Returns: Dict with 'success', 'messages', and 'errors' keys
+        Get the latest `limit` messages in chronological order; `cursor` loads older ones
+        Returns: Dict with 'success', 'messages', 'next_cursor' and 'errors' keys
         """
-        try:
-            if limit:
-                messages = self.message_repository.get_recent_messages(user_id, limit)
-                messages.reverse()  # Reverse to get chronological order
-            else:
-                messages = self.message_repository.get_conversation_history(user_id)
-
-            return {"success": True, "messages": messages, "errors": []}
-        except Exception as e:
-            return {"success": False, "messages": [], "errors": [str(e)]}
+        return self.get_user_messages(
+            user_id, cursor, limit or DEFAULT_PAGE_SIZE, newest_first=True
+        )
 
-    def get_messages_by_role(self, user_id: int, role: str) -> Dict[str, Any]:
+    def get_messages_by_role(
+        self, user_id: int, role: str, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE
+    ) -> Dict[str, Any]:
         """
-        Get messages for a user filtered by role
-        Returns: Dict with 'success', 'messages', and 'errors' keys
+        Get one keyset page of a user's messages filtered by role
+        Returns: Dict with 'success', 'messages', 'next_cursor' and 'errors' keys
         """
         if role not in ["user", "bot", "system"]:
-            return {"success": False, "messages": [], "errors": ["Invalid role"]}
+            return {"success": False, "messages": [], "next_cursor": None, "errors": ["Invalid role"]}
 
-        try:
-            messages = self.message_repository.get_user_messages_by_role(user_id, role)
-            return {"success": True, "messages": messages, "errors": []}
-        except Exception as e:
-            return {"success": False, "messages": [], "errors": [str(e)]}
+        return self.get_user_messages(user_id, cursor, limit, role=role)
+
+    def export_messages(self, user_id: int):
+        """All of a user's messages as dicts, oldest first, without loading them all at once"""
+        return self.message_repository.aiter_export_rows(user_id)
 
     def delete_user_conversation(self, user_id: int) -> Dict[str, Any]:
         """
@@ -156,6 +173,7 @@ class MessageService:
         """
         try:
             count = self.message_repository.delete_user_messages(user_id)
+            self.context_service.reset(user_id)
             return {"success": True, "count": count, "errors": []}
         except Exception as e:
             return {"success": False, "count": 0, "errors": [str(e)]}
@@ -202,13 +220,8 @@ class MessageService:
             }
 
         try:
-            # Lấy lịch sử hội thoại gần nhất
-            recent_messages = self.message_repository.get_recent_messages(
-                user.id, limit=5
-            )
-            conversation_history = [
-                {"role": msg.role, "content": msg.content} for msg in recent_messages
-            ]
+            # Bản tóm tắt + các tin nhắn gần nhất trong giới hạn token
+            conversation_history = self.context_service.get_context(user.id)
 
             # Gọi bot, truyền luôn user để check role
             bot_response = self.bot_service.generate_response(
@@ -221,6 +234,7 @@ class MessageService:
             user_message, bot_message = self.message_repository.create_conversation_pair(
                 user.id, user_content, bot_response
             )
+            self.context_service.schedule_summary(user.id)
 
             return {
                 "success": True,
@@ -236,3 +250,37 @@ class MessageService:
                 "bot_message": None,
                 "errors": [str(e)],
             }
+
+    def stream_conversation(self, user: User, user_content: str) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming version of create_conversation.
+        Yields {"type": "token", "text"} chunks as the bot reply is generated, then
+        {"type": "done", "user_message", "bot_message"} once both messages are saved,
+        or a single {"type": "error", "errors"}. Nothing is saved if the consumer stops early.
+        """
+        errors = self._validate_message_data("user", user_content)
+        if errors:
+            yield {"type": "error", "errors": errors}
+            return
+
+        try:
+            conversation_history = self.context_service.get_context(user.id)
+
+            parts = []
+            for text in self.bot_service.stream_response(
+                user=user,
+                user_message=user_content,
+                conversation_history=conversation_history,
+            ):
+                parts.append(text)
+                yield {"type": "token", "text": text}
+
+            user_message, bot_message = self.message_repository.create_conversation_pair(
+                user.id, user_content, "".join(parts)
+            )
+            self.context_service.schedule_summary(user.id)
+        except Exception as e:
+            yield {"type": "error", "errors": [str(e)]}
+            return
+
+        yield {"type": "done", "user_message": user_message, "bot_message": bot_message}
@@ -1,9 +1,23 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from Authentication.models import User
-from .models import Message
+from .models import ConversationSummary, Message
+from .services import context_service
+from .services.bot_service import BotService
+from .services.context_service import ContextService, ConversationContext
+from .services import intent_router
+from .services.message_service import MessageService
+from .repositories.message_repository import MessageRepository
+from .utils.summarizer import LocalSummarizer
+from course.services.ai_client import FakeBackend, use_backend
+from EStudyApp.models import History, Test
+from django.core.cache import cache
+from django.utils import timezone
+import importlib.util
+import unittest
+from asgiref.sync import async_to_sync
 import json
 
 
@@ -210,6 +224,26 @@ class ChatBotAPITestCase(APITestCase):
         self.assertTrue(response.data["success"])
         self.assertEqual(response.data["count"], 1)
 
+    def test_message_pagination(self):
+        """Test GET /messages/?limit=&cursor= - Keyset pages cover the history exactly once"""
+        self.client.force_authenticate(user=self.user1)
+        for i in range(5):
+            Message.objects.create(user=self.user1, role="user", content=f"page {i}")
+
+        url = reverse("chat_bot:user_messages")
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(url, {"limit": 3, **({"cursor": cursor} if cursor else {})})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [msg["id"] for msg in response.data["data"]]
+            cursor = response.data["next_cursor"]
+            if not response.data["has_more"]:
+                break
+        self.assertEqual(seen, list(Message.objects.filter(user=self.user1).order_by("created_at", "id").values_list("id", flat=True)))
+
+        response = self.client.get(url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_clear_conversation(self):
         """Test DELETE /messages/clear/ - Clear all user messages"""
         self.client.force_authenticate(user=self.user1)
@@ -359,3 +393,210 @@ class ChatBotModelsTestCase(TestCase):
         # Test cascade delete
         self.user.delete()
         self.assertEqual(Message.objects.count(), 0)
+
+
+@override_settings(CHAT_SUMMARIZER="chat_bot.utils.summarizer.LocalSummarizer")
+class ConversationContextTestCase(TestCase):
+    """Test cases for the token-budgeted context window and rolling summary"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="context@example.com", username="contextuser", password="testpassword123"
+        )
+        self.context_service = ContextService()
+
+    def add_turns(self, count, prefix="turn", length=1):
+        for i in range(count):
+            Message.objects.create(user=self.user, role="user", content=f"{prefix} {i} " + "hỏi " * length)
+            Message.objects.create(user=self.user, role="bot", content=f"{prefix} {i} " + "đáp " * length)
+
+    def test_window_is_chronological_and_within_budget(self):
+        self.add_turns(7, length=300)
+        context = self.context_service.get_context(self.user.id)
+
+        used = sum(context_service.estimate_tokens(m["content"]) for m in context.messages)
+        self.assertLessEqual(used, context_service.HISTORY_TOKEN_BUDGET)
+        self.assertTrue(context.messages)
+        self.assertTrue(context.messages[-1]["content"].startswith("turn 6 đáp"))
+        self.assertEqual(context.summary, "")
+
+    def test_summary_folds_older_messages_every_n_turns(self):
+        keep, every = context_service.KEEP_RECENT, context_service.SUMMARIZE_EVERY
+        self.add_turns((keep + 2 * every) // 2 - 1, prefix="old")
+        self.assertFalse(self.context_service.update_summary(self.user.id))
+
+        self.add_turns(1, prefix="new")
+        self.assertTrue(self.context_service.update_summary(self.user.id))
+
+        summary = ConversationSummary.objects.get(user=self.user)
+        folded = Message.objects.filter(user=self.user).order_by("id")[2 * every - 1]
+        self.assertEqual(summary.last_message_id, folded.id)
+        self.assertIn("old 0", summary.content)
+
+        context = self.context_service.get_context(self.user.id)
+        self.assertEqual(len(context.messages), keep)
+        self.assertTrue(context.messages[-1]["content"].startswith("new 0"))
+        # Chưa đủ N lượt mới thì không tóm tắt lại
+        self.assertFalse(self.context_service.update_summary(self.user.id))
+
+    def test_prompt_stays_bounded_for_long_conversations(self):
+        sizes = []
+        for _ in range(5):
+            self.add_turns(20, length=80)
+            while self.context_service.update_summary(self.user.id):
+                pass
+            context = self.context_service.get_context(self.user.id)
+            sizes.append(len(self.context_service.render_prompt(context, "câu hỏi mới")))
+        self.assertLess(max(sizes), 4 * context_service.HISTORY_TOKEN_BUDGET + 2000)
+        self.assertLess(max(sizes) - min(sizes), 1000)
+
+    def test_bot_prompt_includes_context(self):
+        self.add_turns(2, prefix="earlier")
+        context = self.context_service.get_context(self.user.id)
+        with use_backend(FakeBackend(reply=lambda prompt: prompt)):
+            prompt = BotService().generate_response(self.user, "tiếp tục nhé", context)
+        self.assertIn("earlier 1 đáp", prompt)
+        self.assertIn("tiếp tục nhé", prompt)
+
+    def test_clear_conversation_resets_summary(self):
+        self.add_turns(10)
+        self.context_service.update_summary(self.user.id, summarizer=LocalSummarizer())
+        self.assertTrue(ConversationSummary.objects.filter(user=self.user).exists())
+        self.context_service.reset(self.user.id)
+        self.assertFalse(ConversationSummary.objects.filter(user=self.user).exists())
+
+
+class MessagePaginationTestCase(TestCase):
+    """Test cases for keyset pagination and NDJSON export of chat history"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="pages@example.com", username="pagesuser", password="testpassword123"
+        )
+        self.service = MessageService()
+        self.messages = [
+            Message.objects.create(user=self.user, role="user" if i % 2 else "bot", content=f"m{i}")
+            for i in range(25)
+        ]
+        # Một nửa có cùng created_at: thứ tự phải dựa vào id
+        Message.objects.filter(id__in=[m.id for m in self.messages[10:]]).update(
+            created_at=self.messages[10].created_at
+        )
+
+    def collect(self, fetch):
+        ids, cursor = [], None
+        while True:
+            result = fetch(cursor)
+            self.assertTrue(result["success"])
+            ids.append([m.id for m in result["messages"]])
+            cursor = result["next_cursor"]
+            if cursor is None:
+                return ids
+
+    def test_forward_pages_cover_history_once(self):
+        pages = self.collect(lambda cursor: self.service.get_user_messages(self.user.id, cursor, limit=10))
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), [m.id for m in self.messages])
+
+    def test_history_pages_back_from_latest(self):
+        pages = self.collect(lambda cursor: self.service.get_conversation_history(self.user.id, 10, cursor))
+        ids = [m.id for m in self.messages]
+        self.assertEqual(pages[0], ids[-10:])
+        self.assertEqual(pages[1], ids[-20:-10])
+        self.assertEqual(pages[2], ids[:5])
+
+    def test_role_filter_and_invalid_cursor(self):
+        pages = self.collect(lambda cursor: self.service.get_messages_by_role(self.user.id, "user", cursor, limit=4))
+        self.assertEqual(sum(pages, []), [m.id for m in self.messages if m.role == "user"])
+        self.assertFalse(self.service.get_user_messages(self.user.id, "garbage")["success"])
+
+    def test_export_streams_all_rows_in_batches(self):
+        async def export():
+            return [row async for row in MessageRepository().aiter_export_rows(self.user.id, batch_size=4)]
+
+        rows = async_to_sync(export)()
+        self.assertEqual([row["id"] for row in rows], [m.id for m in self.messages])
+        self.assertEqual(set(rows[0]), {"id", "role", "content", "created_at"})
+
+
+class IntentRouterTestCase(TestCase):
+    """Messages answered locally never reach the model"""
+
+    def setUp(self):
+        cache.clear()  # Result summaries are cached per user id, which tests reuse
+        self.student = User.objects.create_user(email="sv@example.com", username="namnv", password="pw")
+        self.teacher = User.objects.create_user(
+            email="gv@example.com", username="teacher", password="pw", role="teacher"
+        )
+        test = Test.objects.create(name="ETS 2024 Test 1")
+        for score in (450, 600):
+            History.objects.create(
+                user=self.student, test=test, score=score, listening_score=score // 2,
+                reading_score=score // 2, end_time=timezone.now(), complete=True,
+            )
+
+    def reply(self, user, content, context=None):
+        with use_backend(FakeBackend(reply=lambda prompt: "llm")) as backend:
+            reply = BotService().generate_response(user, content, context)
+        return reply, len(backend.calls)
+
+    def test_small_talk_is_canned(self):
+        for content, intent in [("Ok nhé", "ack"), ("Xin chào!", "greeting"),
+                                ("Cảm ơn bạn nhiều", "thanks"), ("bye", "goodbye")]:
+            self.assertEqual(self.reply(self.student, content), (intent_router.CANNED_REPLIES[intent], 0))
+        self.assertTrue(BotService().should_ask_followup("Vâng"))
+
+    def test_ack_answering_bot_question_goes_to_model(self):
+        context = ConversationContext("", [{"role": "bot", "content": "Bạn có muốn xem lộ trình không?"}])
+        self.assertEqual(self.reply(self.student, "có", context), ("llm", 1))
+
+    def test_score_lookups_read_the_database(self):
+        reply, calls = self.reply(self.student, "Điểm gần nhất của tôi là bao nhiêu?")
+        self.assertEqual(calls, 0)
+        self.assertIn("ETS 2024 Test 1", reply)
+        self.assertIn("Tổng: 600.0", reply)
+
+        reply, calls = self.reply(self.teacher, "Xem kết quả sinh viên namnv")
+        self.assertEqual(calls, 0)
+        self.assertIn("Tổng: 450.0", reply)
+
+        reply, calls = self.reply(self.teacher, "Kết quả sinh viên namnv, ghost, teacher")
+        self.assertEqual(calls, 0)
+        self.assertIn("của sinh viên 'namnv'", reply)
+        self.assertIn("Không tìm thấy kết quả cho sinh viên 'teacher'.", reply)
+        self.assertNotIn("ghost", reply)
+        self.assertEqual(
+            self.reply(self.student, "Xem kết quả sinh viên namnv")[0],
+            "Bạn không có quyền xem thông tin điểm của sinh viên.",
+        )
+
+    def test_open_ended_and_analysis_go_to_model(self):
+        self.assertEqual(self.reply(self.teacher, "Phân tích kết quả sinh viên namnv")[1], 1)
+        self.assertEqual(self.reply(self.student, "Làm sao để cải thiện kỹ năng nghe Part 3?")[1], 1)
+        self.assertEqual(self.reply(self.student, "Ok, vậy còn Part 4 thì sao?")[1], 1)
+
+    def test_question_mentioning_student_goes_to_model(self):
+        for user in (self.teacher, self.student):
+            self.assertEqual(self.reply(user, "How can a student improve Part 3?"), ("llm", 1))
+            self.assertEqual(self.reply(user, "Giải thích cho sinh viên hiểu thì hiện tại hoàn thành"), ("llm", 1))
+            self.assertEqual(self.reply(user, "What should students and teachers do before the exam?"), ("llm", 1))
+
+    @unittest.skipUnless(importlib.util.find_spec("sklearn"), "scikit-learn not installed")
+    def test_faq_answered_by_classifier(self):
+        self.assertEqual(
+            self.reply(self.student, "Đề thi TOEIC gồm mấy phần?"),
+            (intent_router.FAQ_ANSWERS["toeic_format"], 0),
+        )
+        self.assertEqual(
+            self.reply(self.student, "Cách tính điểm TOEIC như thế nào?"),
+            (intent_router.FAQ_ANSWERS["toeic_scoring"], 0),
+        )
+
+    def test_routes_are_counted(self):
+        before = intent_router.route_stats()
+        self.reply(self.student, "hello")
+        self.reply(self.student, "Viết cho tôi một đoạn văn về du lịch")
+        after = intent_router.route_stats()
+        self.assertEqual(after["greeting"] - before["greeting"], 1)
+        self.assertEqual(after["llm"] - before["llm"], 1)
+        self.assertEqual(after["total"] - before["total"], 2)
@@ -32,4 +32,10 @@ urlpatterns = [
     path(
         "messages/count/", message_controller.message_count, name="message_count"
     ),  # GET /messages/count/
+    path(
+        "messages/stream/", message_controller.stream_message, name="stream_message"
+    ),  # GET|POST /messages/stream/ (Server-Sent Events)
+    path(
+        "messages/export/", message_controller.export_messages, name="export_messages"
+    ),  # GET /messages/export/ (NDJSON)
 ]
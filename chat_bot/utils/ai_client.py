@@ -1,36 +1,26 @@
 # chat_bot/utils/ai_client.py
-import os
-from pathlib import Path
-from dotenv import load_dotenv
-import google.generativeai as genai
+# Lời gọi AI của chat bot đi qua client dùng chung course/services/ai_client.py
+# (giới hạn đồng thời, giới hạn theo người dùng, retry, circuit breaker, timeout).
+from typing import Iterator, Optional
 
-env_path = Path(__file__).resolve().parent.parent / '.env'
-load_dotenv(env_path)
+from course.services import ai_client
 
-api_key = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=api_key)
+MODEL_NAME = "gemini-2.5-flash"
+TEMPERATURE = 0.5
 
-model = genai.GenerativeModel("gemini-2.5-flash")
 
-def call_ai(prompt: str, max_words: int = 800) -> str:
+def limit_prompt(prompt: str, max_words: int) -> str:
     # Thêm yêu cầu giới hạn từ trong prompt
-    limited_prompt = f"{prompt}\n\n(Trả lời ngắn gọn, tối đa {max_words} từ.)",
-    print(limited_prompt)
-    response = model.generate_content(
-        limited_prompt,
-        stream=False,
-        generation_config=genai.types.GenerationConfig(temperature=0.5),
-        safety_settings={
-            "HARASSMENT": "BLOCK_NONE",
-            "HATE": "BLOCK_NONE",
-            "SEXUAL": "BLOCK_NONE",
-            "DANGEROUS": "BLOCK_NONE"
-        }
-    )
-    # Cắt thủ công để đảm bảo
-    # text = response.text.strip()
-    # words = text.split()
-    # if len(words) > max_words:
-    #     text = ' '.join(words[:max_words]) + '...'
-
-    return response.text
+    return f"{prompt}\n\n(Trả lời ngắn gọn, tối đa {max_words} từ.)"
+
+
+def call_ai(prompt: str, max_words: int = 800, user_id: Optional[int] = None) -> str:
+    return ai_client.generate(limit_prompt(prompt, max_words), MODEL_NAME, TEMPERATURE, user_id=user_id)
+
+
+def stream_ai(prompt: str, max_words: int = 800, user_id: Optional[int] = None) -> Iterator[str]:
+    """
+    Như call_ai nhưng trả từng đoạn văn bản ngay khi mô hình sinh ra (endpoint SSE).
+    Đóng generator (client ngắt kết nối) sẽ đóng luồng trả về từ Gemini.
+    """
+    return ai_client.stream(limit_prompt(prompt, max_words), MODEL_NAME, TEMPERATURE, user_id=user_id)
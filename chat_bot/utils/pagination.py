@@ -0,0 +1,35 @@
+# chat_bot/utils/pagination.py
+# Keyset pagination theo (created_at, id) cho các endpoint lịch sử chat: mỗi trang là một lần
+# quét index (user_id, created_at, id) từ vị trí cursor, không dùng OFFSET nên trang sau
+# nhanh như trang đầu dù lịch sử dài bao nhiêu.
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(message) -> str:
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(created_at, id) của tin nhắn cuối trang trước; ValueError nếu cursor không hợp lệ."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, message_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(message_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def parse_limit(value: Optional[str]) -> int:
+    """Số tin nhắn mỗi trang từ query `limit`; ValueError nếu không phải số nguyên dương."""
+    if value in (None, ""):
+        return DEFAULT_PAGE_SIZE
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("Invalid limit parameter")
+    return min(limit, MAX_PAGE_SIZE)
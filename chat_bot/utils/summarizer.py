@@ -0,0 +1,52 @@
+# chat_bot/utils/summarizer.py
+# Tóm tắt cuốn chiếu hội thoại cũ cho services/context_service.py.
+# settings.CHAT_SUMMARIZER chọn lớp dùng; LocalSummarizer chạy offline (test, dev không có API key).
+from typing import Dict, List
+
+from course.services import ai_client
+
+MODEL_NAME = "gemini-2.5-flash"
+SUMMARY_MAX_WORDS = 150
+
+ROLE_LABELS = {"user": "Người dùng", "bot": "Trợ lý", "system": "Hệ thống"}
+
+
+def clip_words(text: str, max_words: int) -> str:
+    words = text.split()
+    return " ".join(words[:max_words])
+
+
+class LLMSummarizer:
+    """Gộp bản tóm tắt cũ với các tin nhắn mới bằng mô hình (qua course/services/ai_client.py)"""
+
+    def summarize(self, previous: str, messages: List[Dict[str, str]]) -> str:
+        transcript = "\n".join(
+            f"{ROLE_LABELS.get(m['role'], m['role'])}: {m['content']}" for m in messages
+        )
+        prompt = (
+            "Bạn đang ghi nhớ một cuộc hội thoại giữa người dùng và trợ lý luyện thi TOEIC.\n"
+            f"Bản tóm tắt trước đó:\n{previous or '(chưa có)'}\n\n"
+            f"Các tin nhắn mới:\n{transcript}\n\n"
+            f"Viết lại bản tóm tắt gộp cả hai, tối đa {SUMMARY_MAX_WORDS} từ. Giữ các thông tin "
+            "cần nhớ (mục tiêu, điểm số, trình độ, chủ đề đang học, yêu cầu chưa giải quyết), "
+            "bỏ lời chào và nội dung trùng lặp. Chỉ trả về bản tóm tắt."
+        )
+        summary = ai_client.generate(prompt, MODEL_NAME, temperature=0.2)
+        return clip_words(summary, SUMMARY_MAX_WORDS)
+
+
+class LocalSummarizer:
+    """
+    Bản thay thế không gọi AI: giữ vài từ đầu của mỗi tin nhắn, nối sau bản tóm tắt cũ
+    và chỉ giữ SUMMARY_MAX_WORDS từ mới nhất. Xác định, đủ để test luồng cập nhật.
+    """
+
+    words_per_message = 12
+
+    def summarize(self, previous: str, messages: List[Dict[str, str]]) -> str:
+        lines = [
+            f"{ROLE_LABELS.get(m['role'], m['role'])}: {clip_words(m['content'], self.words_per_message)}"
+            for m in messages
+        ]
+        words = " | ".join(filter(None, [previous] + lines)).split()
+        return " ".join(words[-SUMMARY_MAX_WORDS:])
@@ -0,0 +1,339 @@
+"""
+Shared client for every text-generation call (course/toeicAI.py via llm.py, chat_bot).
+
+- One backend instance per process, so the Gemini client and its connections are reused.
+- A process-wide semaphore caps concurrent upstream calls; callers that cannot get a slot
+  within QUEUE_TIMEOUT fail fast with AIUnavailable instead of piling up request threads.
+  The slot is taken by the caller before the call is handed to the executor and released
+  when the call ends, so the executor (same size) never queues work behind the semaphore.
+- Per-user fixed-window rate limit in the shared cache (settings.AI_USER_RATE_LIMIT).
+- Transient errors (timeouts, 429/5xx) are retried with full-jitter exponential backoff;
+  repeated failures open a circuit breaker that rejects calls until RESET_TIMEOUT has passed.
+- generate() waits at most `timeout` seconds; agenerate() awaits the same call without
+  holding a thread of the event loop, for async views.
+- The backend is pluggable (settings.LLM_BACKEND or use_backend()); FakeBackend runs offline.
+"""
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+MAX_CONCURRENCY = getattr(settings, "AI_MAX_CONCURRENCY", 8)
+QUEUE_TIMEOUT = 10       # Max wait for a free upstream slot
+REQUEST_TIMEOUT = 60     # Max duration of one generate() call, retries included
+MAX_RETRIES = 2
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 4.0
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class AIError(Exception):
+    """Base class for errors raised by the AI client itself (not by the model)."""
+
+
+class AIUnavailable(AIError):
+    """Circuit open or every upstream slot busy."""
+
+
+class AIRateLimited(AIError):
+    """The user exceeded settings.AI_USER_RATE_LIMIT."""
+
+
+class AITimeout(AIError):
+    """The call did not finish within its timeout."""
+
+
+class GeminiBackend:
+    """Google Gemini via google.generativeai (imported lazily)."""
+
+    safety_settings = {
+        "HARASSMENT": "BLOCK_NONE",
+        "HATE": "BLOCK_NONE",
+        "SEXUAL": "BLOCK_NONE",
+        "DANGEROUS": "BLOCK_NONE",
+    }
+
+    def __init__(self, api_key: Optional[str] = None):
+        import google.generativeai as genai
+        from dotenv import load_dotenv
+
+        load_dotenv(Path(__file__).resolve().parent.parent / '.env')
+        genai.configure(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+        self.genai = genai
+        self._models = {}
+
+    def _call(self, prompt, model, temperature, stream):
+        if model not in self._models:
+            self._models[model] = self.genai.GenerativeModel(model)
+        config = (self.genai.types.GenerationConfig(temperature=temperature)
+                  if temperature is not None else None)
+        return self._models[model].generate_content(
+            prompt, generation_config=config, safety_settings=self.safety_settings, stream=stream,
+            request_options={"timeout": REQUEST_TIMEOUT})
+
+    def generate(self, prompt: str, model: str, temperature: Optional[float]) -> str:
+        return self._call(prompt, model, temperature, stream=False).text
+
+    def stream(self, prompt: str, model: str, temperature: Optional[float]) -> Iterator[str]:
+        for chunk in self._call(prompt, model, temperature, stream=True):
+            # Chunks that only carry metadata (e.g. finish_reason) have no text
+            if chunk.parts:
+                yield chunk.text
+
+
+class FakeBackend:
+    """
+    Offline backend for tests: deterministic replies, records every upstream call.
+    stream() yields the reply in `chunk_size`-character pieces, `chunk_delay` seconds apart.
+    """
+
+    def __init__(self, reply: Optional[Callable[[str], str]] = None, delay: float = 0.0,
+                 chunk_size: int = 8, chunk_delay: float = 0.0):
+        self.reply = reply or (lambda prompt: f"fake:{hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:12]}")
+        self.delay = delay
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.calls = []
+        self.chunks_sent = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, model: str, temperature: Optional[float]) -> str:
+        with self._lock:
+            self.calls.append((prompt, model, temperature))
+        if self.delay:
+            time.sleep(self.delay)
+        return self.reply(prompt)
+
+    def stream(self, prompt: str, model: str, temperature: Optional[float]) -> Iterator[str]:
+        with self._lock:
+            self.calls.append((prompt, model, temperature))
+        if self.delay:
+            time.sleep(self.delay)
+        text = self.reply(prompt)
+        for start in range(0, len(text), self.chunk_size):
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            with self._lock:
+                self.chunks_sent += 1
+            yield text[start:start + self.chunk_size]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(getattr(settings, "LLM_BACKEND", "course.services.ai_client.GeminiBackend"))()
+    return _backend
+
+
+@contextmanager
+def use_backend(backend):
+    """Temporarily route model calls to `backend` (tests, scripts)."""
+    global _backend
+    previous, _backend = _backend, backend
+    try:
+        yield backend
+    finally:
+        _backend = previous
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive transient failures; open -> half-open
+    after `reset_timeout` seconds, where one probe call decides between closed and open again.
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if self._probing or time.monotonic() - self.opened_at < self.reset_timeout:
+                raise AIUnavailable("AI service temporarily unavailable")
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def reset(self):
+        self.record_success()
+
+
+breaker = CircuitBreaker()
+_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="ai")
+
+
+def is_transient(error: BaseException) -> bool:
+    """Worth retrying: network errors/timeouts or a retryable HTTP status (google.api_core errors carry .code)."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return getattr(error, "code", None) in TRANSIENT_STATUS_CODES
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full jitter: uniform in [0, min(max, base * 2^attempt)]."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def check_rate_limit(user_id: Optional[int]):
+    """Count one upstream call for `user_id`; AIRateLimited once the window's quota is used."""
+    if user_id is None:
+        return
+    limit, window = getattr(settings, "AI_USER_RATE_LIMIT", (20, 60))
+    key = f"ai:rate:{user_id}:{int(time.time() // window)}"
+    cache.add(key, 0, window)
+    try:
+        count = cache.incr(key)
+    except ValueError:  # Key expired between add() and incr()
+        cache.set(key, 1, window)
+        count = 1
+    if count > limit:
+        raise AIRateLimited("Too many AI requests, please try again later")
+
+
+def _acquire_slot():
+    if not _slots.acquire(timeout=QUEUE_TIMEOUT):
+        raise AIUnavailable("AI service is busy, please try again later")
+
+
+@contextmanager
+def _slot():
+    _acquire_slot()
+    try:
+        yield
+    finally:
+        _slots.release()
+
+
+def _generate_with_retries(prompt, model, temperature):
+    breaker.before_call()
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            value = get_backend().generate(prompt, model, temperature)
+        except Exception as e:
+            if not is_transient(e):
+                breaker.record_success()  # The service answered, the request itself was bad
+                raise
+            if attempt == MAX_RETRIES:
+                breaker.record_failure()
+                raise
+            time.sleep(backoff_delay(attempt))
+        else:
+            breaker.record_success()
+            return value
+
+
+def _submit(prompt, model, temperature):
+    """
+    Wait for an upstream slot (AIUnavailable after QUEUE_TIMEOUT), then run the call on the
+    executor. The slot is released when the call finishes, not when the caller stops waiting:
+    future.cancel() cannot stop a call that is already running, so it keeps its slot.
+    """
+    _acquire_slot()
+    try:
+        future = _executor.submit(_generate_with_retries, prompt, model, temperature)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def generate(prompt: str, model: str = DEFAULT_MODEL, temperature: Optional[float] = None,
+             user_id: Optional[int] = None, timeout: float = REQUEST_TIMEOUT) -> str:
+    """Blocking model call with concurrency limit, rate limit, retries, breaker and timeout."""
+    check_rate_limit(user_id)
+    future = _submit(prompt, model, temperature)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise AITimeout(f"AI call timed out after {timeout}s")
+
+
+async def agenerate(prompt: str, model: str = DEFAULT_MODEL, temperature: Optional[float] = None,
+                    user_id: Optional[int] = None, timeout: float = REQUEST_TIMEOUT) -> str:
+    """generate() for async views: no thread is held while waiting for the model."""
+    await run_async(check_rate_limit, user_id)
+    future = await run_async(_submit, prompt, model, temperature)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        future.cancel()
+        raise AITimeout(f"AI call timed out after {timeout}s")
+
+
+async def run_async(func, *args):
+    """Run a blocking helper (cache access, llm.complete, ...) from async code."""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+def stream(prompt: str, model: str = DEFAULT_MODEL, temperature: Optional[float] = None,
+           user_id: Optional[int] = None) -> Iterator[str]:
+    """
+    Model reply chunk by chunk. Holds one upstream slot until the stream ends or the consumer
+    closes the generator; only failures before the first chunk are retried.
+    """
+    check_rate_limit(user_id)
+    with _slot():
+        breaker.before_call()
+        started = False
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                for chunk in get_backend().stream(prompt, model, temperature):
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                breaker.record_success()
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    breaker.record_success()
+                    raise
+                if started or attempt == MAX_RETRIES:
+                    breaker.record_failure()
+                    raise
+                time.sleep(backoff_delay(attempt))
+            else:
+                breaker.record_success()
+                return
@@ -0,0 +1,182 @@
+"""
+Cached, coalesced access to the text-generation model used by course/toeicAI.py.
+
+- Responses are cached under a key built from the normalized prompt, model name and
+  temperature: first in a small in-process LRU with TTL, then in the shared Django cache.
+- Concurrent identical prompts share one upstream call (single-flight): in-process via
+  an in-flight table, across processes via a short cache lock that followers wait on.
+- stream_complete() yields the reply chunk by chunk as the model produces it (SSE endpoints);
+  a cached reply is replayed at once, a fully streamed reply is cached like complete() would.
+- Upstream calls go through course/services/ai_client.py (concurrency limit, per-user rate
+  limit, retries, circuit breaker); acomplete() is the awaitable variant for async views.
+"""
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Iterator, Optional
+
+from django.core.cache import cache
+
+from course.services import ai_client
+from course.services.ai_client import DEFAULT_MODEL
+
+DEFAULT_TTL = 60 * 60 * 24
+LOCAL_MAX_ENTRIES = 512
+LOCAL_TTL = 60 * 10
+LOCK_TIMEOUT = 120      # Upper bound for one upstream call
+LOCK_POLL_INTERVAL = 0.2
+KEY_PREFIX = "llm"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Unicode NFC, whitespace collapsed within lines, blank lines and edges dropped."""
+    lines = (" ".join(line.split()) for line in unicodedata.normalize("NFC", prompt).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def cache_key(prompt: str, model: str, temperature: Optional[float]) -> str:
+    raw = f"{model}|{'default' if temperature is None else float(temperature)}|{normalize_prompt(prompt)}"
+    return f"{KEY_PREFIX}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+class LocalCache:
+    """Size-bounded LRU with per-entry TTL."""
+
+    def __init__(self, max_entries: int = LOCAL_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_local_cache = LocalCache()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _wait_for_other_process(key, lock_key):
+    """Follower across processes: wait for the lock holder's result or for the lock to expire."""
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.get(lock_key) is None:
+            return None
+        time.sleep(LOCK_POLL_INTERVAL)
+    return None
+
+
+def _compute(prompt, model, temperature, key, ttl, user_id):
+    lock_key = f"{key}:lock"
+    owns_lock = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    if not owns_lock:
+        value = _wait_for_other_process(key, lock_key)
+        if value is not None:
+            return value
+    try:
+        value = ai_client.generate(prompt, model, temperature, user_id=user_id)
+        cache.set(key, value, ttl)
+        return value
+    finally:
+        if owns_lock:
+            cache.delete(lock_key)
+
+
+def complete(prompt: str, model: str = DEFAULT_MODEL, temperature: Optional[float] = None,
+             ttl: int = DEFAULT_TTL, user_id: Optional[int] = None) -> str:
+    """
+    Model reply for `prompt`, served from cache or shared with an identical in-flight call.
+    Only an actual upstream call counts against `user_id`'s rate limit.
+    """
+    key = cache_key(prompt, model, temperature)
+    value = _local_cache.get(key)
+    if value is not None:
+        return value
+    value = cache.get(key)
+    if value is not None:
+        _local_cache.set(key, value, min(ttl, LOCAL_TTL))
+        return value
+
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _compute(prompt, model, temperature, key, ttl, user_id)
+        _local_cache.set(key, call.result, min(ttl, LOCAL_TTL))
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        call.done.set()
+
+
+async def acomplete(prompt: str, model: str = DEFAULT_MODEL, temperature: Optional[float] = None,
+                    ttl: int = DEFAULT_TTL, user_id: Optional[int] = None) -> str:
+    """complete() for async views."""
+    return await ai_client.run_async(complete, prompt, model, temperature, ttl, user_id)
+
+
+def stream_complete(prompt: str, model: str = DEFAULT_MODEL, temperature: Optional[float] = None,
+                    ttl: int = DEFAULT_TTL, user_id: Optional[int] = None) -> Iterator[str]:
+    """
+    Model reply for `prompt` as it is generated. A cached reply is yielded whole; a streamed
+    reply is cached only once the model finishes, so an abandoned stream (the consumer closed
+    the generator) leaves nothing behind. Identical in-flight streams are not coalesced.
+    """
+    key = cache_key(prompt, model, temperature)
+    value = _local_cache.get(key) or cache.get(key)
+    if value is not None:
+        yield value
+        return
+
+    parts = []
+    for chunk in ai_client.stream(prompt, model, temperature, user_id=user_id):
+        parts.append(chunk)
+        yield chunk
+    value = "".join(parts)
+    cache.set(key, value, ttl)
+    _local_cache.set(key, value, min(ttl, LOCAL_TTL))
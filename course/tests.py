@@ -1,3 +1,205 @@
-from django.test import TestCase
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from course.services import ai_client, llm
+from course.services.ai_client import (AIRateLimited, AITimeout, AIUnavailable, CircuitBreaker, FakeBackend,
+                                       agenerate, generate, use_backend)
+from course.services.llm import LocalCache, acomplete, complete, stream_complete
+
+
+class LLMCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        llm._local_cache.clear()
+
+    def test_normalized_prompt_hits_cache(self):
+        with use_backend(FakeBackend()) as backend:
+            first = complete("  Phân tích   kết quả\n\n Bài 1: L=300 ")
+            second = complete("Phân tích kết quả\nBài 1: L=300")
+            self.assertEqual(first, second)
+            self.assertEqual(len(backend.calls), 1)
+
+            complete("Phân tích kết quả\nBài 1: L=300", temperature=0.5)
+            complete("Phân tích kết quả\nBài 1: L=300", model="other-model")
+            self.assertEqual(len(backend.calls), 3)
+
+            # Bản trong process mất thì đọc lại từ cache dùng chung, không gọi model
+            llm._local_cache.clear()
+            self.assertEqual(complete("Phân tích kết quả\nBài 1: L=300"), first)
+            self.assertEqual(len(backend.calls), 3)
+
+    def test_concurrent_identical_prompts_share_one_call(self):
+        results = []
+        with use_backend(FakeBackend(delay=0.2)) as backend:
+            threads = [threading.Thread(target=lambda: results.append(complete("same prompt")))
+                       for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(backend.calls), 1)
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(len(results), 6)
+
+    def test_errors_are_not_cached(self):
+        def fail(prompt):
+            raise RuntimeError("quota")
+
+        with use_backend(FakeBackend(reply=fail)):
+            with self.assertRaises(RuntimeError):
+                complete("prompt")
+        with use_backend(FakeBackend()) as backend:
+            complete("prompt")
+            self.assertEqual(len(backend.calls), 1)
+
+    def test_local_cache_is_bounded_and_expires(self):
+        local = LocalCache(max_entries=2)
+        local.set("a", 1, 60)
+        local.set("b", 2, 60)
+        local.get("a")
+        local.set("c", 3, 60)
+        self.assertIsNone(local.get("b"))
+        self.assertEqual(local.get("a"), 1)
+        local.set("d", 4, -1)
+        self.assertIsNone(local.get("d"))
+
+    def test_stream_complete_yields_chunks_and_caches_full_reply(self):
+        with use_backend(FakeBackend(reply=lambda prompt: "abcdefghij", chunk_size=3)) as backend:
+            self.assertEqual(list(stream_complete("stream prompt")), ["abc", "def", "ghi", "j"])
+            # Lần sau: phát lại từ cache, complete() cũng dùng chung bản cache này
+            self.assertEqual(list(stream_complete("stream prompt")), ["abcdefghij"])
+            self.assertEqual(complete("stream prompt"), "abcdefghij")
+            self.assertEqual(len(backend.calls), 1)
+
+    def test_abandoned_stream_is_not_cached(self):
+        with use_backend(FakeBackend(reply=lambda prompt: "abcdefghij", chunk_size=3)) as backend:
+            chunks = stream_complete("stream prompt")
+            next(chunks)
+            chunks.close()
+            self.assertEqual(backend.chunks_sent, 1)
+            self.assertEqual(list(stream_complete("stream prompt")), ["abc", "def", "ghi", "j"])
+            self.assertEqual(len(backend.calls), 2)
+
+
+class TransientError(Exception):
+    code = 503
+
+
+class AIClientTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        llm._local_cache.clear()
+        ai_client.breaker.reset()
+        patcher = mock.patch.object(ai_client, "RETRY_BASE_DELAY", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_transient_errors_are_retried(self):
+        attempts = []
+
+        def flaky(prompt):
+            attempts.append(prompt)
+            if len(attempts) < 3:
+                raise TransientError("unavailable")
+            return "ok"
+
+        with use_backend(FakeBackend(reply=flaky)):
+            self.assertEqual(generate("prompt"), "ok")
+        self.assertEqual(len(attempts), 3)
+
+    def test_non_transient_errors_are_not_retried(self):
+        def blocked(prompt):
+            raise ValueError("blocked by safety filter")
+
+        with use_backend(FakeBackend(reply=blocked)) as backend:
+            with self.assertRaises(ValueError):
+                generate("prompt")
+        self.assertEqual(len(backend.calls), 1)
+        self.assertFalse(ai_client.breaker.is_open)
+
+    def test_circuit_opens_and_recovers(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+
+        def down(prompt):
+            raise TransientError("unavailable")
+
+        with mock.patch.object(ai_client, "breaker", breaker):
+            with use_backend(FakeBackend(reply=down)) as backend:
+                for _ in range(2):
+                    with self.assertRaises(TransientError):
+                        generate("prompt")
+                calls = len(backend.calls)
+                with self.assertRaises(AIUnavailable):
+                    generate("prompt")
+                self.assertEqual(len(backend.calls), calls)
+
+            time.sleep(0.15)
+            with use_backend(FakeBackend(reply=lambda prompt: "back")):
+                self.assertEqual(generate("prompt"), "back")
+            self.assertFalse(breaker.is_open)
+
+    @override_settings(AI_USER_RATE_LIMIT=(2, 60))
+    def test_per_user_rate_limit_counts_upstream_calls_only(self):
+        with use_backend(FakeBackend()):
+            complete("same", user_id=1)
+            complete("same", user_id=1)  # Cache hit, không tính
+            complete("other", user_id=1)
+            with self.assertRaises(AIRateLimited):
+                complete("third", user_id=1)
+            complete("third", user_id=2)
+
+    def test_concurrent_calls_are_bounded(self):
+        running, peak = [0], [0]
+        lock = threading.Lock()
+
+        def slow(prompt):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return prompt
+
+        with mock.patch.object(ai_client, "_slots", threading.BoundedSemaphore(2)):
+            with use_backend(FakeBackend(reply=slow)):
+                threads = [threading.Thread(target=generate, args=(f"p{i}",)) for i in range(6)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        self.assertEqual(peak[0], 2)
+
+    def test_busy_slots_fail_fast_and_are_freed_when_the_call_ends(self):
+        with mock.patch.object(ai_client, "_slots", threading.BoundedSemaphore(1)), \
+                mock.patch.object(ai_client, "_executor", ThreadPoolExecutor(max_workers=1)), \
+                mock.patch.object(ai_client, "QUEUE_TIMEOUT", 0.05):
+            with use_backend(FakeBackend(delay=0.2)):
+                with self.assertRaises(AITimeout):
+                    generate("slow", timeout=0.05)
+                # The timed-out call still runs and holds the only slot
+                with self.assertRaises(AIUnavailable):
+                    generate("queued")
+                time.sleep(0.25)
+                self.assertTrue(generate("after").startswith("fake:"))
+
+    def test_timeout(self):
+        with use_backend(FakeBackend(delay=0.3)):
+            with self.assertRaises(AITimeout):
+                generate("prompt", timeout=0.05)
+
+    def test_async_calls_share_the_cache(self):
+        async def run():
+            return await asyncio.gather(agenerate("direct"), acomplete("cached"), acomplete("cached"))
+
+        with use_backend(FakeBackend()) as backend:
+            direct, first, second = asyncio.run(run())
+        self.assertEqual(first, second)
+        self.assertTrue(direct.startswith("fake:"))
+        self.assertEqual(len(backend.calls), 2)
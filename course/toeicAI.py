@@ -1,5 +1,4 @@
 from pathlib import Path
-import google.generativeai as genai
 import os
 import json
 from PIL import Image
@@ -15,10 +14,9 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'EnglishApp.settings')  # Thay bằng tên project thực của bạn
 django.setup()
 
-from concurrent.futures import ThreadPoolExecutor
 import time
 
-executor = ThreadPoolExecutor(max_workers=10)  # tùy bạn điều chỉnh số lượng thread
+from course.services.llm import acomplete, complete, stream_complete
 
 # Kiểm tra hệ điều hành và cấu hình tương ứng
 if os.name == 'nt':  # Nếu đang chạy trên Windows
@@ -48,36 +46,23 @@ print("✅ Kiểm tra FFprobe:", os.path.isfile(AudioSegment.ffprobe))
 # Load API Key từ file .env
 env_path = Path(__file__).parent / '.env'
 load_dotenv(env_path)
-api_key = os.getenv("GEMINI_API_KEY")
-# Cấu hình API Key
-genai.configure(api_key=api_key)
-# Chọn mô hình Gemini
-model = genai.GenerativeModel("gemini-2.5-flash")
+# Chọn mô hình Gemini (API key, kết nối và giới hạn đồng thời nằm ở course/services/ai_client.py)
+MODEL_NAME = "gemini-2.5-flash"
 
 
-def call_ai_sync(prompt):
-    response = model.generate_content(
-        prompt,
-        stream=True,
-        generation_config=genai.types.GenerationConfig(temperature=0.5),
-        safety_settings={
-            "HARASSMENT": "BLOCK_NONE",
-            "HATE": "BLOCK_NONE",
-            "SEXUAL": "BLOCK_NONE",
-            "DANGEROUS": "BLOCK_NONE"
-        }
-    )
-
-    return ''.join(chunk.text for chunk in response)
+def call_ai_sync(prompt, temperature=0.5, user_id=None):
+    """
+    Gọi mô hình qua course/services/llm.py: prompt giống nhau (sau chuẩn hóa khoảng trắng)
+    dùng lại phản hồi đã cache, các request đồng thời cùng prompt chỉ gọi API một lần.
+    `user_id` (người gửi request) bị tính vào giới hạn số lời gọi AI của người đó.
+    """
+    return complete(prompt, model=MODEL_NAME, temperature=temperature, user_id=user_id)
 
 
-def get_user_info_prompt_multi(user_id, histories):
+def build_user_info_prompt(histories):
     """
-    Gộp dữ liệu 3 bài thi gần nhất của người dùng và tạo một phản hồi duy nhất từ AI.
+    Gộp dữ liệu 3 bài thi gần nhất của người dùng thành prompt phân tích gửi AI.
     """
-    if not histories:
-        return "Không tìm thấy dữ liệu bài thi."
-
     prompt_parts = []
     for i, history in enumerate(histories[::-1], start=1):  # đảo ngược để từ cũ -> mới
         same_test_histories = [h for h in histories if h.test.name == history.test.name]
@@ -93,7 +78,7 @@ Bài{i} [{history.test.name} - Lần {attempt_number}]: L={history.listening_sco
     full_prompt = "\n\n".join(prompt_parts)
 
     # Prompt chính gửi đến AI
-    final_prompt = f"""
+    return f"""
 Bạn là trợ lý TOEIC chuyên phân tích kết quả thi nhanh chóng. Dưới đây là 3 bài thi:
 
 {full_prompt}
@@ -101,17 +86,44 @@ Bạn là trợ lý TOEIC chuyên phân tích kết quả thi nhanh chóng. Dư
 Phân tích nhanh vừa đủ ý, phản hồi ngắn gọn: kỹ năng nào yếu và gợi ý cải thiện (TOEIC 900)
 """
 
-    # print("[DEBUG] Prompt gửi AI:")
-    # print(final_prompt)
+
+def get_user_info_prompt_multi(user_id, histories):
+    """
+    Gộp dữ liệu 3 bài thi gần nhất của người dùng và tạo một phản hồi duy nhất từ AI.
+    """
+    if not histories:
+        return "Không tìm thấy dữ liệu bài thi."
 
     # Gọi AI để lấy phản hồi
     start = time.time()
-    result = executor.submit(call_ai_sync, final_prompt).result()
+    result = call_ai_sync(build_user_info_prompt(histories), user_id=user_id)
     end = time.time()
     print(f">>> Total: {end - start:.3f}s")  # thời gian phản hồi (đã trôi qua)
     return result
 
 
+async def aget_user_info_feedback(histories, user_id=None):
+    """
+    Như get_user_info_prompt_multi cho view async: chờ AI mà không giữ thread xử lý request.
+    """
+    if not histories:
+        return "Không tìm thấy dữ liệu bài thi."
+    return await acomplete(build_user_info_prompt(histories), model=MODEL_NAME, temperature=0.5,
+                           user_id=user_id)
+
+
+def stream_user_info_feedback(histories, user_id=None):
+    """
+    Như get_user_info_prompt_multi nhưng trả từng đoạn văn bản ngay khi mô hình sinh ra
+    (dùng cho endpoint SSE), phản hồi đầy đủ vẫn được cache như call_ai_sync.
+    """
+    if not histories:
+        yield "Không tìm thấy dữ liệu bài thi."
+        return
+    yield from stream_complete(build_user_info_prompt(histories), model=MODEL_NAME, temperature=0.5,
+                               user_id=user_id)
+
+
 def create_toeic_question_prompt(question_text, answers, audio=None, image=None, page=None):
     """
     Tạo prompt phân tích câu hỏi TOEIC và đưa ra đáp án đúng.
@@ -176,8 +188,7 @@ Hãy thực hiện các bước sau:
 
 Trả lời rõ ràng, súc tích, dễ hiểu và theo thứ tự các bước.
 """
-    response = model.generate_content(prompt)
-    return response.text
+    return call_ai_sync(prompt, temperature=0.5)
 
 
 def analyze_toeic_question(question_text, answers, audio=None, image=None):
@@ -227,11 +238,7 @@ def analyze_toeic_question(question_text, answers, audio=None, image=None):
     và xác định nó thuộc Part nào (Part 1, 2, 3, 4, 5, 6 hoặc 7). Giải thích lý do tại sao.
     """
 
-    # Giả sử rằng 'model' là đối tượng AI model đã được định nghĩa toàn cục
-
-    response = model.generate_content(prompt)
-
-    return response.text
+    return call_ai_sync(prompt, temperature=0.5)
 
 
 # Ví dụ sử dụng với JSON object
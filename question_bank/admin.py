@@ -81,16 +81,16 @@ class QuestionBankInline(admin.TabularInline):
 @admin.register(QuestionSetBank)
 class QuestionSetBankAdmin(admin.ModelAdmin):
     form = QuestionSetBankAdminForm
-    list_display = ('part_description', 'from_ques', 'to_ques', 'note')
+    list_display = ('part_description', 'from_ques', 'to_ques', 'note', 'usage_count')
     list_filter = ("part_description", "created_at", "updated_at")
     search_fields = ("page", "audio", "image")
-    readonly_fields = ("created_at", "updated_at")
+    readonly_fields = ("created_at", "updated_at", "usage_count")
     list_per_page = 20
     inlines = [QuestionBankInline]
 
     fieldsets = (
         ('Basic Information', {
-            'fields': ('part_description', 'from_ques', 'to_ques', 'note')
+            'fields': ('part_description', 'from_ques', 'to_ques', 'note', 'usage_count')
         }),
         ('Content', {
             'fields': ('page', 'audio', 'image'),
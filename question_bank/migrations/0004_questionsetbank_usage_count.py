@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('question_bank', '0003_questionsetbank_note'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionsetbank',
+            name='usage_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -30,6 +30,8 @@ class QuestionSetBank(BaseModel):
     from_ques = models.IntegerField(blank=True, null=True)
     to_ques = models.IntegerField(blank=True, null=True)
     note = models.TextField(blank=True, null=True)
+    # Số lần bộ câu hỏi đã được chép sang đề tạo tự động (giảm trọng số khi chọn ngẫu nhiên)
+    usage_count = models.IntegerField(default=0)
 
     def __str__(self):
         if self.page:
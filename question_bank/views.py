@@ -5,9 +5,9 @@ from rest_framework.pagination import PageNumberPagination
 from django.db.models import Q
 import os
 import json
-from django.core.management import call_command
 
 from EStudyApp.models import Test
+from EStudyApp.services.jobs import enqueue, public_job
 from .models import QuestionBank, QuestionSetBank, PartDescription
 from .serializers import QuestionBankSerializer, QuestionSetBankCreateSerializer, QuestionSetBankDetailSerializer, QuestionSetBankUpdateSerializer, QuestionSetBankListSerializer
 
@@ -344,38 +344,34 @@ class QuestionImportView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
+            if not Test.objects.filter(id=test_id).exists():
+                return Response(
+                    {'error': 'Test not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
             # Save files to media directory
             question_path = os.path.join('scrapper', 'data-test', question_file.name)
             answer_path = os.path.join('scrapper', 'answers', answer_file.name)
-            
-            # delete files if exist
-            if os.path.exists(question_path):
-                os.remove(question_path)
-            if os.path.exists(answer_path):
-                os.remove(answer_path)
-            
-            # Save files to media directory
-            with open(question_path, 'wb') as f:
-                f.write(question_file.read())
-            with open(answer_path, 'wb') as f:
-                f.write(answer_file.read())
-                
-            # call command to create test
-            call_command('create_test_by_jsonf', 
-                        question_file.name,
-                        answer_file.name,
-                        test_id)
-            
-                
-            return Response(
-                {'message': 'Files saved successfully'},
-                status=status.HTTP_200_OK
-            )
+
+            # Ghi theo từng đoạn, không đọc cả file upload vào bộ nhớ
+            for uploaded, path in ((question_file, question_path), (answer_file, answer_path)):
+                with open(path, 'wb') as f:
+                    for chunk in uploaded.chunks():
+                        f.write(chunk)
+
+            # Import chạy nền (services/jobs.py), client theo dõi tiến độ qua jobs/<id>/
+            job = enqueue('import_test', {
+                'test_id': test_id,
+                # Worker có thể chạy ở thư mục khác
+                'question_path': os.path.abspath(question_path),
+                'answer_path': os.path.abspath(answer_path),
+            }, user_id=getattr(request.user, 'id', None))
+
+            return Response(public_job(job), status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-            
-            
 